@@ -1,12 +1,15 @@
 import math
 import pygame
-import random
 from enum import Enum
 from Entity import Entity
 from Projectile import Projectile
 from Block import Hazard, MovableBlock, MovingBlock
 from Objectives import Objective
-from Helpers import load_sprite_sheets, MovementDirection, set_sound_source, RUMBLE_EFFECT_DURATION, RUMBLE_EFFECT_LOW, RUMBLE_EFFECT_HIGH
+from StaticColliders import StaticCollider
+from Helpers import load_sprite_sheets, MovementDirection, set_sound_source, RUMBLE_EFFECT_DURATION, RUMBLE_EFFECT_LOW, RUMBLE_EFFECT_HIGH, collide_mask, get_mask, sweep_rect
+from Profiler import profiler
+from RandomStreams import rng
+from TransformCache import transform_cache
 from SimpleVFX.SimpleVFX import VisualEffect, ImageDirection
 
 
@@ -57,6 +60,8 @@ class Actor(Entity):
     HORIZ_PUSH_DECAY_RATE = 200
     DEATH_TIME = 1.5
     BARK_TIME = 2
+    MIN_SWEEP_DISTANCE = 12
+    SWEEP_OVERLAP = 2
 
     def __init__(self, level, controller, x, y, sprite_master, audios, difficulty, block_size, can_shoot=False, can_resize=False, width=SIZE, height=SIZE, attack_damage=ATTACK_DAMAGE, sprite=None, proj_sprite=None, name=None):
         super().__init__(level, controller, x, y, width, height, name=name)
@@ -153,8 +158,28 @@ class Actor(Entity):
         if self.hp > 0 and self.abilities["can_resize"] and self.cooldowns["resize"] <= 0:
             self.resize(max(self.size_target / Actor.RESIZE_SCALE_LIMIT, 1 / Actor.RESIZE_SCALE_LIMIT))
 
-    def move(self, dx: float, dy: float) -> None:
+    def __sweep__(self, dx: float, dy: float) -> float:
+        # a step longer than this could pass right through a block, or sink far enough into one to get pushed out the wrong side
+        dist = abs(dx) + abs(dy)
+        if dist <= Actor.MIN_SWEEP_DISTANCE:
+            return 1.0
+        rect = self.collision_rect.move(self.rect.x, self.rect.y)
+        first = None
+        for ent in self.level.get_entities_along(rect, dx, dy, include_dynamic=(self == self.level.player)):
+            if ent.is_blocking:
+                impact = sweep_rect(rect, dx, dy, ent.collision_rect.move(ent.rect.x, ent.rect.y))
+                if impact is not None and (first is None or impact < first):
+                    first = impact
+        if first is None:
+            return 1.0
+        # it stops a little inside whatever it hit, so get_collisions still lands it, bumps its head or holds it at the wall like always
+        return min(first + (Actor.SWEEP_OVERLAP / dist), 1.0)
+
+    def move(self, dx: float, dy: float, sweep: bool=True) -> None:
+        # each axis is swept on its own, in the same order they're applied (a teleport skips it, since it's meant to go through walls)
         if dx != 0:
+            if sweep:
+                dx *= self.__sweep__(dx, 0)
             if self.rect.left + dx < self.level.level_bounds[0][0] - (self.rect.width // 5):
                 self.rect.left = -self.rect.width // 5
             elif self.rect.right + dx > self.level.level_bounds[1][0] + (self.rect.width // 5):
@@ -163,6 +188,8 @@ class Actor(Entity):
                 self.rect.x += dx
 
         if dy != 0:
+            if sweep:
+                dy *= self.__sweep__(0, dy)
             if self.rect.top + dy < self.level.level_bounds[0][1]:
                 self.hit_head()
             elif self.rect.top + dy > self.level.level_bounds[1][1]:
@@ -216,7 +243,7 @@ class Actor(Entity):
         if attack_type in self.audios:
             active_audio_channel = pygame.mixer.find_channel()
             if active_audio_channel is not None:
-                active_audio_channel.play(self.audios[attack_type][random.randrange(len(self.audios[attack_type]))])
+                active_audio_channel.play(self.audios[attack_type][rng.audio.randrange(len(self.audios[attack_type]))])
                 if self == self.level.player:
                     active_audio_channel.set_volume(self.controller.master_volume["player"])
                 else:
@@ -250,7 +277,7 @@ class Actor(Entity):
             ents = self.level.get_entities_in_range((self.rect.x, self.rect.y), blocks_only=True, include_doors=True)
         for ent in ents:
             if self.rect.colliderect(ent.rect):
-                if pygame.sprite.collide_mask(self, ent):
+                if collide_mask(self, ent):
                     if isinstance(ent, Actor) or isinstance(ent, Objective):
                         overlap = self.mask.overlap_mask(ent.mask, (0, 0)).get_rect()
                     else:
@@ -297,8 +324,10 @@ class Actor(Entity):
             elif ent.rect.top <= self.rect.bottom <= ent.rect.bottom and self.rect.left + (self.rect.width // 4) <= ent.rect.right and self.rect.right - (self.rect.width // 4) >= ent.rect.left:
                 if isinstance(ent, MovingBlock) or isinstance(ent, MovableBlock) :
                     ent.collide(self)
-                if self.rect.centerx != ent.rect.centerx:
-                    if math.degrees(math.atan(abs(self.rect.centery - ent.rect.centery) / abs(self.rect.centerx - ent.rect.centerx))) >= 45:
+                # a merged collider is measured from the block right under the actor, the same way each block used to be on its own
+                center = (ent.tile_center(self.rect.center) if isinstance(ent, StaticCollider) else ent.rect.center)
+                if self.rect.centerx != center[0]:
+                    if math.degrees(math.atan(abs(self.rect.centery - center[1]) / abs(self.rect.centerx - center[0]))) >= 45:
                         self.should_move_vert = False
                         if self.rect.bottom != ent.rect.top:
                             self.rect.bottom = ent.rect.top
@@ -444,11 +473,11 @@ class Actor(Entity):
                 self.animation_count = 0
         self.sprite = active_sprites[active_index]
         if self.size != 1:
-            self.sprite = pygame.transform.smoothscale_by(self.sprite, self.size)
+            self.sprite = transform_cache.smoothscale_by(self.sprite, self.size)
 
         if self.audios is not None and (self.state_changed or self.state == MovementState.RUN) and self.audio_trigger_frames.get(str(self.state)) is not None:
             if self.audios.get(str(self.state).replace("_ATTACK", "")) is not None and active_index in self.audio_trigger_frames[str(self.state).replace("_ATTACK", "")]:
-                self.active_audio = self.audios[str(self.state).replace("_ATTACK", "")][random.randrange(len(self.audios[str(self.state).replace("_ATTACK", "")]))]
+                self.active_audio = self.audios[str(self.state).replace("_ATTACK", "")][rng.audio.randrange(len(self.audios[str(self.state).replace("_ATTACK", "")]))]
                 if self.active_audio_channel is not None:
                     self.active_audio_channel.stop()
                     self.active_audio_channel = None
@@ -456,7 +485,7 @@ class Actor(Entity):
 
     def update_geo(self) -> None:
         self.rect = self.sprite.get_rect(topleft=(self.rect.x, self.rect.y))
-        self.mask = pygame.mask.from_surface(self.sprite)
+        self.mask = get_mask(self.sprite)
 
     def loop(self, dtime: float) -> float:
         dtime_offset: float = super().loop(dtime)
@@ -544,6 +573,7 @@ class Actor(Entity):
             self.update_sprite()
             self.update_geo()
             win.blit(self.sprite, (adj_x_image, adj_y_image))
+            profiler.count("blits")
 
         if self.active_audio is not None:
             if self.active_audio_channel is None:
@@ -0,0 +1,81 @@
+import threading
+import pygame
+from collections import OrderedDict
+
+
+class AssetCache:
+    MAX_BYTES: int = 512 * 1024 * 1024
+
+    def __init__(self, max_bytes: int=MAX_BYTES) -> None:
+        self.max_bytes: int = max_bytes
+        self.bytes: int = 0
+        self.entries: OrderedDict = OrderedDict()
+        self.sizes: dict = {}
+        # levels can be built on another thread while the game is still reading from the cache
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def size_of(value) -> int:
+        if isinstance(value, pygame.Surface):
+            return value.get_width() * value.get_height() * value.get_bytesize()
+        elif isinstance(value, pygame.mixer.Sound):
+            mixer = pygame.mixer.get_init()
+            return 0 if mixer is None else int(value.get_length() * mixer[0] * mixer[2] * (abs(mixer[1]) // 8))
+        elif isinstance(value, dict):
+            return sum(AssetCache.size_of(item) for item in value.values())
+        elif isinstance(value, (list, tuple)):
+            return sum(AssetCache.size_of(item) for item in value)
+        else:
+            return 0
+
+    def __contains__(self, key) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __getitem__(self, key):
+        with self.lock:
+            value = self.entries[key]
+            self.entries.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value) -> None:
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.sizes[key]
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            self.sizes[key] = AssetCache.size_of(value)
+            self.bytes += self.sizes[key]
+            # anything evicted here is only dropped from the cache, levels that are still using it keep their own references
+            while self.bytes > self.max_bytes and len(self.entries) > 1:
+                old_key, _ = self.entries.popitem(last=False)
+                self.bytes -= self.sizes.pop(old_key)
+
+    @property
+    def headroom(self) -> int:
+        return max(self.max_bytes - self.bytes, 0)
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.entries:
+                return self[key]
+            return default
+
+    def get_or_load(self, key, loader):
+        with self.lock:
+            if key in self.entries:
+                return self[key]
+        # the loader runs outside the lock so a slow load on one thread doesn't hold up the other
+        value = loader()
+        with self.lock:
+            if key not in self.entries:
+                self[key] = value
+            return self[key]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.bytes = 0
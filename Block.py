@@ -1,10 +1,12 @@
 import math
-import random
 import pygame
 from os.path import join, isfile, abspath
 from Entity import Entity
 from Helpers import handle_exception, MovementDirection, load_sprite_sheets, set_sound_source, ASSETS_FOLDER, \
-    retroify_image
+    retroify_image, collide_mask, get_mask, SpriteFrame
+from Profiler import profiler
+from RandomStreams import rng
+from KinematicPath import KinematicPath
 from SimpleVFX.SimpleVFX import VisualEffect, ImageDirection
 
 
@@ -12,13 +14,15 @@ class Block(Entity):
     def __init__(self, level, controller, x, y, width, height, image_master, audios, is_stacked, coord_x=0, coord_y=0, is_blocking=True, name="Block"):
         super().__init__(level, controller, x, y, width, height, is_blocking=is_blocking, name=name)
         self.sprite = self.load_image(join(ASSETS_FOLDER, "Terrain", "Terrain.png"), width, height, image_master, coord_x, coord_y, retro=self.level.retro)
-        self.mask = pygame.mask.from_surface(self.sprite)
+        self.mask = get_mask(self.sprite)
         self.is_stacked = is_stacked
         self.audios = audios
+        self.grid_cell = None
 
     @property
     def gravity(self) -> float:
-        return super().gravity * 0.01
+        # blocks used to gain 1% of gravity every frame at 150 FPS, this is the same pull per second
+        return super().gravity * 1.5
 
     def save(self) -> dict | None:
         if self.hp != 0:
@@ -30,22 +34,29 @@ class Block(Entity):
         if self.audios.get(name.upper()) is not None:
             active_audio_channel = pygame.mixer.find_channel()
             if active_audio_channel is not None:
-                active_audio_channel.play(self.audios[name.upper()][random.randrange(len(self.audios[name.upper()]))])
+                active_audio_channel.play(self.audios[name.upper()][rng.audio.randrange(len(self.audios[name.upper()]))])
                 set_sound_source(self.rect, self.level.player.rect, self.controller.master_volume["non-player"], active_audio_channel)
 
     @staticmethod
-    def load_image(path, width, height, image_master, coord_x, coord_y, retro=False) -> pygame.Surface | None:
+    def load_image(path, width, height, image_master, coord_x, coord_y, retro=False) -> SpriteFrame | None:
         if isfile(path):
             if retro and isfile(path[:-3] + "_retro.png"):
                 path = path[:-3] + "_retro.png"
-            if image_master.get(path) is None:
-                image_master[path] = pygame.image.load(path).convert_alpha()
-            surface = pygame.Surface((width // 2, height // 2), pygame.SRCALPHA)
-            rect = pygame.Rect(coord_x, coord_y, width // 2, height // 2)
-            surface.blit(image_master[path], (0, 0), rect)
-            if retro:
-                surface = retroify_image(surface)
-            return pygame.transform.scale2x(surface)
+            # every block using the same tile shares one frame (and its mask), so nothing in it may be drawn onto afterwards
+            key = ("Terrain", path, coord_x, coord_y, width, height, retro)
+            tile = image_master.get(key)
+            if tile is None:
+                if image_master.get(path) is None:
+                    image_master[path] = pygame.image.load(path).convert_alpha()
+                surface = pygame.Surface((width // 2, height // 2), pygame.SRCALPHA)
+                rect = pygame.Rect(coord_x, coord_y, width // 2, height // 2)
+                surface.blit(image_master[path], (0, 0), rect)
+                if retro:
+                    surface = retroify_image(surface)
+                tile = SpriteFrame(((width // 2) * 2, (height // 2) * 2), pygame.SRCALPHA)
+                pygame.transform.scale2x(surface, tile)
+                image_master[key] = tile
+            return tile
         else:
             handle_exception(f'File {FileNotFoundError(abspath(path))} not found.')
             return None
@@ -65,7 +76,8 @@ class BreakableBlock(Block):
             if self.hp == self.max_hp:
                 self.hp = self.max_hp // 2
                 self.sprite = self.sprite_damaged
-                self.mask = pygame.mask.from_surface(self.sprite)
+                self.mask = get_mask(self.sprite)
+                self.level.static_chunks.invalidate(self)
                 self.cooldowns["get_hit"] += BreakableBlock.GET_HIT_COOLDOWN
             else:
                 self.die()
@@ -82,47 +94,67 @@ class MovingBlock(Block):
         self.speed = speed
         self.is_enabled = is_enabled
         self.hold = hold_for_collision
-        self.patrol_path = path
+        self.patrol_path = None
         self.patrol_path_index = 0
-        if self.patrol_path is not None:
-            min_dist = math.dist((self.rect.x, self.rect.y), (self.patrol_path[0][0], self.patrol_path[0][1]))
-            for i in range(len(self.patrol_path)):
-                dist = math.dist((self.rect.x, self.rect.y), (self.patrol_path[i][0], self.patrol_path[i][1]))
-                if dist < min_dist:
-                    self.patrol_path_index = i
-            self.direction = self.facing = (MovementDirection.RIGHT if self.patrol_path[self.patrol_path_index][0] - self.rect.x > 0 else MovementDirection.LEFT)
+        self.kinematic_path: KinematicPath | None = None
+        self.path_bounds: pygame.Rect | None = None
+        self.path_time = 0.0
         self.x_vel = self.y_vel = 0.0
-        self.should_move_horiz = self.should_move_vert = True
-        self.cooldowns.update({"wait": 0.0})
-
-    def increment_patrol_index(self) -> None:
-        if self.patrol_path_index < 0:
-            self.patrol_path_index -= 1
-        elif self.patrol_path_index >= 0:
-            self.patrol_path_index += 1
-        if self.patrol_path_index >= len(self.patrol_path) - 1:
-            self.patrol_path_index = -1
-        elif self.patrol_path_index <= -len(self.patrol_path):
-            self.patrol_path_index = 0
+        self.set_patrol_path(path)
 
-    def patrol(self, dtime) -> None:
-        self.should_move_horiz = self.should_move_vert = False
-        if self.patrol_path is not None and self.cooldowns["wait"] <= 0:
-            target_x = self.patrol_path[self.patrol_path_index][0] - self.rect.x
-            if target_x != 0:
-                self.direction = (MovementDirection.RIGHT if target_x >= 0 else MovementDirection.LEFT)
-                self.x_vel = min(abs(target_x) / dtime, abs(self.speed)) * self.direction
-                self.should_move_horiz = True
-
-            target_y = self.patrol_path[self.patrol_path_index][1] - self.rect.y
-            if target_y != 0:
-                self.y_vel = min(abs(target_y) / dtime, abs(self.speed)) * (1 if target_y >= 0 else -1)
-                self.should_move_vert = True
+    @staticmethod
+    def __next_patrol_index__(index, length) -> int:
+        index += (-1 if index < 0 else 1)
+        if index >= length - 1:
+            return -1
+        elif index <= -length:
+            return 0
+        return index
 
-            if not self.should_move_horiz and not self.should_move_vert:
-                if len(self.patrol_path[self.patrol_path_index]) > 2 and self.patrol_path[self.patrol_path_index][2]:
-                    self.cooldowns["wait"] = MovingBlock.PATH_STOP_TIME
-                self.increment_patrol_index()
+    def set_patrol_path(self, path) -> None:
+        if path is self.patrol_path and (path is None or self.kinematic_path is not None):
+            return
+        self.patrol_path = path
+        self.kinematic_path = self.path_bounds = None
+        self.path_time = 0.0
+        if self.patrol_path is None:
+            return
+
+        self.patrol_path_index = 0
+        min_dist = math.dist((self.rect.x, self.rect.y), (self.patrol_path[0][0], self.patrol_path[0][1]))
+        for i in range(len(self.patrol_path)):
+            dist = math.dist((self.rect.x, self.rect.y), (self.patrol_path[i][0], self.patrol_path[i][1]))
+            if dist < min_dist:
+                self.patrol_path_index = i
+        self.direction = self.facing = (MovementDirection.RIGHT if self.patrol_path[self.patrol_path_index][0] - self.rect.x > 0 else MovementDirection.LEFT)
+
+        # the path goes back and forth, so following the indices from the first target until one repeats gives the lead up to the loop, and the loop itself
+        order = []
+        seen = {}
+        index = self.patrol_path_index
+        while seen.get(index) is None:
+            seen[index] = len(order)
+            order.append(index)
+            index = MovingBlock.__next_patrol_index__(index, len(self.patrol_path))
+        points = [self.patrol_path[i] for i in order]
+        self.kinematic_path = KinematicPath((self.rect.x, self.rect.y), points[:seen[index]], points[seen[index]:], self.speed, MovingBlock.PATH_STOP_TIME)
+
+        xs = [self.rect.x] + [point[0] for point in self.patrol_path]
+        ys = [self.rect.y] + [point[1] for point in self.patrol_path]
+        self.path_bounds = pygame.Rect(min(xs), min(ys), max(xs) - min(xs) + self.rect.width, max(ys) - min(ys) + self.rect.height)
+
+    def is_near(self, point, dist) -> bool:
+        # anywhere along the path counts, since the block itself only gets put where it should be when it's updated
+        if self.path_bounds is None:
+            return True
+        dist_x = max(self.path_bounds.left - point[0], 0, point[0] - self.path_bounds.right)
+        dist_y = max(self.path_bounds.top - point[1], 0, point[1] - self.path_bounds.bottom)
+        return math.hypot(dist_x, dist_y) < dist
+
+    def patrol(self, dtime) -> None:
+        # the position is worked out from the path's own clock, which is all that has to move on here (at half speed in bullet time)
+        if self.kinematic_path is not None and self.is_enabled and not self.hold:
+            self.path_time += dtime * (0.5 if self.level.player.is_slow_time else 1)
 
     def collide(self, ent) -> bool:
         if self.hold and self.is_enabled and ent == self.level.player:
@@ -133,45 +165,21 @@ class MovingBlock(Block):
             ent.push_y = self.y_vel
         return self.is_blocking
 
-    def move(self, dx, dy) -> None:
-        if dx != 0:
-            if self.rect.left + dx < self.level.level_bounds[0][0]:
-                self.rect.left = self.rect.width
-                self.x_vel = 0.0
-            elif self.rect.right + dx > self.level.level_bounds[1][0]:
-                self.rect.right = self.level.level_bounds[1][0] - self.rect.width
-                self.x_vel = 0.0
-            else:
-                self.rect.x += dx
-
-        if dy != 0:
-            if self.rect.top + dy < self.level.level_bounds[0][1]:
-                self.y_vel *= -0.5
-            elif self.rect.top + dy > self.level.level_bounds[1][1]:
-                self.x_vel = 0.0
-            else:
-                target = self.rect.y + dy
-                if self.y_vel > 0 and target > self.patrol_path[self.patrol_path_index][1]:
-                    self.rect.y = self.patrol_path[self.patrol_path_index][1]
-                elif self.y_vel < 0 and target < self.patrol_path[self.patrol_path_index][1]:
-                    self.rect.y = self.patrol_path[self.patrol_path_index][1]
-                else:
-                    self.rect.y = target
+    def follow_path(self) -> None:
+        # the path's state is closed-form, so this is cheap enough to run every step even for blocks far from the player
+        if self.kinematic_path is not None and self.is_enabled and not self.hold:
+            x, y, self.x_vel, self.y_vel = self.kinematic_path.state(self.path_time)
+            self.rect.x, self.rect.y = round(x), round(y)
+            if self.level.player.is_slow_time:
+                self.x_vel /= 2
+                self.y_vel /= 2
+            if self.x_vel != 0:
+                self.direction = (MovementDirection.RIGHT if self.x_vel > 0 else MovementDirection.LEFT)
+        else:
+            self.x_vel = self.y_vel = 0.0
 
     def loop(self, dtime: float) -> float:
-        if self.is_enabled and not self.hold:
-            if not self.should_move_horiz:
-                self.x_vel = 0.0
-
-            if not self.should_move_vert:
-                self.y_vel = 0.0
-
-            if self.x_vel != 0 or self.y_vel != 0:
-                if self.level.player.is_slow_time:
-                    self.x_vel /= 2
-                    self.y_vel /= 2
-
-                self.move(self.x_vel * dtime, self.y_vel * dtime)
+        self.follow_path()
         return super().loop(dtime)
 
 
@@ -184,10 +192,10 @@ class Door(MovingBlock):
             self.is_locked = True
             if locked_coord_x is not None and locked_coord_y is not None and unlocked_coord_x is not None and unlocked_coord_y is not None:
                 self.locked_sprite = self.load_image(join(ASSETS_FOLDER, "Terrain", "Terrain.png"), width, height, image_master, locked_coord_x, locked_coord_y, retro=self.level.retro)
-                self.locked_mask = pygame.mask.from_surface(self.locked_sprite)
+                self.locked_mask = get_mask(self.locked_sprite)
                 self.unlocked_sprite = self.load_image(join(ASSETS_FOLDER, "Terrain", "Terrain.png"), width, height, image_master, unlocked_coord_x, unlocked_coord_y, retro=self.level.retro)
-                self.unlocked_mask = pygame.mask.from_surface(self.unlocked_sprite)
-                self.locked_mask = pygame.mask.from_surface(self.unlocked_sprite)
+                self.unlocked_mask = get_mask(self.unlocked_sprite)
+                self.locked_mask = get_mask(self.unlocked_sprite)
                 self.sprite = self.locked_sprite
                 self.mask = self.locked_mask
             else:
@@ -197,9 +205,9 @@ class Door(MovingBlock):
             self.is_locked = False
             if locked_coord_x is not None and locked_coord_y is not None and unlocked_coord_x is not None and unlocked_coord_y is not None:
                 self.locked_sprite = self.load_image(join(ASSETS_FOLDER, "Terrain", "Terrain.png"), width, height, image_master, locked_coord_x, locked_coord_y, retro=self.level.retro)
-                self.locked_mask = pygame.mask.from_surface(self.locked_sprite)
+                self.locked_mask = get_mask(self.locked_sprite)
                 self.unlocked_sprite = self.load_image(join(ASSETS_FOLDER, "Terrain", "Terrain.png"), width, height, image_master, unlocked_coord_x, unlocked_coord_y, retro=self.level.retro)
-                self.unlocked_mask = pygame.mask.from_surface(self.unlocked_sprite)
+                self.unlocked_mask = get_mask(self.unlocked_sprite)
                 self.sprite = self.unlocked_sprite
                 self.mask = self.unlocked_mask
             else:
@@ -212,14 +220,14 @@ class Door(MovingBlock):
 
     def open(self) -> None:
         if not self.is_locked:
-            self.patrol_path = self.patrol_path_open
+            self.set_patrol_path(self.patrol_path_open)
             self.is_open = True
             self.play_sound("door")
         else:
             self.play_sound("door_locked")
 
     def close(self) -> None:
-        self.patrol_path = self.patrol_path_closed
+        self.set_patrol_path(self.patrol_path_closed)
         self.is_open = False
         self.play_sound("door")
 
@@ -279,7 +287,7 @@ class MovableBlock(Block):
         self.should_move_horiz = self.should_move_vert = True
         for ent in self.level.get_entities_in_range((self.rect.x, self.rect.y), blocks_only=True, include_hazards=True):
             if ent != self and pygame.sprite.collide_rect(self, ent):
-                if pygame.sprite.collide_mask(self, ent) and ent.collide(self):
+                if collide_mask(self, ent) and ent.collide(self):
                     self.collide(ent)
                     overlap = self.rect.clip(ent.rect)
                     if overlap.width < overlap.height:
@@ -327,7 +335,7 @@ class MovableBlock(Block):
             self.x_vel = 0.0
 
         if self.should_move_vert:
-            self.y_vel += self.gravity
+            self.y_vel += self.gravity * dtime
         else:
             self.y_vel = 0.0
 
@@ -373,7 +381,7 @@ class Hazard(Block):
 
     def update_geo(self) -> None:
         self.rect = self.sprite.get_rect(topleft=(self.rect.x, self.rect.y))
-        self.mask = pygame.mask.from_surface(self.sprite)
+        self.mask = get_mask(self.sprite)
 
     def loop(self, dtime: float) -> float:
         self.animation_count += dtime
@@ -386,6 +394,7 @@ class Hazard(Block):
             self.update_sprite()
             self.update_geo()
             win.blit(self.sprite, (adj_x, adj_y))
+            profiler.count("blits")
 
 class MovingHazard(MovingBlock, Hazard):
     VELOCITY_TARGET = 500
@@ -427,6 +436,7 @@ class FallingHazard(Hazard):
         self.has_fired = False
         self.should_fire = False
         self.y_vel = 0.0
+        self.column = None
         self.cooldowns.update({"reset_time": 0.0, "landing_effect": 0.0})
 
     def update_sprite(self) -> int:
@@ -474,14 +484,14 @@ class FallingHazard(Hazard):
         if self.has_fired and self.cooldowns["reset_time"] <= 0:
             self.y_vel += self.gravity * dtime
 
-            ents = self.level.get_entities_in_range((self.rect.x, self.rect.y + self.y_vel), blocks_only=True)
+            ents = self.level.get_entities_in_range((self.rect.x, self.rect.y + (self.y_vel * dtime)), blocks_only=True)
             # this part lets falling hazards hit each other and cause those to fall too
             x = int(self.rect.x / self.level.block_size)
             if self.level.falling_hazards.get(x) is not None:
                 ents += self.level.falling_hazards[x]
 
             for ent in ents:
-                if ent != self and pygame.sprite.collide_rect(self, ent) and pygame.sprite.collide_mask(self, ent):
+                if ent != self and pygame.sprite.collide_rect(self, ent) and collide_mask(self, ent):
                     self.rect.bottom = ent.rect.top
                     self.y_vel = 0
                     self.play_sound("block_land")
@@ -492,7 +502,7 @@ class FallingHazard(Hazard):
                         self.cooldowns["reset_time"] += FallingHazard.RESET_DELAY
                     break
 
-            self.rect.y += self.y_vel
+            self.rect.y += self.y_vel * dtime
             if self.rect.y > self.level.level_bounds[1][1]:
                 self.cooldowns["reset_time"] += FallingHazard.RESET_DELAY
 
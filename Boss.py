@@ -1,10 +1,10 @@
 import math
 import asyncio
 import pygame
-import random
 from Actor import MovementState
 from NonPlayer import NonPlayer
 from Helpers import validate_file_list
+from RandomStreams import rng
 
 
 class Boss(NonPlayer):
@@ -62,7 +62,7 @@ class Boss(NonPlayer):
         if self.audios is not None and (self.state in [MovementState.WIND_UP, MovementState.ATTACK_ANIM, MovementState.WIND_DOWN]) and self.audio_trigger_frames.get(str(self.state)) is not None:
             audio_folder = f'{self.name.upper().split(" ",1)[0]}_{str(self.state)}'
             if self.audios.get(audio_folder) is not None and active_index in self.audio_trigger_frames[str(self.state)]:
-                self.active_audio = self.audios[audio_folder][random.randrange(len(self.audios[audio_folder]))]
+                self.active_audio = self.audios[audio_folder][rng.audio.randrange(len(self.audios[audio_folder]))]
                 if self.active_audio_channel is not None:
                     self.active_audio_channel.stop()
                     self.active_audio_channel = None
@@ -27,6 +27,8 @@ class Camera:
         self.scroll_wait_time: float = 0.0
         self.offset_x: float = 0.0
         self.offset_y: float = 0.0
+        self.previous_offset_x: float = 0.0
+        self.previous_offset_y: float = 0.0
         self.bg_tileset: list = []
         self.bg_image: pygame.Surface | None = None
         self.fg_image: pygame.Surface | None = None
@@ -37,6 +39,10 @@ class Camera:
         self.__get_background__()
         self.__get_foreground__()
 
+    def store_offset(self) -> None:
+        self.previous_offset_x = self.offset_x
+        self.previous_offset_y = self.offset_y
+
     def focus_point(self, x: float, y: float) -> None:
         self.focus_x = x
         self.focus_y = y
@@ -112,16 +118,25 @@ class Camera:
                 if self.level.retro:
                     self.fg_image = retroify_image(self.fg_image)
 
-    def draw(self, master_volume: dict[str, float], glitches: list=None) -> None:
-        visible_screen = pygame.Rect(self.offset_x, self.offset_y, self.width, self.height)
+    def draw(self, master_volume: dict[str, float], glitches: list=None, alpha: float=1.0) -> None:
+        # alpha is how far we are between the last two simulation steps, so everything is drawn where it would be right now
+        if alpha < 1.0:
+            offset_x = self.previous_offset_x + ((self.offset_x - self.previous_offset_x) * alpha)
+            offset_y = self.previous_offset_y + ((self.offset_y - self.previous_offset_y) * alpha)
+            self.level.interpolate_positions(alpha)
+        else:
+            offset_x = self.offset_x
+            offset_y = self.offset_y
+        visible_screen = pygame.Rect(offset_x, offset_y, self.width, self.height)
 
         if len(self.bg_tileset) == 1:
             self.win.blit(self.bg_image.subsurface(visible_screen), (0, 0))
         else:
             for tile in self.bg_tileset:
-                self.win.blit(self.bg_image, (tile[0] - self.offset_x, tile[1] - self.offset_y))
+                self.win.blit(self.bg_image, (tile[0] - offset_x, tile[1] - offset_y))
 
-        self.level.draw(self.win, self.offset_x, self.offset_y, master_volume)
+        self.level.draw(self.win, offset_x, offset_y, master_volume)
+        self.level.restore_positions()
 
         if self.fg_image is not None:
             self.win.blit(self.fg_image.subsurface(visible_screen), (0, 0))
@@ -1,19 +1,22 @@
-import random
 import time
 import pygame
 import pygame._sdl2.controller
 import sys
 from Menu import Menu, Selector, ButtonType
+from os.path import join
 from Helpers import display_text, DifficultyScale, load_images, load_level_images, load_picker_sprites, \
-    make_image_from_text
+    make_image_from_text, GAME_DATA_FOLDER
 from SaveLoadFunctions import save, save_player_profile
+from InputSource import LiveInput
+from Profiler import profiler
+from RandomStreams import rng
 
 
 class Controller:
-    KEYBOARD_LAYOUTS = {"ARROW_MOVE": {"keys_quicksave": [pygame.K_F5], "keys_cycle_layout": [pygame.K_F9], "keys_fullscreen_toggle": [pygame.K_F11], "keys_left": [pygame.K_LEFT], "keys_right": [pygame.K_RIGHT], "keys_crouch_uncrouch": [pygame.K_DOWN], "keys_jump": [pygame.K_UP], "keys_teleport_dash": [pygame.K_LSHIFT, pygame.K_RSHIFT, pygame.K_KP_PLUS], "keys_pause_unpause": [pygame.K_ESCAPE], "keys_attack": [pygame.K_d], "keys_block": [pygame.K_a], "keys_bullet_time": [pygame.K_SPACE, pygame.K_KP0], "keys_grow": [pygame.K_w], "keys_shrink": [pygame.K_s]},
-                        "WASD_MOVE": {"keys_quicksave": [pygame.K_F5], "keys_cycle_layout": [pygame.K_F9], "keys_fullscreen_toggle": [pygame.K_F11], "keys_left": [pygame.K_a], "keys_right": [pygame.K_d], "keys_crouch_uncrouch": [pygame.K_s], "keys_jump": [pygame.K_w], "keys_teleport_dash": [pygame.K_LSHIFT, pygame.K_RSHIFT, pygame.K_KP_PLUS], "keys_pause_unpause": [pygame.K_ESCAPE], "keys_attack": [pygame.K_LEFT, pygame.K_KP4], "keys_block": [pygame.K_RIGHT, pygame.K_KP6], "keys_bullet_time": [pygame.K_SPACE, pygame.K_KP0], "keys_grow": [pygame.K_UP, pygame.K_KP8], "keys_shrink": [pygame.K_DOWN, pygame.K_KP5]},
-                        "NUMPAD_MOVE": {"keys_quicksave": [pygame.K_F5], "keys_cycle_layout": [pygame.K_F9], "keys_fullscreen_toggle": [pygame.K_F11], "keys_left": [pygame.K_KP4], "keys_right": [pygame.K_KP6], "keys_crouch_uncrouch": [pygame.K_KP5], "keys_jump": [pygame.K_KP8], "keys_teleport_dash": [pygame.K_LSHIFT, pygame.K_RSHIFT, pygame.K_KP_PLUS],  "keys_pause_unpause": [pygame.K_ESCAPE], "keys_attack": [pygame.K_d], "keys_block": [pygame.K_a], "keys_bullet_time": [pygame.K_SPACE, pygame.K_KP0], "keys_grow": [pygame.K_w], "keys_shrink": [pygame.K_s]},
-                        "ALT_NUMPAD_MOVE": {"keys_quicksave": [pygame.K_F5], "keys_cycle_layout": [pygame.K_F9], "keys_fullscreen_toggle": [pygame.K_F11], "keys_left": [pygame.K_KP4], "keys_right": [pygame.K_KP6], "keys_crouch_uncrouch": [pygame.K_KP5], "keys_jump": [pygame.K_KP8], "keys_teleport_dash": [pygame.K_LSHIFT, pygame.K_RSHIFT, pygame.K_KP_PLUS],  "keys_pause_unpause": [pygame.K_ESCAPE], "keys_attack": [pygame.K_a], "keys_block": [pygame.K_d], "keys_bullet_time": [pygame.K_SPACE, pygame.K_KP0], "keys_grow": [pygame.K_w], "keys_shrink": [pygame.K_s]}}
+    KEYBOARD_LAYOUTS = {"ARROW_MOVE": {"keys_quicksave": [pygame.K_F5], "keys_cycle_layout": [pygame.K_F9], "keys_fullscreen_toggle": [pygame.K_F11], "keys_profiler": [pygame.K_F3], "keys_trace": [pygame.K_F4], "keys_left": [pygame.K_LEFT], "keys_right": [pygame.K_RIGHT], "keys_crouch_uncrouch": [pygame.K_DOWN], "keys_jump": [pygame.K_UP], "keys_teleport_dash": [pygame.K_LSHIFT, pygame.K_RSHIFT, pygame.K_KP_PLUS], "keys_pause_unpause": [pygame.K_ESCAPE], "keys_attack": [pygame.K_d], "keys_block": [pygame.K_a], "keys_bullet_time": [pygame.K_SPACE, pygame.K_KP0], "keys_grow": [pygame.K_w], "keys_shrink": [pygame.K_s]},
+                        "WASD_MOVE": {"keys_quicksave": [pygame.K_F5], "keys_cycle_layout": [pygame.K_F9], "keys_fullscreen_toggle": [pygame.K_F11], "keys_profiler": [pygame.K_F3], "keys_trace": [pygame.K_F4], "keys_left": [pygame.K_a], "keys_right": [pygame.K_d], "keys_crouch_uncrouch": [pygame.K_s], "keys_jump": [pygame.K_w], "keys_teleport_dash": [pygame.K_LSHIFT, pygame.K_RSHIFT, pygame.K_KP_PLUS], "keys_pause_unpause": [pygame.K_ESCAPE], "keys_attack": [pygame.K_LEFT, pygame.K_KP4], "keys_block": [pygame.K_RIGHT, pygame.K_KP6], "keys_bullet_time": [pygame.K_SPACE, pygame.K_KP0], "keys_grow": [pygame.K_UP, pygame.K_KP8], "keys_shrink": [pygame.K_DOWN, pygame.K_KP5]},
+                        "NUMPAD_MOVE": {"keys_quicksave": [pygame.K_F5], "keys_cycle_layout": [pygame.K_F9], "keys_fullscreen_toggle": [pygame.K_F11], "keys_profiler": [pygame.K_F3], "keys_trace": [pygame.K_F4], "keys_left": [pygame.K_KP4], "keys_right": [pygame.K_KP6], "keys_crouch_uncrouch": [pygame.K_KP5], "keys_jump": [pygame.K_KP8], "keys_teleport_dash": [pygame.K_LSHIFT, pygame.K_RSHIFT, pygame.K_KP_PLUS],  "keys_pause_unpause": [pygame.K_ESCAPE], "keys_attack": [pygame.K_d], "keys_block": [pygame.K_a], "keys_bullet_time": [pygame.K_SPACE, pygame.K_KP0], "keys_grow": [pygame.K_w], "keys_shrink": [pygame.K_s]},
+                        "ALT_NUMPAD_MOVE": {"keys_quicksave": [pygame.K_F5], "keys_cycle_layout": [pygame.K_F9], "keys_fullscreen_toggle": [pygame.K_F11], "keys_profiler": [pygame.K_F3], "keys_trace": [pygame.K_F4], "keys_left": [pygame.K_KP4], "keys_right": [pygame.K_KP6], "keys_crouch_uncrouch": [pygame.K_KP5], "keys_jump": [pygame.K_KP8], "keys_teleport_dash": [pygame.K_LSHIFT, pygame.K_RSHIFT, pygame.K_KP_PLUS],  "keys_pause_unpause": [pygame.K_ESCAPE], "keys_attack": [pygame.K_a], "keys_block": [pygame.K_d], "keys_bullet_time": [pygame.K_SPACE, pygame.K_KP0], "keys_grow": [pygame.K_w], "keys_shrink": [pygame.K_s]}}
     GAMEPAD_LAYOUTS = {"SWITCH PRO": {"button_up": pygame.CONTROLLER_BUTTON_DPAD_UP, "button_down": pygame.CONTROLLER_BUTTON_DPAD_DOWN, "button_quicksave": pygame.CONTROLLER_BUTTON_BACK, "button_left": pygame.CONTROLLER_BUTTON_DPAD_LEFT, "button_right": pygame.CONTROLLER_BUTTON_DPAD_RIGHT, "axis_vert": pygame.CONTROLLER_AXIS_LEFTY, "axis_horiz": pygame.CONTROLLER_AXIS_LEFTX, "button_crouch_uncrouch": pygame.CONTROLLER_BUTTON_B, "button_jump": pygame.CONTROLLER_BUTTON_A, "button_teleport_dash": pygame.CONTROLLER_BUTTON_X, "button_pause_unpause": pygame.CONTROLLER_BUTTON_START, "axis_attack": pygame.CONTROLLER_AXIS_TRIGGERRIGHT, "axis_block": pygame.CONTROLLER_AXIS_TRIGGERLEFT, "button_bullet_time": pygame.CONTROLLER_BUTTON_Y, "button_grow": pygame.CONTROLLER_BUTTON_RIGHTSHOULDER, "button_shrink": pygame.CONTROLLER_BUTTON_LEFTSHOULDER},
                         "XBOX": {"button_up": pygame.CONTROLLER_BUTTON_DPAD_UP, "button_down": pygame.CONTROLLER_BUTTON_DPAD_DOWN, "button_quicksave": pygame.CONTROLLER_BUTTON_BACK, "button_left": pygame.CONTROLLER_BUTTON_DPAD_LEFT, "button_right": pygame.CONTROLLER_BUTTON_DPAD_RIGHT, "axis_vert": pygame.CONTROLLER_AXIS_LEFTY, "axis_horiz": pygame.CONTROLLER_AXIS_LEFTX, "button_crouch_uncrouch": pygame.CONTROLLER_BUTTON_B, "button_jump": pygame.CONTROLLER_BUTTON_A, "button_teleport_dash": pygame.CONTROLLER_BUTTON_X, "button_pause_unpause": pygame.CONTROLLER_BUTTON_START, "axis_attack": pygame.CONTROLLER_AXIS_TRIGGERRIGHT, "axis_block": pygame.CONTROLLER_AXIS_TRIGGERLEFT, "button_bullet_time": pygame.CONTROLLER_BUTTON_Y, "button_grow": pygame.CONTROLLER_BUTTON_RIGHTSHOULDER, "button_shrink": pygame.CONTROLLER_BUTTON_LEFTSHOULDER},
                         "PS4": {"button_up": pygame.CONTROLLER_BUTTON_DPAD_UP, "button_down": pygame.CONTROLLER_BUTTON_DPAD_DOWN, "button_quicksave": pygame.CONTROLLER_BUTTON_BACK, "button_left": pygame.CONTROLLER_BUTTON_DPAD_LEFT, "button_right": pygame.CONTROLLER_BUTTON_DPAD_RIGHT, "axis_vert": pygame.CONTROLLER_AXIS_LEFTY, "axis_horiz": pygame.CONTROLLER_AXIS_LEFTX, "button_crouch_uncrouch": pygame.CONTROLLER_BUTTON_B, "button_jump": pygame.CONTROLLER_BUTTON_A, "button_teleport_dash": pygame.CONTROLLER_BUTTON_X, "button_pause_unpause": pygame.CONTROLLER_BUTTON_START, "axis_attack": pygame.CONTROLLER_AXIS_TRIGGERRIGHT, "axis_block": pygame.CONTROLLER_AXIS_TRIGGERLEFT, "button_bullet_time": pygame.CONTROLLER_BUTTON_Y, "button_grow": pygame.CONTROLLER_BUTTON_RIGHTSHOULDER, "button_shrink": pygame.CONTROLLER_BUTTON_LEFTSHOULDER},
@@ -53,7 +56,7 @@ class Controller:
         difficulty_images = [make_image_from_text(256, 128, "EASIEST", ["Agent is much stronger", "Agent can survive huge falls", "Enemies are much weaker", "Enemy sight ranges are visible"], border=5), make_image_from_text(256, 128, "EASY", ["Agent is stronger", "Agent can survive big falls", "Enemies are weaker", "Enemy sight ranges are visible"], border=5), make_image_from_text(256, 128, "MEDIUM", ["Agent is normal strength", "Agent can survive moderate falls", "Enemies are normal strength", "Enemy sight ranges are not visible"], border=5), make_image_from_text(256, 128, "HARD", ["Agent is weaker", "Agent can survive small falls", "Enemies are stronger", "Enemy sight ranges are not visible"], border=5), make_image_from_text(256, 128, "HARDEST", ["Agent is much weaker", "Agent can survive tiny falls", "Enemies are much stronger", "Enemy sight ranges are not visible"], border=5)]
         self.difficulty_picker = Selector(self, "CHOOSE DIFFICULTY", ["You can change this at any time."], difficulty_images, [DifficultyScale.EASIEST, DifficultyScale.EASY, DifficultyScale.MEDIUM, DifficultyScale.HARD, DifficultyScale.HARDEST], index=2)
         sprite_images, sprite_values = load_picker_sprites("Sprites")
-        self.sprite_picker = Selector(self, "CHOOSE PLAYER", ["This is a visual choice only.", "Anyone can be an Agent."], sprite_images, sprite_values, index=2 * random.randrange(0, len(sprite_images['normal']) // 2))
+        self.sprite_picker = Selector(self, "CHOOSE PLAYER", ["This is a visual choice only.", "Anyone can be an Agent."], sprite_images, sprite_values, index=2 * rng.cosmetic.randrange(0, len(sprite_images['normal']) // 2))
         self.level_selected = None
         level_images, level_values = load_level_images("LevelImages")
         self.level_picker = Selector(self, "CHOOSE LEVEL", None, level_images, level_values)
@@ -63,6 +66,7 @@ class Controller:
             self.set_keyboard_layout(layout)
         self.gamepad = None
         self.active_gamepad_layout = None
+        self.input_source = LiveInput(self)
         self.keyboard_layout_picker = Selector(self, "KEYBOARD LAYOUT", ["This can be cycled with the F9 key."], load_images("Menu", "Keyboards").values(), list(self.KEYBOARD_LAYOUTS.keys()))
         self.gamepad_layout_picker = Selector(self, "CONTROLLER LAYOUT", ["This is detected when you connect a controller."], load_images("Menu", "Controllers").values(), list(self.GAMEPAD_LAYOUTS.keys()), accept_only=True)
         self.music = None
@@ -70,13 +74,14 @@ class Controller:
         self.should_hot_swap_level = False
         self.should_scroll_to_point = None
         self.active_objective: str | None = None
+        self.can_save: bool = True
 
     def activate_objective(self, name: str | None, value: bool, popup: bool=True) -> None:
         self.active_objective = name
 
         if name is not None:
             text = None
-            for objective in self.level.objectives:
+            for objective in self.level.registry.objective_group(name):
                 if name.casefold() == objective.name.casefold():
                     objective.is_active = value
                     if text is None and objective.text is not None:
@@ -98,13 +103,15 @@ class Controller:
         return self.force_retro or (self.level is not None and self.level.retro)
 
     def save(self):
-        save(self.level, self.hud, self)
+        if self.can_save:
+            save(self.level, self.hud, self)
 
     def save_player_profile(self):
         save_player_profile(self, self.level)
 
     def quit(self):
         self.save_player_profile()
+        profiler.stop_trace()
         self.discord.close()
         if pygame._sdl2.controller.get_init():
             pygame._sdl2.controller.quit()
@@ -635,26 +642,33 @@ class Controller:
         return False
 
     def handle_single_input(self, key, win) -> float:
-        if key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_pause_unpause'] or (self.gamepad is not None and key == Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_pause_unpause']):
+        if key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_pause_unpause'] or (self.input_source.has_gamepad and key == Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_pause_unpause']):
             return self.pause()
-        elif key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_quicksave'] or (self.gamepad is not None and key == Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_quicksave']):
+        elif key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_quicksave'] or (self.input_source.has_gamepad and key == Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_quicksave']):
             self.save()
         elif key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_cycle_layout']:
             return self.cycle_keyboard_layout(win)
         elif key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_fullscreen_toggle']:
             pygame.display.toggle_fullscreen()
+        elif key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_profiler']:
+            profiler.toggle()
+        elif key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_trace']:
+            if profiler.trace_file is None:
+                profiler.start_trace(join(GAME_DATA_FOLDER, f'trace_{time.strftime("%Y%m%d_%H%M%S", time.gmtime(time.time()))}.json'))
+            else:
+                profiler.stop_trace()
         elif self.should_scroll_to_point is None:
-            if key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_crouch_uncrouch'] or (self.gamepad is not None and key == Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_crouch_uncrouch']):
+            if key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_crouch_uncrouch'] or (self.input_source.has_gamepad and key == Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_crouch_uncrouch']):
                 self.level.player.toggle_crouch()
-            elif key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_jump'] or (self.gamepad is not None and key == Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_jump']):
+            elif key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_jump'] or (self.input_source.has_gamepad and key == Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_jump']):
                 self.level.player.jump()
-            elif key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_teleport_dash'] or (self.gamepad is not None and key == Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_teleport_dash']):
+            elif key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_teleport_dash'] or (self.input_source.has_gamepad and key == Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_teleport_dash']):
                 self.level.player.teleport()
-            elif key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_bullet_time'] or (self.gamepad is not None and key == Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_bullet_time']):
+            elif key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_bullet_time'] or (self.input_source.has_gamepad and key == Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_bullet_time']):
                 self.level.player.bullet_time()
-            elif key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_grow'] or (self.gamepad is not None and key == Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_grow']):
+            elif key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_grow'] or (self.input_source.has_gamepad and key == Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_grow']):
                 self.level.player.grow()
-            elif key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_shrink'] or (self.gamepad is not None and key == Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_shrink']):
+            elif key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_shrink'] or (self.input_source.has_gamepad and key == Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_shrink']):
                 self.level.player.shrink()
         return 0.0
 
@@ -666,8 +680,8 @@ class Controller:
         player_is_moving = False
         player_is_attacking = False
 
-        if self.gamepad is not None:
-            stick = self.gamepad.get_axis(Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['axis_horiz'])
+        if self.input_source.has_gamepad:
+            stick = self.input_source.get_axis(Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['axis_horiz'])
             if not player_is_moving and stick is not None:
                 if stick > Controller.JOYSTICK_TOLERANCE:
                     player_is_moving = True
@@ -677,19 +691,19 @@ class Controller:
                     self.level.player.move_left()
 
             if not player_is_moving and Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_right'] is not None and Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_left'] is not None:
-                if self.gamepad.get_button(Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_right']):
+                if self.input_source.get_button(Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_right']):
                     player_is_moving = True
                     self.level.player.move_right()
-                elif self.gamepad.get_button(Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_left']):
+                elif self.input_source.get_button(Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['button_left']):
                     player_is_moving = True
                     self.level.player.move_left()
 
-            stick = self.gamepad.get_axis(Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['axis_attack'])
+            stick = self.input_source.get_axis(Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['axis_attack'])
             if not player_is_attacking and stick is not None and stick > Controller.JOYSTICK_TOLERANCE:
                 player_is_attacking = True
                 dtime_offset += self.level.player.attack()
 
-        keys = pygame.key.get_pressed()
+        keys = self.input_source.get_pressed()
 
         if not player_is_moving:
             for input_key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_right']:
@@ -717,8 +731,8 @@ class Controller:
         if not player_is_moving:
             self.level.player.stop()
 
-        if self.gamepad is not None:
-            stick = self.gamepad.get_axis(Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['axis_block'])
+        if self.input_source.has_gamepad:
+            stick = self.input_source.get_axis(Controller.GAMEPAD_LAYOUTS[self.active_gamepad_layout]['axis_block'])
             if stick is not None and stick > Controller.JOYSTICK_TOLERANCE:
                 self.level.player.block()
         for input_key in Controller.KEYBOARD_LAYOUTS[self.active_keyboard_layout]['keys_block']:
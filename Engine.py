@@ -1,5 +1,4 @@
 import pygame
-from Block import Block
 from SteamworksConnection import SteamworksConnection
 from Helpers import load_json_dict, load_object_dicts, load_levels, load_audios, display_text, DifficultyScale, \
     handle_exception, load_text_from_file, ASSETS_FOLDER, retroify_image, load_images
@@ -15,6 +14,13 @@ discord.set_status(details="In the menu:", state="Gathering intel")
 
 WIDTH, HEIGHT = 1920, 1080
 FPS_TARGET = 150
+SIMULATION_RATE = 150
+MAX_SIMULATION_STEPS = 8
+ASSET_CACHE_BUDGET = 512 * 1024 * 1024
+# the next level is only built in the background when the asset cache has at least this much room left (0 turns it off)
+PRELOAD_BUDGET = 128 * 1024 * 1024
+# how much of every frame goes to building the next level during play
+PRELOAD_SLICE = 0.002
 
 icon = join(ASSETS_FOLDER, "Icons", "icon_small.png")
 if isfile(icon):
@@ -26,18 +32,27 @@ WINDOW = pygame.display.set_mode((WIDTH, HEIGHT), flags=pygame.SCALED)
 pygame.display.set_caption("AGENT GLITCH")
 
 
-import math
-import random
+import os
+import sys
 import time as tm
 import traceback
 from Cinematics import *
 from Controller import Controller
 from Level import Level
 from HUD import HUD
-from NonPlayer import NonPlayer
 from Camera import Camera
+from Simulation import simulate
+from Profiler import profiler
+from RandomStreams import rng
+from AssetCache import AssetCache
+from LevelLoader import LevelLoader, LevelPreloader, run_steps
+from LevelCompiler import LevelCompiler
+from InputSource import RecordingInput
 from SaveLoadFunctions import *
 
+# with --record, every mission played is written to GameData/Recordings, to be replayed (and timed) with Headless.py --replay
+RECORD_INPUT = "--record" in sys.argv
+
 def main(win):
 
     pygame.mouse.set_visible(False)
@@ -79,6 +94,53 @@ def main(win):
         title_screen_retro_file = title_screen_file
 
     camera = Camera(win)
+    # decoded images and sounds are kept between levels, so restarts and level changes don't go back to disk for them
+    assets = AssetCache(max_bytes=ASSET_CACHE_BUDGET)
+    vfx_manager = None
+
+    def __prepare_level__(name, report) -> dict:
+        # only files and plain data in here (the compiled layout and decoded sounds), so it can run on a worker thread
+        report("Loading mission... [2/3]")
+        layout = LevelCompiler.load(name, levels[name], objects_dict[name], Level.get_block_size(meta_dict[name]))
+        player_audio = assets.get_or_load(("audio", "Actors"), lambda: load_audios("Actors"))
+        report("Loading mission... [2/3]")
+        block_audio = assets.get_or_load(("audio", "Blocks"), lambda: load_audios("Blocks"))
+        report("Loading mission... [2/3]")
+        message_audio = assets.get_or_load(("audio", "Messages", name), lambda: load_audios("Messages", dir2=name, suppress_error=True))
+        return {"name": name, "layout": layout, "player_audio": player_audio, "block_audio": block_audio, "message_audio": message_audio}
+
+    def __build_steps__(data):
+        # everything that makes surfaces happens here, on the main thread, either straight through behind the loading screen or a slice a frame during the last level
+        yield "Loading mission... [3/3]", None
+        level_vfx_manager = (VisualEffectsManager(join(ASSETS_FOLDER, "VisualEffects")) if vfx_manager is None else vfx_manager)
+        new_level = yield from Level.build(data["name"], levels, meta_dict, objects_dict, assets, assets, data["player_audio"], data["player_audio"], data["block_audio"], data["message_audio"], level_vfx_manager, win, controller, layout=data["layout"])
+        yield "Initializing controls...", None
+        return level_vfx_manager, new_level, HUD(new_level.player, win, image_master=assets, retro=new_level.retro)
+
+    def __build_level__(data):
+        return rng.isolated("loading", __build_steps__(data))
+
+    def __take_or_prepare__(name, report):
+        # the next level may already have been read (and partly or fully built) during the last one, otherwise it's read here and built from scratch
+        steps = preloader.take(__level_key__(name))
+        return (__build_level__(__prepare_level__(name, report)) if steps is None else steps)
+
+    def __level_key__(name) -> tuple:
+        # a level built for another difficulty or player sprite can't be reused, so those are part of what it was built for
+        return name, controller.difficulty, controller.retro, controller.player_sprite_selected
+
+    # the data is read on a worker, and the level itself is then built on the main thread in slices between frames
+    preloader = LevelPreloader(__prepare_level__, PRELOAD_BUDGET, build=__build_level__)
+
+    def __preload_successor__(current) -> None:
+        successor = current.get_successor()
+        if successor is not None and levels.get(successor) is not None and meta_dict.get(successor) is not None:
+            preloader.start(__level_key__(successor), assets.headroom)
+
+    def __save_recording__(recorder) -> None:
+        controller.input_source = recorder.source
+        os.makedirs(join(GAME_DATA_FOLDER, "Recordings"), exist_ok=True)
+        recorder.save(join(GAME_DATA_FOLDER, "Recordings", f'{recorder.header["level"]}_{tm.strftime("%Y%m%d_%H%M%S", tm.gmtime(tm.time()))}.agr'))
 
     if pygame.joystick.get_count() > 0:
         controller.enable_gamepad(notify=False)
@@ -125,17 +187,17 @@ def main(win):
         controller.goto_main = False
         load_data = None
         cur_level = None
+        level = None
+        level_key = None
         while True:
             # THIS PART LOADS EVERYTHING: #
-            loading_screen = list(loading_screens.values())[random.randint(0, len(loading_screens) - 1)]
+            loading_screen = list(loading_screens.values())[rng.cosmetic.randint(0, len(loading_screens) - 1)]
             if controller.retro:
                 loading_screen = retroify_image(loading_screen)
             scale_factor = min(win.get_width() / loading_screen.get_width(), win.get_height() / loading_screen.get_height())
             loading_screen = pygame.transform.scale_by(loading_screen, scale_factor)
-            win.fill((0, 0, 0))
-            win.blit(loading_screen, ((win.get_width() - loading_screen.get_width()) / 2, (win.get_height() - loading_screen.get_height()) / 2))
-            display_text("Loading mission... [1/3]", controller, min_pause_time=0, should_sleep=False, retro=controller.retro, background=True)
             should_load = False
+            previous_level = None
             if new_game:
                 cur_level = meta_dict["MAIN_MENU"]["start_level"]
                 controller.save_player_profile()
@@ -147,43 +209,42 @@ def main(win):
                     should_load = True
             elif controller.goto_restart:
                 controller.goto_restart = False
+                previous_level = (level if level_key == __level_key__(cur_level) else None)
             elif controller.level_selected is not None:
                 cur_level = controller.level_selected
                 controller.level_selected = None
             controller.goto_load = False
-            win.fill((0, 0, 0))
-            win.blit(loading_screen, ((win.get_width() - loading_screen.get_width()) / 2, (win.get_height() - loading_screen.get_height()) / 2))
-            display_text("Loading mission... [2/3]", controller, min_pause_time=0, should_sleep=False, retro=controller.retro, background=True)
-            player_audio = enemy_audio = load_audios("Actors")
-            block_audio = load_audios("Blocks")
-            message_audio = load_audios("Messages", dir2=cur_level, suppress_error=True)
-            vfx_manager = VisualEffectsManager(join(ASSETS_FOLDER, "VisualEffects"))
-            win.fill((0, 0, 0))
-            win.blit(loading_screen, ((win.get_width() - loading_screen.get_width()) / 2, (win.get_height() - loading_screen.get_height()) / 2))
-            display_text("Loading mission... [3/3]", controller, min_pause_time=0, should_sleep=False, retro=controller.retro, background=True)
-            controller.level = level = Level(cur_level, levels, meta_dict, objects_dict, {}, {}, player_audio, enemy_audio, block_audio, message_audio, vfx_manager, win, controller, loading_screen)
-
-            win.fill((0, 0, 0))
-            win.blit(loading_screen, ((win.get_width() - loading_screen.get_width()) / 2, (win.get_height() - loading_screen.get_height()) / 2))
-            display_text("Loading agent...", controller, min_pause_time=0, should_sleep=False, retro=level.retro, background=True)
-
-            win.fill((0, 0, 0))
-            win.blit(loading_screen, ((win.get_width() - loading_screen.get_width()) / 2, (win.get_height() - loading_screen.get_height()) / 2))
-            display_text("Initializing controls...", controller, min_pause_time=0, should_sleep=False, retro=level.retro, background=True)
-            controller.hud = hud = HUD(level.player, win, retro=level.retro)
+
+            # a level that was built all the way during the last one is just swapped in, without any of the loading screens
+            prepared = preloader.is_built(__level_key__(cur_level))
+            if prepared:
+                vfx_manager, level, hud = run_steps(preloader.take(__level_key__(cur_level)))
+            else:
+                win.fill((0, 0, 0))
+                win.blit(loading_screen, ((win.get_width() - loading_screen.get_width()) / 2, (win.get_height() - loading_screen.get_height()) / 2))
+                display_text("Loading mission... [1/3]", controller, min_pause_time=0, should_sleep=False, retro=controller.retro, background=True)
+                loader = LevelLoader(win, controller, loading_screen, retro=controller.retro)
+                vfx_manager, level, hud = loader.run(lambda report: __take_or_prepare__(cur_level, report), run_steps)
+            level.keep_hot_swap(previous_level)
+            level_key = __level_key__(cur_level)
+            controller.level = level
+            controller.hud = hud
 
             if should_load:
                 load_part2(load_data, controller.level, controller)
             controller.save()
 
-            win.fill((0, 0, 0))
-            win.blit(loading_screen, ((win.get_width() - loading_screen.get_width()) / 2, (win.get_height() - loading_screen.get_height()) / 2))
-            funny_loading_text = ["Applying finishing touches", "Applying one last coat of paint", "Almost done", "Any minute now", "Nearly there", "One more thing", "Tidying up", "Training agent", "Catching the train", "Finishing lunch", "Folding laundry"]
-            display_text(f'{funny_loading_text[random.randint(0, len(funny_loading_text) - 1)]}...', controller, min_pause_time=0, should_sleep=False, retro=level.retro, background=True)
+            if not prepared:
+                win.fill((0, 0, 0))
+                win.blit(loading_screen, ((win.get_width() - loading_screen.get_width()) / 2, (win.get_height() - loading_screen.get_height()) / 2))
+                funny_loading_text = ["Applying finishing touches", "Applying one last coat of paint", "Almost done", "Any minute now", "Nearly there", "One more thing", "Tidying up", "Training agent", "Catching the train", "Finishing lunch", "Folding laundry"]
+                display_text(f'{funny_loading_text[rng.cosmetic.randint(0, len(funny_loading_text) - 1)]}...', controller, min_pause_time=0, should_sleep=False, retro=level.retro, background=True)
 
             camera.prepare(level, hud)
             camera.scroll_to_player(0)
 
+            __preload_successor__(level)
+
             controller.discord.set_status(details="On a mission:", state=controller.level.display_name)
 
             # FROM HERE, THE LEVEL ACTUALLY STARTS: #
@@ -209,21 +270,31 @@ def main(win):
             else:
                 controller.activate_objective(controller.active_objective, True)
             dtime_offset: float = 0.0
+            sim_dtime: float = 1 / SIMULATION_RATE
+            accumulator: float = 0.0
             glitch_timer = 0
             glitches = None
             next_level = None
+            level.store_positions()
+            camera.store_offset()
+            recorder = None
+            if RECORD_INPUT:
+                # every random stream is reseeded here, so a replay starts from exactly the same place as this run
+                recorder = controller.input_source = RecordingInput(controller.input_source, controller, level, rng.reseed(), save_data=(load_data if should_load else None))
             clock.tick(FPS_TARGET)
 
             # MAIN GAME LOOP: #
             while True:
-                dtime: float = (clock.tick(FPS_TARGET) / 1000) - dtime_offset
+                frame_time: float = max((clock.tick(FPS_TARGET) / 1000) - dtime_offset, 0.0)
                 dtime_offset = 0.0
-                level.time += dtime
+                profiler.begin_frame()
+                if recorder is not None:
+                    recorder.begin_frame(frame_time)
 
                 if hud.save_icon_timer > 0:
-                    hud.save_icon_timer -= dtime
+                    hud.save_icon_timer -= frame_time
                 if glitch_timer > 0:
-                    glitch_timer -= dtime
+                    glitch_timer -= frame_time
                     if glitch_timer <= 0:
                         glitch_timer = 0
                         glitches = None
@@ -231,24 +302,35 @@ def main(win):
                 while level.cinematics is not None and len(level.cinematics.queued) > 0:
                     dtime_offset += level.cinematics.play_queue(win)
 
+                profiler.start("events")
                 for event in pygame.event.get():
                     match event.type:
                         case pygame.QUIT:
                             controller.save()
+                            if recorder is not None:
+                                __save_recording__(recorder)
                             controller.quit()
                         case pygame.JOYDEVICEADDED:
                             dtime_offset += controller.enable_gamepad(notify=True)
                         case pygame.JOYDEVICEREMOVED:
                             dtime_offset += controller.disable_gamepad(notify=True)
                         case pygame.KEYDOWN:
+                            if recorder is not None:
+                                recorder.press(event.key)
                             dtime_offset += controller.handle_single_input(event.key, win)
                         case pygame.KEYUP:
                             # DEV ONLY if event.key == pygame.K_F2:
                             # DEV ONLY    level.gen_background()
+                            if recorder is not None:
+                                recorder.release()
                             level.player.stop()
                         case pygame.JOYBUTTONDOWN:
+                            if recorder is not None:
+                                recorder.press(event.button)
                             dtime_offset += controller.handle_single_input(event.button, win)
                         case pygame.JOYBUTTONUP:
+                            if recorder is not None:
+                                recorder.release()
                             level.player.stop()
                         case pygame.USEREVENT:
                             pygame.mixer.music.play()
@@ -256,7 +338,10 @@ def main(win):
                                 controller.cycle_music()
                         case _:
                             pass
+                profiler.stop("events")
+                profiler.start("input")
                 dtime_offset += controller.handle_continuous_input()
+                profiler.stop("input")
                 if (controller.goto_load and isfile(join(GAME_DATA_FOLDER, "save.p"))) or controller.goto_main or controller.goto_restart or (controller.next_level is not None):
                     break
 
@@ -267,38 +352,53 @@ def main(win):
                     else:
                         dtime_offset += level.player.revert()
 
-                vfx_manager.manage(dtime)
-
-                for ent in level.entities:
-                    if (not isinstance(ent, Actor) and not type(ent) is Block) or (isinstance(ent, Actor) and math.dist(ent.rect.center, (camera.focus_x, camera.focus_y)) < win.get_width() * 1.5):
-                        if hasattr(ent, "patrol") and callable(ent.patrol):
-                            ent.patrol(dtime)
-                        dtime_offset += ent.loop(dtime)
-                        if isinstance(ent, NonPlayer) and ent.queued_message is not None:
-                            dtime_offset += ent.play_queued_message()
-                level.purge()
+                # the simulation always advances in fixed steps, however long the frame took, so physics doesn't depend on the frame rate
+                accumulator += frame_time
+                steps = 0
+                while accumulator >= sim_dtime and steps < MAX_SIMULATION_STEPS:
+                    level.store_positions()
+                    camera.store_offset()
+                    dtime_offset += simulate(level, sim_dtime, (camera.focus_x, camera.focus_y), win.get_width() * 1.5)
+
+                    if controller.should_scroll_to_point is not None:
+                        camera.focus_player = False
+                        if camera.scroll_to_point(sim_dtime, controller.should_scroll_to_point["coords"][0], controller.should_scroll_to_point["coords"][1], target_wait_time=controller.should_scroll_to_point["time"]):
+                            camera.focus_player = True
+                            controller.should_scroll_to_point = None
+                    else:
+                        camera.scroll_to_player(sim_dtime)
 
-                for effect in level.particle_effects:
-                    effect.loop(dtime)
+                    accumulator -= sim_dtime
+                    steps += 1
+                if steps >= MAX_SIMULATION_STEPS:
+                    # we've fallen too far behind to catch up, so drop the backlog rather than spiral
+                    accumulator = min(accumulator, sim_dtime)
 
-                if level.can_glitch and glitch_timer <= 0 and random.randint(0, 100) / 100 > level.player.hp / level.player.max_hp:
+                if level.can_glitch and glitch_timer <= 0 and rng.cosmetic.randint(0, 100) / 100 > level.player.hp / level.player.max_hp:
                     glitches = glitch((1 - max(level.player.hp / level.player.max_hp, 0)) / 2, win)
                     glitch_timer = 0.1
 
-                camera.draw(controller.master_volume, glitches=glitches)
+                profiler.start("draw")
+                camera.draw(controller.master_volume, glitches=glitches, alpha=accumulator / sim_dtime)
+                profiler.stop("draw")
+                profiler.start("display")
                 pygame.display.update()
-
-                if controller.should_scroll_to_point is not None:
-                    camera.focus_player = False
-                    if camera.scroll_to_point(dtime, controller.should_scroll_to_point["coords"][0], controller.should_scroll_to_point["coords"][1], target_wait_time=controller.should_scroll_to_point["time"]):
-                        camera.focus_player = True
-                        controller.should_scroll_to_point = None
-                else:
-                    camera.scroll_to_player(dtime)
+                profiler.stop("display")
+                profiler.start("preload")
+                preloader.advance(PRELOAD_SLICE)
+                profiler.stop("preload")
+                profiler.end_frame()
 
                 if controller.should_hot_swap_level:
                     controller.should_hot_swap_level = False
-                    if level.hot_swap_level is not None:
+                    if level.has_hot_swap:
+                        if recorder is not None:
+                            # a replay only ever covers one level, so the recording stops where this one does
+                            __save_recording__(recorder)
+                            recorder = None
+                        if not level.hot_swap_ready:
+                            # same as any other load: the layout on the worker (if the background compile hasn't done it already), the level itself here behind the loading screen
+                            LevelLoader(win, controller, loading_screen, retro=level.retro).run(level.hot_swap_layout, level.build_hot_swap)
                         cur_time = level.time
                         cur_target_time = level.target_time
                         cur_deaths = level.player.deaths_this_level
@@ -310,9 +410,11 @@ def main(win):
                         cur_objectives_available = level.objectives_available
                         cur_achievements = level.achievements
                         controller.level = level = level.hot_swap_level
-                        controller.hud = hud = HUD(level.player, win, retro=level.retro)
+                        controller.hud = hud = HUD(level.player, win, image_master=assets, retro=level.retro)
                         controller.active_objective = None
                         camera.prepare(level, hud)
+                        camera.store_offset()
+                        level.store_positions()
                         level.time += cur_time
                         level.target_time += cur_target_time
                         level.player.deaths_this_level += cur_deaths
@@ -324,6 +426,10 @@ def main(win):
                         level.objectives_available += cur_objectives_available
                         level.achievements.update(cur_achievements)
                         controller.activate_objective(None, True, popup=False)
+                        __preload_successor__(level)
+
+            if recorder is not None:
+                __save_recording__(recorder)
 
             if controller.music is not None:
                 pygame.mixer.music.fadeout(1000)
@@ -346,6 +452,7 @@ def main(win):
             if controller.goto_main:
                 controller.level = None
                 controller.hud = None
+                preloader.discard()
                 break
             elif controller.next_level is not None:
                 if level.end_message is not None:
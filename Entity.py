@@ -1,19 +1,24 @@
 import pygame
 
-from Helpers import link_trigger, MovementDirection
+from Helpers import link_trigger, MovementDirection, SpriteFrame, CollisionShape
+from Profiler import profiler
 
 
 class Entity(pygame.sprite.Sprite):
     GRAVITY = 1100
     ANIMATION_DELAY = 0.05
+    BLANK_SPRITES: dict[tuple[int, int], SpriteFrame] = {}
 
     def __init__(self, level, controller, x: float, y: float, width: float, height: float, is_blocking: bool=True, name: str="Entity"):
         super().__init__()
         self.attack_damage = None
         self.level = level
         self.controller = controller
-        self.sprite: pygame.Surface | None = pygame.Surface((width, height), pygame.SRCALPHA)
-        self.mask: pygame.Mask | None = pygame.mask.from_surface(self.sprite)
+        # most entities replace this straight away, so every one of a size starts off sharing the same empty frame and mask
+        if Entity.BLANK_SPRITES.get((int(width), int(height))) is None:
+            Entity.BLANK_SPRITES[(int(width), int(height))] = SpriteFrame((int(width), int(height)), pygame.SRCALPHA)
+        self.sprite: pygame.Surface | None = Entity.BLANK_SPRITES[(int(width), int(height))]
+        self.mask: pygame.Mask | None = self.sprite.mask
         self.rect: pygame.Rect | None = pygame.Rect(x, y, width, height)
         self.width: float = width
         self.height: float = height
@@ -29,6 +34,19 @@ class Entity(pygame.sprite.Sprite):
     def gravity(self) -> float:
         return self.GRAVITY
 
+    @property
+    def collision_shape(self) -> CollisionShape:
+        # a mask that isn't the current frame's own can't be trusted to match its shape, so that one gets tested pixel by pixel
+        if isinstance(self.sprite, SpriteFrame) and self.sprite.cached_mask is self.mask:
+            return self.sprite.collision_shape
+        return CollisionShape.MASK
+
+    @property
+    def collision_rect(self) -> pygame.Rect:
+        if isinstance(self.sprite, SpriteFrame) and self.sprite.cached_mask is self.mask:
+            return self.sprite.collision_rect
+        return self.mask.get_rect()
+
     def die(self) -> None:
         self.hp = 0
 
@@ -61,6 +79,7 @@ class Entity(pygame.sprite.Sprite):
         adj_y = self.rect.y - offset_y
         if -self.rect.width < adj_x <= win.get_width() and -self.rect.height < adj_y <= win.get_height():
             win.blit(self.sprite, (adj_x, adj_y))
+            profiler.count("blits")
 
     def collide(self, ent: 'Entity') -> bool:
         return self.is_blocking
@@ -71,6 +90,6 @@ class Entity(pygame.sprite.Sprite):
     def set_difficulty(self, scale: float) -> None:
         return
 
-    def link_triggers(self, triggers: list) -> None:
+    def link_triggers(self, triggers) -> None:
         if hasattr(self, 'trigger'):
             self.trigger = link_trigger(None if self.trigger is None else self.trigger.split(" "), triggers)
\ No newline at end of file
@@ -0,0 +1,109 @@
+from Block import Block
+from NameIndex import NameIndex
+
+
+class EntityView:
+    def __init__(self, *groups: list) -> None:
+        self.groups: tuple[list, ...] = groups
+
+    def __iter__(self):
+        # the lengths are taken up front, so anything spawned while this is being walked waits for the next pass, just like it did with a copied list
+        lengths = [len(group) for group in self.groups]
+        for group, length in zip(self.groups, lengths):
+            for i in range(length):
+                yield group[i]
+
+    def __len__(self) -> int:
+        return sum(len(group) for group in self.groups)
+
+
+class SlotList(list):
+    # every entry knows its own slot, so removing one moves the last entry into its place instead of rebuilding the whole list
+    def __init__(self, entries=()) -> None:
+        super().__init__(entries)
+        self.slots: dict = {ent: i for i, ent in enumerate(self)}
+
+    def __contains__(self, ent) -> bool:
+        return ent in self.slots
+
+    def append(self, ent) -> None:
+        self.slots[ent] = len(self)
+        super().append(ent)
+
+    def discard(self, ent) -> None:
+        i = self.slots.pop(ent, None)
+        if i is not None:
+            last = super().pop()
+            if last is not ent:
+                self[i] = last
+                self.slots[last] = i
+
+
+class EntityRegistry:
+    def __init__(self, player, triggers: list, blocks: list, hazards: list, enemies: list, objectives: list) -> None:
+        self.players: list = [player]
+        self.triggers: list = triggers
+        self.blocks: list = blocks
+        self.hazards: list = hazards
+        self.enemies: list = enemies
+        self.objectives: list = objectives
+        # plain blocks never move or change on their own, so they're left out of the entities that get updated every frame
+        self.updatable_blocks: SlotList = SlotList(ent for ent in blocks if type(ent) is not Block)
+        self.all: EntityView = EntityView(self.players, self.triggers, self.blocks, self.hazards, self.enemies, self.objectives)
+        self.updatable: EntityView = EntityView(self.players, self.triggers, self.updatable_blocks, self.hazards, self.enemies, self.objectives)
+        self.index: NameIndex = NameIndex(self.all)
+        self.objective_groups: dict[str, list] = {}
+        for ent in objectives:
+            self.__add_objective__(ent)
+        # bumped whenever an entity comes or goes, so anything that caches lookups knows when to redo them
+        self.version: int = 0
+
+    @staticmethod
+    def __group_of__(name: str) -> str:
+        return name.casefold().split(" ")[0]
+
+    def __add_objective__(self, ent) -> None:
+        group = EntityRegistry.__group_of__(ent.name)
+        if self.objective_groups.get(group) is None:
+            self.objective_groups[group] = [ent]
+        else:
+            self.objective_groups[group].append(ent)
+
+    def add(self, ent, group: str) -> None:
+        getattr(self, group).append(ent)
+        if group == "blocks" and type(ent) is not Block:
+            self.updatable_blocks.append(ent)
+        elif group == "objectives":
+            self.__add_objective__(ent)
+        self.index.add(ent)
+        self.version += 1
+
+    def remove(self, ents: set, group: str) -> None:
+        # the lists are changed in place because the views (and the level) hold on to them
+        entries = getattr(self, group)
+        if isinstance(entries, SlotList):
+            for ent in ents:
+                entries.discard(ent)
+        else:
+            entries[:] = [ent for ent in entries if ent not in ents]
+        if group == "blocks":
+            for ent in ents:
+                self.updatable_blocks.discard(ent)
+        elif group == "objectives":
+            for key in list(self.objective_groups.keys()):
+                self.objective_groups[key] = [ent for ent in self.objective_groups[key] if ent not in ents]
+                if len(self.objective_groups[key]) == 0:
+                    self.objective_groups.pop(key)
+        for ent in ents:
+            self.index.remove(ent)
+        self.version += 1
+
+    def find(self, name: str) -> list:
+        return self.index.find(name)
+
+    def find_prefix(self, prefix: str) -> list:
+        return self.index.find_prefix(prefix)
+
+    def objective_group(self, name: str) -> list:
+        group = self.objective_groups.get(EntityRegistry.__group_of__(name))
+        return [] if group is None else group
@@ -2,11 +2,14 @@ import pygame
 from os.path import join, isfile, abspath
 from Helpers import handle_exception, load_images, ASSETS_FOLDER, retroify_image, NORMAL_BLACK, NORMAL_WHITE, \
     RETRO_BLACK, RETRO_WHITE
+from Profiler import profiler
+from TransformCache import transform_cache
 
 
 class HUD:
-    def __init__(self, player, win, retro: bool=False):
+    def __init__(self, player, win, image_master=None, retro: bool=False):
         self.player = player
+        self.image_master = ({} if image_master is None else image_master)
         self.win = win
         self.scale_factor: tuple[float, float] = (self.win.get_width() / 1920, self.win.get_height() / 1080)
         self.retro: bool = retro
@@ -21,84 +24,61 @@ class HUD:
         self.boss_hp_outline.fill((0, 0, 0, self.boss_hp_bar_alpha))
         self.boss_hp_pct: float | None = None
         self.boss_hp_bar: pygame.Surface | None = None
-        self.time_characters: dict[str, pygame.Surface | None] = load_images("Icons", "Timer")
-        for i in range(10):
-            c = str(i)
-            if self.time_characters.get(c) is None:
-                handle_exception(f'File {FileNotFoundError(abspath(join(ASSETS_FOLDER, "Icons", "Timer", f'{c}.png')))} not found.')
-        if self.time_characters.get("COLON") is None:
-            handle_exception(f'File {FileNotFoundError(abspath(join(ASSETS_FOLDER, "Icons", "Timer", "colon.png")))} not found.')
-        if self.time_characters.get("DECIMAL") is None:
-            handle_exception(f'File {FileNotFoundError(abspath(join(ASSETS_FOLDER, "Icons", "Timer", "decimal.png")))} not found.')
-        if self.retro:
-            for key in self.time_characters:
-                self.time_characters[key] = retroify_image(self.time_characters[key])
+        self.time_characters: dict[str, pygame.Surface | None] = self.image_master.get(("HUD", "Timer", retro))
+        if self.time_characters is None:
+            self.time_characters = self.__load_time_characters__(retro)
+            self.image_master[("HUD", "Timer", retro)] = self.time_characters
         self.time_num_icon_width: int = self.time_characters["0"].get_width()
         self.time_punc_icon_width: int = self.time_characters["COLON"].get_width()
         self.old_time: str = "00:00.000"
         self.time_display: list[pygame.Surface | None] = [self.time_characters["0"], self.time_characters["0"], self.time_characters["COLON"], self.time_characters["0"], self.time_characters["0"], self.time_characters["DECIMAL"], self.time_characters["0"], self.time_characters["0"], self.time_characters["0"]]
         self.time_capsule: pygame.Surface = self.__make_capsule__(self.retro, (5 * self.time_num_icon_width) + (2 * self.time_punc_icon_width) + ((self.time_characters["0"].get_height() + 4) / 2) + 20, self.time_characters["0"].get_height() + 4)
         self.objective_capsule: pygame.Surface | None = None
-        self.border = self.__make_border__(win, retro)
+        self.border = self.image_master.get(("HUD", "Border", win.get_size(), retro))
+        if self.border is None:
+            self.border = self.__make_border__(win, retro)
+            self.image_master[("HUD", "Border", win.get_size(), retro)] = self.border
+        self.profiler_overlay: pygame.Surface | None = None
+        self.profiler_overlay_age: int = 0
 
         self.icon_bar: pygame.Surface | None = pygame.Surface((self.hp_outline.get_width(), 64 * self.scale_factor[1]), pygame.SRCALPHA)
-        file = join(ASSETS_FOLDER, "Icons", "jump.png")
-        if not isfile(file):
-            handle_exception(f'File {FileNotFoundError(abspath(file))} not found.')
-        else:
-            self.icon_jump: pygame.Surface | None = pygame.transform.scale2x(pygame.image.load(file).convert_alpha())
-            if retro:
-                self.icon_jump = retroify_image(self.icon_jump)
-        file = join(ASSETS_FOLDER, "Icons", "double_jump.png")
-        if not isfile(file):
-            handle_exception(f'File {FileNotFoundError(abspath(file))} not found.')
-        else:
-            self.icon_double_jump: pygame.Surface | None = pygame.transform.scale2x(pygame.image.load(file).convert_alpha())
-            if retro:
-                self.icon_double_jump = retroify_image(self.icon_double_jump)
-        file = join(ASSETS_FOLDER, "Icons", "block.png")
-        if not isfile(file):
-            handle_exception(f'File {FileNotFoundError(abspath(file))} not found.')
-        else:
-            self.icon_block: pygame.Surface | None = pygame.transform.scale2x(pygame.image.load(file).convert_alpha())
-            if retro:
-                self.icon_block = retroify_image(self.icon_block)
-        file = join(ASSETS_FOLDER, "Icons", "teleport.png")
-        if not isfile(file):
-            handle_exception(f'File {FileNotFoundError(abspath(file))} not found.')
-        else:
-            self.icon_teleport: pygame.Surface | None = pygame.transform.scale2x(pygame.image.load(file).convert_alpha())
-            if retro:
-                self.icon_teleport = retroify_image(self.icon_teleport)
-        file = join(ASSETS_FOLDER, "Icons", "wall_jump.png")
-        if not isfile(file):
-            handle_exception(f'File {FileNotFoundError(abspath(file))} not found.')
-        else:
-            self.icon_wall_jump: pygame.Surface | None = pygame.transform.scale2x(pygame.image.load(file).convert_alpha())
-            if retro:
-                self.icon_wall_jump = retroify_image(self.icon_wall_jump)
-        file = join(ASSETS_FOLDER, "Icons", "resize.png")
-        if not isfile(file):
-            handle_exception(f'File {FileNotFoundError(abspath(file))} not found.')
-        else:
-            self.icon_resize: pygame.Surface | None = pygame.transform.scale2x(pygame.image.load(file).convert_alpha())
-            if retro:
-                self.icon_resize = retroify_image(self.icon_resize)
-        file = join(ASSETS_FOLDER, "Icons", "bullet_time.png")
-        if not isfile(file):
-            handle_exception(f'File {FileNotFoundError(abspath(file))} not found.')
-        else:
-            self.icon_bullet_time: pygame.Surface | None = pygame.transform.scale2x(pygame.image.load(file).convert_alpha())
-            if retro:
-                self.icon_bullet_time = retroify_image(self.icon_bullet_time)
+        self.icon_jump: pygame.Surface | None = self.__load_icon__("jump.png")
+        self.icon_double_jump: pygame.Surface | None = self.__load_icon__("double_jump.png")
+        self.icon_block: pygame.Surface | None = self.__load_icon__("block.png")
+        self.icon_teleport: pygame.Surface | None = self.__load_icon__("teleport.png")
+        self.icon_wall_jump: pygame.Surface | None = self.__load_icon__("wall_jump.png")
+        self.icon_resize: pygame.Surface | None = self.__load_icon__("resize.png")
+        self.icon_bullet_time: pygame.Surface | None = self.__load_icon__("bullet_time.png")
+        self.save_icon: pygame.Surface | None = self.__load_icon__("save.png")
 
-        file = join(ASSETS_FOLDER, "Icons", "save.png")
-        if not isfile(file):
-            handle_exception(f'File {FileNotFoundError(abspath(file))} not found.')
-        else:
-            self.save_icon: pygame.Surface | None = pygame.transform.scale2x(pygame.image.load(file).convert_alpha())
-            if retro:
-                self.save_icon = retroify_image(self.save_icon)
+    def __load_icon__(self, name: str) -> pygame.Surface | None:
+        icon = self.image_master.get(("HUD", name, self.retro))
+        if icon is None:
+            file = join(ASSETS_FOLDER, "Icons", name)
+            if not isfile(file):
+                handle_exception(f'File {FileNotFoundError(abspath(file))} not found.')
+                return None
+            icon = pygame.transform.scale2x(pygame.image.load(file).convert_alpha())
+            if self.retro:
+                icon = retroify_image(icon)
+            self.image_master[("HUD", name, self.retro)] = icon
+        return icon
+
+    @staticmethod
+    def __load_time_characters__(retro: bool) -> dict[str, pygame.Surface | None]:
+        time_characters = load_images("Icons", "Timer")
+        for i in range(10):
+            c = str(i)
+            if time_characters.get(c) is None:
+                handle_exception(f'File {FileNotFoundError(abspath(join(ASSETS_FOLDER, "Icons", "Timer", f'{c}.png')))} not found.')
+        if time_characters.get("COLON") is None:
+            handle_exception(f'File {FileNotFoundError(abspath(join(ASSETS_FOLDER, "Icons", "Timer", "colon.png")))} not found.')
+        if time_characters.get("DECIMAL") is None:
+            handle_exception(f'File {FileNotFoundError(abspath(join(ASSETS_FOLDER, "Icons", "Timer", "decimal.png")))} not found.')
+        if retro:
+            for key in time_characters:
+                time_characters[key] = retroify_image(time_characters[key])
+        return time_characters
 
     @staticmethod
     def __make_capsule__(retro, width, height):
@@ -178,8 +158,9 @@ class HUD:
             else:
                 self.boss_hp_bar.fill((255, 0, 0, self.boss_hp_bar_alpha))
             if self.boss_hp_bar_alpha < 128:
-                rendered_hp_outline = pygame.transform.scale_by(self.boss_hp_outline, (self.boss_hp_bar_alpha / 128, 1))
-                rendered_hp_bar = pygame.transform.scale_by(self.boss_hp_bar, (self.boss_hp_bar_alpha / 128, 1))
+                # these surfaces get refilled every frame, so they're cached by what they look like instead of which surface they are
+                rendered_hp_outline = transform_cache.scale_by(self.boss_hp_outline, (self.boss_hp_bar_alpha / 128, 1), source_key=("boss_hp_outline", self.boss_hp_outline.get_size(), self.boss_hp_bar_alpha))
+                rendered_hp_bar = transform_cache.scale_by(self.boss_hp_bar, (self.boss_hp_bar_alpha / 128, 1), source_key=("boss_hp_bar", self.boss_hp_bar.get_size(), self.boss_hp_bar_alpha, self.retro))
             else:
                 rendered_hp_outline = self.boss_hp_outline
                 rendered_hp_bar = self.boss_hp_bar
@@ -241,6 +222,26 @@ class HUD:
                 self.win.blit(self.time_display[i], (self.win.get_width() - (10 + offset_x), 10))
             self.old_time = formatted_level_time
 
+    def __draw_profiler__(self) -> None:
+        # re-rendering the text every frame would show up in the numbers, so it only refreshes a few times a second
+        if self.profiler_overlay is None or self.profiler_overlay_age >= 30:
+            self.profiler_overlay_age = 0
+            summary = profiler.summary()
+            if summary is None:
+                return
+            lines = [f'frame {1000 * summary["frame"]:6.2f}ms (worst {1000 * summary["worst"]:.2f}ms)']
+            lines += [f'{phase:<10} {1000 * summary["timings"][phase]:6.2f}ms' for phase in profiler.PHASES]
+            lines += [f'{counter:<15} {summary["counts"][counter]:8.1f}' for counter in profiler.COUNTERS]
+            font = pygame.font.SysFont("courier", 16)
+            text_colour = RETRO_WHITE if self.retro else NORMAL_WHITE
+            rendered = [font.render(line, True, text_colour) for line in lines]
+            self.profiler_overlay = pygame.Surface((max(line.get_width() for line in rendered) + 20, sum(line.get_height() for line in rendered) + 20), pygame.SRCALPHA)
+            self.profiler_overlay.fill((0, 0, 0, 160))
+            for i in range(len(rendered)):
+                self.profiler_overlay.blit(rendered[i], (10, 10 + (i * rendered[i].get_height())))
+        self.profiler_overlay_age += 1
+        self.win.blit(self.profiler_overlay, (10, 100 * self.scale_factor[1]))
+
     def draw(self, formatted_level_time: str) -> None:
         self.__draw_health_bar__()
         self.__draw_boss_health_bar__()
@@ -251,3 +252,7 @@ class HUD:
             self.__draw_save__()
         if self.retro:
             self.win.blit(self.border, (0, 0))
+        if profiler.enabled:
+            self.__draw_profiler__()
+        else:
+            self.profiler_overlay = None
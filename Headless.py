@@ -0,0 +1,215 @@
+import os
+# anything that has to see the text and menus drawn (like the benchmarks) can pick the offscreen driver before importing this
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import statistics
+import time
+import pygame
+from os.path import join
+
+# This has to happen before the game classes are imported, since some of them convert images while they're being defined
+pygame.init()
+try:
+    pygame.Surface((1, 1), pygame.SRCALPHA).convert_alpha()
+except pygame.error:
+    # older versions of pygame can't convert images without a video mode, but the dummy driver never opens a window for it
+    pygame.display.set_mode((1, 1))
+
+from Helpers import load_json_dict, load_object_dicts, load_levels, load_audios, DifficultyScale, ASSETS_FOLDER
+from Controller import Controller
+from Level import Level
+from Camera import Camera
+from InputSource import NullInput, ScriptedInput, RecordingInput, ReplayInput
+from Simulation import simulate
+from Profiler import profiler
+from RandomStreams import rng
+from SaveLoadFunctions import load_part2
+from SimpleVFX.SimpleVFX import VisualEffectsManager
+
+WIDTH, HEIGHT = 1920, 1080
+SIMULATION_RATE = 150
+MAX_SIMULATION_STEPS = 8
+
+
+class NullSteamworksConnection:
+    def __init__(self):
+        self.connection = None
+
+    def has_dlc(self) -> dict[str, bool]:
+        return {}
+
+
+class NullDiscordConnection:
+    def set_status(self, details: str="", state: str="") -> None:
+        return
+
+    def close(self) -> None:
+        return
+
+
+def build_controller(win: pygame.Surface, difficulty: DifficultyScale=DifficultyScale.MEDIUM) -> Controller:
+    controller = Controller(None, win, steamworks=NullSteamworksConnection(), discord=NullDiscordConnection())
+    controller.player_sprite_selected = controller.sprite_picker.values[controller.sprite_picker.image_index]
+    controller.difficulty = difficulty
+    controller.can_save = False
+    return controller
+
+
+def build_level(name: str, controller: Controller, levels: dict, meta_dict: dict, objects_dict: dict, sprite_master: dict | None=None, image_master: dict | None=None, build_seed: int | None=None) -> Level:
+    player_audio = enemy_audio = load_audios("Actors")
+    block_audio = load_audios("Blocks")
+    message_audio = load_audios("Messages", dir2=name, suppress_error=True)
+    vfx_manager = VisualEffectsManager(join(ASSETS_FOLDER, "VisualEffects"))
+    controller.level = Level(name, levels, meta_dict, objects_dict, ({} if sprite_master is None else sprite_master), ({} if image_master is None else image_master), player_audio, enemy_audio, block_audio, message_audio, vfx_manager, controller.win, controller, build_seed=build_seed)
+    return controller.level
+
+
+def run(level: Level, controller: Controller, frames: int, dtime: float=1 / SIMULATION_RATE) -> list[float]:
+    frame_times = []
+    win = controller.win
+    for _ in range(frames):
+        start = time.perf_counter()
+        profiler.begin_frame()
+        profiler.start("input")
+        for key in controller.input_source.advance():
+            controller.handle_single_input(key, win)
+        controller.handle_continuous_input()
+        profiler.stop("input")
+
+        if level.player.hp <= 0 and level.player.cooldowns.get("dead") is not None and level.player.cooldowns["dead"] <= 0:
+            if controller.difficulty >= DifficultyScale.HARDEST:
+                break
+            else:
+                level.player.revert()
+
+        # with no camera, the player stands in for the focus point that decides which actors get updated
+        simulate(level, dtime, level.player.rect.center, win.get_width() * 1.5)
+        while level.cinematics is not None and len(level.cinematics.queued) > 0:
+            level.cinematics.queued.pop(0)
+        profiler.end_frame()
+        frame_times.append(time.perf_counter() - start)
+        if controller.next_level is not None or controller.should_hot_swap_level:
+            break
+    return frame_times
+
+
+def replay(level: Level, controller: Controller, dtime: float=1 / SIMULATION_RATE) -> list[float]:
+    # this steps through a recording the same way the game loop did while it was made: the same frame times, the same inputs, the same seed
+    source = controller.input_source
+    win = controller.win
+    # a continued mission was restored from its save before the recording started, so it's restored here first as well
+    load_part2(source.save_data, level, controller)
+    rng.reseed(source.header["seed"])
+    camera = Camera(win)
+    camera.level = level
+    camera.scroll_to_player(0)
+    controller.activate_objective(controller.active_objective, True)
+    accumulator = 0.0
+    frame_times = []
+    while not source.finished:
+        start = time.perf_counter()
+        profiler.begin_frame()
+        profiler.start("input")
+        events = source.advance()
+        controller.active_keyboard_layout = source.keyboard_layout
+        controller.active_gamepad_layout = source.gamepad_layout
+        frame_time = source.frame["dt"]
+        for key in events:
+            if key is None:
+                level.player.stop()
+            else:
+                controller.handle_single_input(key, win)
+        controller.handle_continuous_input()
+        profiler.stop("input")
+        if controller.next_level is not None or controller.goto_restart or controller.goto_main:
+            break
+
+        if level.player.hp <= 0 and level.player.cooldowns.get("dead") is not None and level.player.cooldowns["dead"] <= 0:
+            if controller.difficulty >= DifficultyScale.HARDEST:
+                break
+            else:
+                level.player.revert()
+
+        accumulator += frame_time
+        steps = 0
+        while accumulator >= dtime and steps < MAX_SIMULATION_STEPS:
+            simulate(level, dtime, (camera.focus_x, camera.focus_y), win.get_width() * 1.5)
+            if controller.should_scroll_to_point is not None:
+                camera.focus_player = False
+                if camera.scroll_to_point(dtime, controller.should_scroll_to_point["coords"][0], controller.should_scroll_to_point["coords"][1], target_wait_time=controller.should_scroll_to_point["time"]):
+                    camera.focus_player = True
+                    controller.should_scroll_to_point = None
+            else:
+                camera.scroll_to_player(dtime)
+            accumulator -= dtime
+            steps += 1
+        if steps >= MAX_SIMULATION_STEPS:
+            accumulator = min(accumulator, dtime)
+        while level.cinematics is not None and len(level.cinematics.queued) > 0:
+            level.cinematics.queued.pop(0)
+
+        profiler.end_frame()
+        frame_times.append(time.perf_counter() - start)
+        if controller.should_hot_swap_level:
+            break
+    return frame_times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a level without a display, as fast as possible.")
+    parser.add_argument("level", nargs="?", default=None, help="name of the level to run (not needed with --replay)")
+    parser.add_argument("--frames", type=int, default=10000, help="number of simulation steps to run")
+    parser.add_argument("--script", default=None, help="JSON file with a list of scripted inputs (defaults to no input)")
+    parser.add_argument("--replay", default=None, help="recording (.agr) made by running the game with --record, played back with its own frame times instead of --frames")
+    parser.add_argument("--trace", default=None, help="write a Chrome trace (.json) or JSON lines (.jsonl) file of per-phase timings")
+    parser.add_argument("--difficulty", default="MEDIUM", choices=[d.name for d in DifficultyScale])
+    args = parser.parse_args()
+
+    win = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+    levels = load_levels("Levels")
+    objects_dict = load_object_dicts(join("ReferenceDicts", "GameObjects"))
+    meta_dict = load_json_dict("ReferenceDicts", "meta.agd")
+
+    controller = build_controller(win, difficulty=DifficultyScale[args.difficulty])
+    build_seed = None
+    if args.replay is not None:
+        controller.input_source = ReplayInput.load(args.replay)
+        header = controller.input_source.header
+        if header.get("version") != RecordingInput.VERSION:
+            parser.error(f'{args.replay} is a version {header.get("version")} recording, but this build only replays version {RecordingInput.VERSION}')
+        controller.difficulty = DifficultyScale[header["difficulty"]]
+        # the level is built with the same player sprite, style and loading seed as the recorded one, so every sprite and mask matches
+        controller.player_sprite_selected = header["player_sprite"]
+        controller.force_retro = header["retro"]
+        build_seed = header["build_seed"]
+        args.level = header["level"]
+    elif args.level is None:
+        parser.error("a level is needed unless a recording is replayed")
+    elif args.script is None:
+        controller.input_source = NullInput()
+    else:
+        with open(args.script, "r") as file:
+            controller.input_source = ScriptedInput(controller, json.loads(file.read()))
+
+    start = time.perf_counter()
+    level = build_level(args.level.upper(), controller, levels, meta_dict, objects_dict, build_seed=build_seed)
+    load_time = time.perf_counter() - start
+
+    if args.trace is not None:
+        profiler.start_trace(args.trace)
+    frame_times = (run(level, controller, args.frames) if args.replay is None else replay(level, controller))
+    profiler.stop_trace()
+    total = sum(frame_times)
+    print(f'{level.name}: loaded in {load_time:.3f}s, ran {len(frame_times)} frames in {total:.3f}s ({len(frame_times) / max(total, 1e-9):.0f} frames/s, worst {1000 * max(frame_times, default=0):.2f}ms)')
+    if len(frame_times) > 1:
+        # frame time percentiles are what's worth comparing between builds, since a replay always does the same work
+        pcts = statistics.quantiles(frame_times, n=100, method="inclusive")
+        print(f'frame times: p50 {1000 * pcts[49]:.3f}ms, p95 {1000 * pcts[94]:.3f}ms, p99 {1000 * pcts[98]:.3f}ms')
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
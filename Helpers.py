@@ -1,15 +1,14 @@
-import random
 import sys
 import time
 import traceback
 import re
 import pygame
-import csv
 import json
-from tkinter import messagebox
-from os import listdir
+from os import listdir, environ
 from os.path import isfile, isdir, join, abspath
 from enum import Enum, IntEnum
+from Profiler import profiler
+from RandomStreams import rng
 
 
 ASSETS_FOLDER: str = "Assets"
@@ -47,7 +46,80 @@ class DifficultyScale(float, Enum):
         return self.name.replace("_", " ")
 
 
+class CollisionShape(IntEnum):
+    RECT = 0 # every pixel is solid, so the rect alone is exact
+    SUBRECT = 1 # the solid pixels fill a smaller rect exactly
+    MASK = 2 # only a pixel test is exact
+
+    def __str__(self):
+        return self.name
+
+
+class SpriteFrame(pygame.Surface):
+    # an animation frame never changes after it's loaded, so its collision mask and visible bounds only need working out once
+    def __init__(self, size, flags=pygame.SRCALPHA):
+        super().__init__(size, flags)
+        self.cached_mask: pygame.Mask | None = None
+        self.cached_bounding_rect: pygame.Rect | None = None
+        self.cached_collision_shape: CollisionShape | None = None
+        self.cached_collision_rect: pygame.Rect | None = None
+
+    @classmethod
+    def from_surface(cls, surface: pygame.Surface) -> 'SpriteFrame':
+        frame = cls(surface.get_size(), pygame.SRCALPHA)
+        # a max blend onto a fully transparent surface is an exact copy, where a normal blit would darken the soft edges
+        frame.blit(surface, (0, 0), special_flags=pygame.BLEND_RGBA_MAX)
+        return frame
+
+    @property
+    def mask(self) -> pygame.Mask:
+        if self.cached_mask is None:
+            self.cached_mask = pygame.mask.from_surface(self)
+            # the shape is worked out with the mask (which is built when the frame is loaded), so collisions never have to scan it again
+            count = self.cached_mask.count()
+            rects = self.cached_mask.get_bounding_rects()
+            self.cached_collision_rect = (pygame.Rect(0, 0, 0, 0) if len(rects) == 0 else rects[0].unionall(rects[1:]))
+            if count == self.get_width() * self.get_height():
+                self.cached_collision_shape = CollisionShape.RECT
+            elif count == self.cached_collision_rect.width * self.cached_collision_rect.height:
+                self.cached_collision_shape = CollisionShape.SUBRECT
+            else:
+                self.cached_collision_shape = CollisionShape.MASK
+        return self.cached_mask
+
+    @property
+    def collision_shape(self) -> CollisionShape:
+        if self.cached_collision_shape is None:
+            self.mask
+        return self.cached_collision_shape
+
+    @property
+    def collision_rect(self) -> pygame.Rect:
+        # the smallest rect holding every solid pixel, relative to the frame
+        if self.cached_collision_rect is None:
+            self.mask
+        return self.cached_collision_rect
+
+    @property
+    def bounding_rect(self) -> pygame.Rect:
+        if self.cached_bounding_rect is None:
+            self.cached_bounding_rect = self.get_bounding_rect()
+        return self.cached_bounding_rect
+
+
+def get_mask(surface: pygame.Surface) -> pygame.Mask:
+    if isinstance(surface, SpriteFrame):
+        return surface.mask
+    else:
+        return pygame.mask.from_surface(surface)
+
+
+def is_headless() -> bool:
+    return environ.get("SDL_VIDEODRIVER") == "dummy"
+
+
 def handle_exception(msg) -> None:
+    headless = is_headless()
     if pygame.get_init():
         pygame.quit()
     cur_time = time.gmtime(time.time())
@@ -57,20 +129,57 @@ def handle_exception(msg) -> None:
     with open(log_file, "w") as log:
         print(f'Error encountered at GMT {printable_time}:', file=log)
         traceback.print_exc(file=log)
-    messagebox.showerror(title="Even the agent couldn't glitch out of this!", message=f'ERROR: {msg}\nMore info available in {log_file}.')
+    if headless:
+        print(f'ERROR: {msg}\nMore info available in {log_file}.', file=sys.stderr)
+    else:
+        from tkinter import messagebox
+        messagebox.showerror(title="Even the agent couldn't glitch out of this!", message=f'ERROR: {msg}\nMore info available in {log_file}.')
     sys.exit()
 
 
+def collide_mask(ent1, ent2) -> tuple[int, int] | None:
+    # the tight rects are a closer first check than the sprite rects, and when both shapes are solid rects they're the whole answer
+    rect1 = ent1.collision_rect.move(ent1.rect.x, ent1.rect.y)
+    rect2 = ent2.collision_rect.move(ent2.rect.x, ent2.rect.y)
+    overlap = rect1.clip(rect2)
+    if overlap.width == 0 or overlap.height == 0:
+        return None
+    elif ent1.collision_shape != CollisionShape.MASK and ent2.collision_shape != CollisionShape.MASK:
+        return overlap.x - ent1.rect.x, overlap.y - ent1.rect.y
+    profiler.count("mask tests")
+    return pygame.sprite.collide_mask(ent1, ent2)
+
+
+def sweep_rect(rect: pygame.Rect, dx: float, dy: float, target: pygame.Rect) -> float | None:
+    # how far along dx, dy (from 0 to 1) the rect first touches the target, or None if it never does or already overlaps it
+    if rect.colliderect(target):
+        return None
+    enter, leave = 0.0, 1.0
+    for low, high, target_low, target_high, delta in ((rect.left, rect.right, target.left, target.right, dx), (rect.top, rect.bottom, target.top, target.bottom, dy)):
+        if delta == 0:
+            # only sliding along the target's edge doesn't count as touching it
+            if high <= target_low or low >= target_high:
+                return None
+        else:
+            time1 = (target_low - high) / delta
+            time2 = (target_high - low) / delta
+            enter = max(enter, min(time1, time2))
+            leave = min(leave, max(time1, time2))
+            if enter >= leave:
+                return None
+    return enter
+
+
 def link_trigger(to_link, to_be_linked) -> list | None:
     if to_link is None:
         return None
     else:
+        # to_be_linked is a NameIndex of the level's triggers, so each name is a prefix lookup instead of a scan of every trigger
         triggers = []
         for active_triggers in to_link:
-            for possible_triggers in to_be_linked:
-                if possible_triggers.name.casefold().startswith(active_triggers.casefold()):
-                    triggers.append(possible_triggers)
-                    break
+            possible_trigger = to_be_linked.first_with_prefix(active_triggers)
+            if possible_trigger is not None:
+                triggers.append(possible_trigger)
         return None if len(triggers) == 0 else triggers
 
 
@@ -189,11 +298,12 @@ def load_images(dir1, dir2) -> dict | None:
 
 
 def flip(sprites) -> list:
-    return [pygame.transform.flip(sprite, True, False) for sprite in sprites]
+    return [SpriteFrame.from_surface(pygame.transform.flip(sprite, True, False)) for sprite in sprites]
 
 
 def load_sprite_sheets(dir1, dir2, sprite_master, direction=False, retro=False) -> dict:
-    if sprite_master.get(dir2) is None:
+    # sprite_master outlives a single level, so the same sheet can be cached both normal and retro
+    if sprite_master.get((dir1, dir2, retro)) is None:
         path = join(ASSETS_FOLDER, dir1, dir2)
 
         if not isdir(path):
@@ -202,7 +312,7 @@ def load_sprite_sheets(dir1, dir2, sprite_master, direction=False, retro=False)
                 if len(dir2) < len(dir) and dir2.upper() == dir[:len(dir2)].upper():
                     options.append(dir)
             if len(options) > 0:
-                i = random.randint(0, len(options) - 1)
+                i = rng.loading.randint(0, len(options) - 1)
                 dir2 = options[i]
                 path = join(ASSETS_FOLDER, dir1, dir2)
             else:
@@ -222,15 +332,17 @@ def load_sprite_sheets(dir1, dir2, sprite_master, direction=False, retro=False)
                 surface = pygame.Surface((width, height), pygame.SRCALPHA)
                 rect = pygame.Rect(i * width, 0, width, height)
                 surface.blit(sprite_sheet, (0, 0), rect)
-                sprites.append(pygame.transform.scale2x(surface))
+                frame = SpriteFrame((2 * width, 2 * height), pygame.SRCALPHA)
+                pygame.transform.scale2x(surface, frame)
+                sprites.append(frame)
 
             if direction:
                 all_sprites[str.upper(image.replace(".png", "")) + "_RIGHT"] = sprites
                 all_sprites[str.upper(image.replace(".png", "")) + "_LEFT"] = flip(sprites)
             else:
                 all_sprites[str.upper(image.replace(".png", ""))] = sprites
-        sprite_master[dir2] = all_sprites
-    return sprite_master[dir2]
+        sprite_master[(dir1, dir2, retro)] = all_sprites
+    return sprite_master[(dir1, dir2, retro)]
 
 
 def load_json_dict(dir, file) -> dict | None:
@@ -266,11 +378,10 @@ def load_levels(dir) -> dict | None:
         files = [f for f in listdir(path) if isfile(join(path, f)) and f.endswith(".agl")]
         files.sort()
 
+        # the layouts themselves are only read (and compiled) when a level is actually built
         levels = {}
         for f in files:
-            with open(join(path, f)) as level:
-                reader = csv.reader(level, delimiter=",", quotechar='"')
-                levels[str.upper(f.replace(".agl", ""))] = [row for row in reader]
+            levels[str.upper(f.replace(".agl", ""))] = join(path, f)
 
         return levels
     else:
@@ -285,7 +396,7 @@ def __load_single_audio__(dir1, dir2) -> dict | None:
         for file in [f for f in listdir(path) if isfile(join(path, f))]:
             if sounds.get(dir2.upper()) is None:
                 sounds[dir2.upper()] = []
-            sounds[dir2.upper()].append(f'{path}\\{file}')
+            sounds[dir2.upper()].append(join(path, file))
         return sounds
     else:
         handle_exception(f'File {FileNotFoundError(abspath(path))} not found.')
@@ -385,7 +496,7 @@ def process_text(line: str, controller) -> tuple[str, bool, bool]:
 
 
 def display_text(output: list | str, controller, should_type_text=False, min_pause_time=0.08, should_sleep=True, audio=None, retro=False, background=False) -> None:
-    if output is None or output == "":
+    if output is None or output == "" or is_headless():
         return
     else:
         text_colour = RETRO_WHITE if retro else NORMAL_WHITE
@@ -487,14 +598,14 @@ def glitch(odds, screen) -> list:
     color = [(42, 128, 65), (32, 93, 179), (129, 49, 176), (222, 60, 152), (102, 42, 40)]
     screen = screen.copy()
     glitches = []
-    for i in range(random.randint(0, round(odds * screen.get_height() / 10))):
-        width = random.randint(10, min(200, screen.get_width()))
-        height = random.randint(1, min(50, screen.get_height()))
-        x = random.randint(0, screen.get_width() - width)
-        y = random.randint(0, screen.get_height() - height)
-        copy = screen.subsurface(pygame.Rect(min(max(x + random.randint(-2, 2), 0), screen.get_width() - width), min(max(y + random.randint(-2, 2), 0), screen.get_height() - height), width, height))
+    for i in range(rng.cosmetic.randint(0, round(odds * screen.get_height() / 10))):
+        width = rng.cosmetic.randint(10, min(200, screen.get_width()))
+        height = rng.cosmetic.randint(1, min(50, screen.get_height()))
+        x = rng.cosmetic.randint(0, screen.get_width() - width)
+        y = rng.cosmetic.randint(0, screen.get_height() - height)
+        copy = screen.subsurface(pygame.Rect(min(max(x + rng.cosmetic.randint(-2, 2), 0), screen.get_width() - width), min(max(y + rng.cosmetic.randint(-2, 2), 0), screen.get_height() - height), width, height))
         spot = pygame.Surface((width, height), pygame.SRCALPHA)
-        spot.fill(color[random.randint(0, len(color) - 1)])
+        spot.fill(color[rng.cosmetic.randint(0, len(color) - 1)])
         spot.set_alpha(50)
         copy.blit(spot, (0, 0))
         glitches.append([copy, (x, y)])
@@ -514,7 +625,8 @@ def load_path(path_in, i, j, block_size) -> list | None:
         return path
 
 
-def set_property(triggering_entity, prop_to_set) -> None:
+def parse_property_changes(prop_to_set) -> list[tuple]:
+    changes = []
     if prop_to_set is not None:
         target, property, value = prop_to_set["target"], prop_to_set["property"], prop_to_set["value"]
         if not isinstance(target, list):
@@ -535,9 +647,16 @@ def set_property(triggering_entity, prop_to_set) -> None:
                         val = float(val)
                         if val == int(val):
                             val = int(val)
-                for ent in triggering_entity.level.entities:
-                    if ent.name.casefold().startswith(targ.casefold()):
-                        if hasattr(ent, prop):
-                            setattr(ent, prop, val)
-                        elif prop.casefold().startswith('can_') and hasattr(ent, 'abilities') and isinstance(ent.abilities, dict):
-                            ent.abilities[prop.casefold()] = val
+                changes.append((targ, prop, val))
+    return changes
+
+
+def set_property(targets, prop, val) -> None:
+    for ent in targets:
+        if hasattr(ent, prop):
+            setattr(ent, prop, val)
+            ent.level.static_chunks.invalidate(ent)
+            if getattr(ent, "grid_cell", None) is not None:
+                ent.level.static_colliders.invalidate(ent)
+        elif prop.casefold().startswith('can_') and hasattr(ent, 'abilities') and isinstance(ent.abilities, dict):
+            ent.abilities[prop.casefold()] = val
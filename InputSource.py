@@ -0,0 +1,216 @@
+import gzip
+import json
+import pygame
+
+
+class PressedKeys:
+    def __init__(self, keys=()):
+        self.keys = set(keys)
+
+    def __getitem__(self, key) -> bool:
+        return key in self.keys
+
+
+class LiveInput:
+    def __init__(self, controller):
+        self.controller = controller
+
+    @property
+    def has_gamepad(self) -> bool:
+        return self.controller.gamepad is not None
+
+    def get_pressed(self):
+        return pygame.key.get_pressed()
+
+    def get_axis(self, axis) -> int:
+        return self.controller.gamepad.get_axis(axis)
+
+    def get_button(self, button) -> bool:
+        return self.controller.gamepad.get_button(button)
+
+
+class NullInput:
+    has_gamepad = False
+
+    def get_pressed(self) -> PressedKeys:
+        return PressedKeys()
+
+    def get_axis(self, axis) -> int:
+        return 0
+
+    def get_button(self, button) -> bool:
+        return False
+
+    def advance(self) -> list:
+        return []
+
+
+class ScriptedInput(NullInput):
+    # each step is {"action": "keys_right", "start": 0, "end": 120} to hold keys for a range of frames, or {"action": "keys_jump", "frame": 60} to press them once
+    def __init__(self, controller, script: list[dict]):
+        self.controller = controller
+        self.script = script
+        self.frame = -1
+
+    def __get_keys__(self, action) -> list:
+        return self.controller.KEYBOARD_LAYOUTS[self.controller.active_keyboard_layout][action]
+
+    def get_pressed(self) -> PressedKeys:
+        held = []
+        for step in self.script:
+            if step.get("start") is not None and step["start"] <= self.frame < (float("inf") if step.get("end") is None else step["end"]):
+                held += self.__get_keys__(step["action"])
+        return PressedKeys(held)
+
+    def advance(self) -> list:
+        self.frame += 1
+        pressed = []
+        for step in self.script:
+            if step.get("frame") == self.frame:
+                pressed.append(self.__get_keys__(step["action"])[0])
+        return pressed
+
+
+class RecordedKeys:
+    # stands in for the pressed keys while recording, and writes down every key the game asks about that turns out to be held
+    def __init__(self, keys, held: list):
+        self.keys = keys
+        self.held = held
+
+    def __getitem__(self, key) -> bool:
+        pressed = bool(self.keys[key])
+        if pressed and key not in self.held:
+            self.held.append(key)
+        return pressed
+
+
+class RecordingInput:
+    VERSION: int = 3
+    # these never reach the level (or open a menu), so a replay has no use for them
+    IGNORED_KEYS: list[str] = ["keys_pause_unpause", "keys_quicksave", "keys_cycle_layout", "keys_fullscreen_toggle", "keys_profiler", "keys_trace"]
+    IGNORED_BUTTONS: list[str] = ["button_pause_unpause", "button_quicksave"]
+
+    def __init__(self, source, controller, level, seed: int, save_data: dict | None=None):
+        self.source = source
+        self.controller = controller
+        # the player sprite, the retro style and the build seed all change which sprites (and so which collision masks) the level is built with
+        self.header: dict = {"version": RecordingInput.VERSION, "level": level.name, "seed": seed, "build_seed": level.build_seed, "difficulty": controller.difficulty.name, "player_sprite": controller.player_sprite_selected, "retro": controller.force_retro, "keyboard_layout": controller.active_keyboard_layout, "gamepad_layout": controller.active_gamepad_layout, "gamepad": source.has_gamepad}
+        # a mission continued from a save starts from that save, so the replay needs it too (as plain JSON, so opening a recording can never run anything)
+        self.header["save"] = save_data
+        self.frames: list[dict] = []
+        self.frame: dict = {}
+        self.keyboard_layout = controller.active_keyboard_layout
+        self.gamepad = source.has_gamepad
+
+    @property
+    def has_gamepad(self) -> bool:
+        return self.source.has_gamepad
+
+    def begin_frame(self, frame_time: float) -> None:
+        # only what's different from the defaults (or from the last frame, for the layout and gamepad) is kept, so an idle frame is just its time
+        self.frame = {"dt": frame_time}
+        if self.controller.active_keyboard_layout != self.keyboard_layout:
+            self.keyboard_layout = self.frame["keyboard_layout"] = self.controller.active_keyboard_layout
+        if self.source.has_gamepad != self.gamepad:
+            self.gamepad = self.frame["gamepad"] = self.source.has_gamepad
+            self.frame["gamepad_layout"] = self.controller.active_gamepad_layout
+        self.frames.append(self.frame)
+
+    def press(self, key) -> None:
+        keyboard_layout = self.controller.KEYBOARD_LAYOUTS[self.controller.active_keyboard_layout]
+        if any(key in keyboard_layout[action] for action in RecordingInput.IGNORED_KEYS):
+            return
+        # there's no gamepad layout until a known gamepad has been picked up, the same as in the controller
+        if self.source.has_gamepad and self.controller.active_gamepad_layout is not None:
+            gamepad_layout = self.controller.GAMEPAD_LAYOUTS[self.controller.active_gamepad_layout]
+            if any(key == gamepad_layout[action] for action in RecordingInput.IGNORED_BUTTONS):
+                return
+        self.__add_event__(key)
+
+    def release(self) -> None:
+        # a release is kept in line with the presses, since letting go of a key stops the player whatever was pressed before it
+        self.__add_event__(None)
+
+    def __add_event__(self, key) -> None:
+        if self.frame.get("events") is None:
+            self.frame["events"] = [key]
+        else:
+            self.frame["events"].append(key)
+
+    def get_pressed(self) -> RecordedKeys:
+        if self.frame.get("keys") is None:
+            self.frame["keys"] = []
+        return RecordedKeys(self.source.get_pressed(), self.frame["keys"])
+
+    def get_axis(self, axis) -> int:
+        value = self.source.get_axis(axis)
+        if value:
+            if self.frame.get("axes") is None:
+                self.frame["axes"] = {}
+            self.frame["axes"][str(axis)] = value
+        return value
+
+    def get_button(self, button) -> bool:
+        value = self.source.get_button(button)
+        if value:
+            if self.frame.get("buttons") is None:
+                self.frame["buttons"] = []
+            self.frame["buttons"].append(button)
+        return value
+
+    def advance(self) -> list:
+        return []
+
+    def save(self, file: str) -> None:
+        for frame in self.frames:
+            if frame.get("keys") is not None and len(frame["keys"]) == 0:
+                frame.pop("keys")
+        with gzip.open(file, "wt") as recording:
+            json.dump({"header": self.header, "frames": self.frames}, recording, separators=(",", ":"))
+
+
+class ReplayInput(NullInput):
+    # feeds a recording back one frame at a time, giving the game exactly the answers it got while it was being recorded
+    def __init__(self, recording: dict):
+        self.header: dict = recording["header"]
+        self.frames: list[dict] = recording["frames"]
+        self.frame_index = -1
+        self.has_gamepad = self.header["gamepad"]
+        self.keyboard_layout = self.header["keyboard_layout"]
+        self.gamepad_layout = self.header["gamepad_layout"]
+
+    @staticmethod
+    def load(file: str) -> "ReplayInput":
+        with gzip.open(file, "rt") as recording:
+            return ReplayInput(json.loads(recording.read()))
+
+    @property
+    def save_data(self) -> dict | None:
+        return self.header.get("save")
+
+    @property
+    def frame(self) -> dict:
+        return self.frames[self.frame_index]
+
+    @property
+    def finished(self) -> bool:
+        return self.frame_index >= len(self.frames) - 1
+
+    def advance(self) -> list:
+        # the keys pressed this frame, with None wherever one was released
+        self.frame_index += 1
+        if self.frame.get("keyboard_layout") is not None:
+            self.keyboard_layout = self.frame["keyboard_layout"]
+        if self.frame.get("gamepad") is not None:
+            self.has_gamepad = self.frame["gamepad"]
+            self.gamepad_layout = self.frame["gamepad_layout"]
+        return list(self.frame.get("events", []))
+
+    def get_pressed(self) -> PressedKeys:
+        return PressedKeys(self.frame.get("keys", []))
+
+    def get_axis(self, axis) -> int:
+        return self.frame.get("axes", {}).get(str(axis), 0)
+
+    def get_button(self, button) -> bool:
+        return button in self.frame.get("buttons", [])
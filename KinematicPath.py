@@ -0,0 +1,46 @@
+import math
+from bisect import bisect_right
+
+
+class KinematicPath:
+    # a patrol path compiled into timed legs, so where a mover is (and how fast it's going) only depends on how long it's been moving
+    def __init__(self, start: tuple[float, float], lead: list, cycle: list, speed: float, wait_time: float) -> None:
+        self.speed: float = abs(speed)
+        self.wait_time: float = wait_time
+        self.times: list[float] = []
+        self.legs: list[tuple[float, float, float, float, float]] = []
+        # the lead takes the mover from wherever it started onto the loop, and the loop then repeats forever from its first point
+        end = self.__add_legs__(start, lead + cycle[:1], 0.0)
+        self.cycle_start: float = end
+        self.cycle_leg: int = len(self.legs)
+        self.period: float = self.__add_legs__(cycle[0], cycle[1:] + cycle[:1], end) - end
+        self.end: tuple[float, float] = (cycle[0][0], cycle[0][1])
+
+    def __add_legs__(self, start, points: list, time: float) -> float:
+        x, y = start[0], start[1]
+        for point in points:
+            travel = (max(abs(point[0] - x), abs(point[1] - y)) / self.speed if self.speed > 0 else math.inf)
+            self.times.append(time)
+            self.legs.append((x, y, point[0], point[1], travel))
+            time += travel + (self.wait_time if len(point) > 2 and point[2] else 0.0)
+            x, y = point[0], point[1]
+        return time
+
+    def state(self, time: float) -> tuple[float, float, float, float]:
+        if time >= self.cycle_start:
+            if not self.period > 0:
+                return self.end[0], self.end[1], 0.0, 0.0
+            time = self.cycle_start + math.fmod(time - self.cycle_start, self.period)
+        i = max(bisect_right(self.times, time) - 1, 0)
+        x0, y0, x1, y1, travel = self.legs[i]
+        elapsed = time - self.times[i]
+        if elapsed >= travel:
+            return x1, y1, 0.0, 0.0
+
+        # like before, each axis moves at full speed until it gets there, so a diagonal leg goes straight once the shorter side is done
+        dist = self.speed * elapsed
+        x = x0 + math.copysign(min(abs(x1 - x0), dist), x1 - x0)
+        y = y0 + math.copysign(min(abs(y1 - y0), dist), y1 - y0)
+        x_vel = (math.copysign(self.speed, x1 - x0) if abs(x1 - x0) > dist else 0.0)
+        y_vel = (math.copysign(self.speed, y1 - y0) if abs(y1 - y0) > dist else 0.0)
+        return x, y, x_vel, y_vel
@@ -1,3 +1,4 @@
+import math
 from os.path import join
 from Block import Block, BreakableBlock, MovingBlock, MovableBlock, Hazard, MovingHazard, Door, FallingHazard
 from Boss import Boss
@@ -9,19 +10,40 @@ from Trigger import Trigger, TextTrigger, SoundTrigger, SpawnTrigger, RevertTrig
     ChangeLevelTrigger, PropertyTrigger, CinematicTrigger, AchievementTrigger, ObjectiveTrigger, SwapLevelTrigger, \
     CameraToPointTrigger, CameraToPlayerTrigger, DiscordStatusTrigger
 from ParticleEffect import *
-from Helpers import load_path, validate_file_list, display_text, ASSETS_FOLDER, NORMAL_WHITE, RETRO_WHITE, \
-    MovementDirection
+from SpatialHash import SpatialHash
+from Profiler import profiler
+from LevelCompiler import LevelCompiler, CompiledLevel
+from StaticChunks import StaticChunks
+from StaticColliders import StaticColliders
+from EntityRegistry import EntityRegistry, EntityView, SlotList
+from NameIndex import NameIndex
+from LevelLoader import LevelPreloader, run_steps
+from RandomStreams import rng
+from Helpers import load_path, validate_file_list, ASSETS_FOLDER, MovementDirection
 
 
 class Level:
     BLOCK_SIZE = 96
 
-    def __init__(self, name, levels, meta_dict, objects_dict, sprite_master, image_master, player_audios, enemy_audios, block_audios, message_audios, vfx_manager, win, controller, loading_screen):
+    def __init__(self, name, levels, meta_dict, objects_dict, sprite_master, image_master, player_audios, enemy_audios, block_audios, message_audios, vfx_manager, win, controller, progress=None, layout=None, build_seed=None):
+        run_steps(self.build_steps(name, levels, meta_dict, objects_dict, sprite_master, image_master, player_audios, enemy_audios, block_audios, message_audios, vfx_manager, win, controller, layout=layout, build_seed=build_seed), progress)
+
+    @staticmethod
+    def build(name, levels, meta_dict, objects_dict, sprite_master, image_master, player_audios, enemy_audios, block_audios, message_audios, vfx_manager, win, controller, layout=None, build_seed=None):
+        # the same build as the constructor, as steps ending with the finished level, so it can be spread over frames during play
+        level = Level.__new__(Level)
+        yield from level.build_steps(name, levels, meta_dict, objects_dict, sprite_master, image_master, player_audios, enemy_audios, block_audios, message_audios, vfx_manager, win, controller, layout=layout, build_seed=build_seed)
+        return level
+
+    def build_steps(self, name, levels, meta_dict, objects_dict, sprite_master, image_master, player_audios, enemy_audios, block_audios, message_audios, vfx_manager, win, controller, layout=None, build_seed=None):
+        # every yield is a (text, fraction) progress report and a point where the build can be put off until the next frame
         self.name = name.upper()
+        # sprite variants are picked from a loading stream seeded just for this level, so a replay can build the very same one
+        self.build_seed = rng.reseed_stream("loading", build_seed)
         self.display_name = self.name if meta_dict[name].get("name") is None else meta_dict[name]["name"]
         self.time = 0
         self.achievements = ({} if meta_dict[name].get("achievements") is None else meta_dict[name]["achievements"])
-        self.block_size = Level.BLOCK_SIZE if meta_dict[name].get("block_size") is None or not meta_dict[name]["block_size"].isnumeric() else int(meta_dict[name]["block_size"])
+        self.block_size = Level.get_block_size(meta_dict[name])
         self.purge_queue = {"triggers": set(), "hazards": set(), "blocks": set(), "doors": set(), "enemies": set(), "objectives": set()}
         if controller.retro:
             self._retro = True
@@ -43,11 +65,22 @@ class Level:
             self.music = validate_file_list("Music", list(meta_dict[name]["retro_music"].split(' ')), "mp3")
         else:
             self.music = (None if meta_dict[name].get("music") is None else validate_file_list("Music", list(meta_dict[name]["music"].split(' ')), "mp3"))
-        self.level_bounds, self._player, self.triggers, self.blocks, self.dynamic_blocks, self.doors, self.static_blocks, self.hazards, self.falling_hazards, self.enemies, self.objectives = self.build_level(self, levels[self.name], sprite_master, image_master, objects_dict[self.name], player_audios, enemy_audios, block_audios, message_audios, win, controller, None if meta_dict[name].get("player_sprite") is None else meta_dict[name]["player_sprite"], self.block_size, loading_screen)
+        self.level_bounds, self._player, self.triggers, self.blocks, self.dynamic_blocks, self.doors, self.static_blocks, self.hazards, self.falling_hazards, self.enemies, self.objectives = yield from self.build_level(self, (LevelCompiler.load(self.name, levels[self.name], objects_dict[self.name], self.block_size) if layout is None else layout), sprite_master, image_master, objects_dict[self.name], player_audios, enemy_audios, block_audios, message_audios, controller, None if meta_dict[name].get("player_sprite") is None else meta_dict[name]["player_sprite"], self.block_size)
+        self.registry = EntityRegistry(self._player, self.triggers, self.blocks, self.hazards, self.enemies, self.objectives)
+        self.spatial_hash = SpatialHash(self.block_size)
+        self.static_chunks = StaticChunks(self, win.get_size())
+        self.static_colliders = StaticColliders(self)
+        for layer in SpatialHash.LAYERS:
+            for ent in getattr(self, layer):
+                self.spatial_hash.insert(ent, layer)
+        yield "Preparing level...", None
+        for fraction in self.static_chunks.prebake(self._player.rect.center, win.get_size()):
+            yield "Drawing level...", fraction
         if self._retro and meta_dict[name].get("retro_cinematics") is not None:
             self.cinematics = CinematicsManager(meta_dict[name]["retro_cinematics"], controller, player_sprites=self._player.sprites)
         else:
             self.cinematics = (None if meta_dict[name].get("cinematics") is None else CinematicsManager(meta_dict[name]["cinematics"], controller, player_sprites=self._player.sprites))
+        yield "Preparing level...", None
         self.particle_effects: list[ParticleEffect] = []
         if meta_dict[name].get("particle_effect") is not None:
             self.particle_effects.append(self.gen_particle_effect(meta_dict[name]["particle_effect"].upper(), win))
@@ -66,7 +99,18 @@ class Level:
         self.objectives_available = len(self.objectives)
         self.enemies_available = len(self.enemies)
         self.boss_hp_pct = None
-        self.hot_swap_level = (None if meta_dict[name].get("hot_swap_level") is None or meta_dict.get(meta_dict[name]["hot_swap_level"]) is None else Level(meta_dict[name]["hot_swap_level"], levels, meta_dict, objects_dict, sprite_master, image_master, player_audios, enemy_audios, block_audios, message_audios, vfx_manager, win, controller, loading_screen))
+        self.previous_positions: dict = {}
+        self.current_positions: dict = {}
+        self.next_level = (None if meta_dict[name].get("next_level") is None else meta_dict[name]["next_level"].upper())
+        # the swap target's layout is compiled in the background as the player gets near it, but the level itself is only built on the main thread when it's first used
+        self.hot_swap_name = (None if meta_dict[name].get("hot_swap_level") is None or meta_dict.get(meta_dict[name]["hot_swap_level"]) is None else meta_dict[name]["hot_swap_level"])
+        self.hot_swap_builder = (None if self.hot_swap_name is None else LevelPreloader(lambda swap_name, report: LevelCompiler.load(swap_name, levels[swap_name], objects_dict[swap_name], Level.get_block_size(meta_dict[swap_name]))))
+        self.hot_swap_factory = (None if self.hot_swap_name is None else lambda swap_layout, report: Level(self.hot_swap_name, levels, meta_dict, objects_dict, sprite_master, image_master, player_audios, enemy_audios, block_audios, message_audios, vfx_manager, win, controller, progress=report, layout=swap_layout))
+        self._hot_swap_level = None
+
+    @staticmethod
+    def get_block_size(meta: dict) -> int:
+        return Level.BLOCK_SIZE if meta.get("block_size") is None or not meta["block_size"].isnumeric() else int(meta["block_size"])
 
     @property
     def player(self) -> Player:
@@ -76,6 +120,46 @@ class Level:
     def retro(self) -> bool:
         return self._retro
 
+    @property
+    def has_hot_swap(self) -> bool:
+        return self.hot_swap_name is not None
+
+    @property
+    def hot_swap_ready(self) -> bool:
+        return self._hot_swap_level is not None
+
+    @property
+    def hot_swap_level(self):
+        if self._hot_swap_level is None and self.hot_swap_builder is not None:
+            self.build_hot_swap(self.hot_swap_layout())
+        return self._hot_swap_level
+
+    def hot_swap_layout(self, report=None) -> CompiledLevel:
+        # plain data, so this one is fine on LevelLoader's worker thread
+        layout = self.hot_swap_builder.take((self.hot_swap_name,))
+        return (self.hot_swap_builder.prepare(self.hot_swap_name, report) if layout is None else layout)
+
+    def build_hot_swap(self, layout: CompiledLevel, report=None):
+        if self._hot_swap_level is None:
+            self._hot_swap_level = self.hot_swap_factory(layout, report)
+        return self._hot_swap_level
+
+    def prepare_hot_swap(self) -> None:
+        if self._hot_swap_level is None and self.hot_swap_builder is not None:
+            self.hot_swap_builder.start((self.hot_swap_name,))
+
+    def keep_hot_swap(self, previous) -> None:
+        # a restart builds this level again, but whatever the last attempt built (or started building) for the swap hasn't been touched yet
+        if previous is not None and previous.name == self.name and previous.hot_swap_name == self.hot_swap_name:
+            self._hot_swap_level = previous._hot_swap_level
+            self.hot_swap_builder = previous.hot_swap_builder
+
+    def get_successor(self) -> str | None:
+        for trigger in self.triggers:
+            if isinstance(trigger, ChangeLevelTrigger) and isinstance(trigger.value, str):
+                return trigger.value.upper()
+        return self.next_level
+
     def award_achievements(self, steamworks):
         unlocked_achievements = []
         if self.target_time is not None and self.target_time > 0 and self.time <= self.target_time and self.achievements.get("target_time") is not None and self.achievements["target_time"] is not None:
@@ -126,14 +210,24 @@ class Level:
         return text
 
     @property
-    def entities(self) -> list:
-        return [self.player] + self.triggers + self.blocks + self.hazards + self.enemies + self.objectives
+    def entities(self) -> EntityView:
+        return self.registry.all
+
+    @property
+    def updatable_entities(self) -> EntityView:
+        return self.registry.updatable
+
+    def add_entity(self, ent, group: str) -> None:
+        self.registry.add(ent, group)
+        if group in SpatialHash.LAYERS:
+            self.spatial_hash.insert(ent, group)
 
     def get_entities_in_range(self, point, dist_x=(1, 1), dist_y=(1, 1), blocks_only=False, include_doors=True, include_hazards=False) -> list:
+        profiler.count("entity queries")
         x = int(point[0] / self.block_size)
         y = int(point[1] / self.block_size)
-        # this sum thing below is a hack to turn a 2D list into a 1D list since it applies the + operator to the second (optional) [] argument (e.g. an empty list), thereby concatenating all the elements
-        in_range = [block for block in sum([row[max(x - (dist_x[0] - 1), 0):min(x + dist_x[1] + 1, len(row))] for row in self.static_blocks[max(y - (dist_y[0] - 1), 0):min(y + dist_y[1] + 1, len(self.static_blocks))]], []) if block is not None]
+        # merged runs of plain blocks come back as one collider each, everything else in the window as the block itself
+        in_range = self.static_colliders.query(x, y, dist_x=dist_x, dist_y=dist_y)
 
         if include_doors:
             for i in range(dist_x[0] - 1, dist_x[1] + 1):
@@ -141,17 +235,92 @@ class Level:
                     in_range += self.doors[x + i]
 
         if include_hazards:
-            for ent in self.hazards:
-                if ent.rect.x - (self.block_size * dist_x[0]) <= point[0] <= ent.rect.x + (self.block_size * dist_x[1]) and ent.rect.y - (self.block_size * dist_y[0]) <= point[1] <= ent.rect.y + (self.block_size * dist_y[1]):
-                    in_range.append(ent)
+            in_range += self.spatial_hash.query(point, dist_x=dist_x, dist_y=dist_y, layers=("hazards",))
 
         if not blocks_only:
-            for ent in self.triggers + self.dynamic_blocks + self.hazards + self.enemies + self.objectives:
-                if ent.rect.x - (self.block_size * dist_x[0]) <= point[0] <= ent.rect.x + (self.block_size * dist_x[1]) and ent.rect.y - (self.block_size * dist_y[0]) <= point[1] <= ent.rect.y + (self.block_size * dist_y[1]):
-                    in_range.append(ent)
+            in_range += self.spatial_hash.query(point, dist_x=dist_x, dist_y=dist_y)
 
         return in_range
 
+    def get_entities_along(self, rect: pygame.Rect, dx: float, dy: float, include_doors=True, include_dynamic=False) -> list:
+        # everything solid in the cells the rect sweeps through on its way along dx, dy, however long the move is
+        left = math.floor((rect.left + min(dx, 0)) / self.block_size)
+        right = math.floor((rect.right + max(dx, 0)) / self.block_size)
+        top = math.floor((rect.top + min(dy, 0)) / self.block_size)
+        bottom = math.floor((rect.bottom + max(dy, 0)) / self.block_size)
+        in_range = self.static_colliders.query(left, top, dist_x=(1, right - left), dist_y=(1, bottom - top))
+
+        if include_doors:
+            # doors are stored by the column they start in, so one that hangs in from the left still counts
+            for column in range(left - 1, right + 1):
+                if self.doors.get(column) is not None:
+                    in_range += self.doors[column]
+
+        if include_dynamic:
+            in_range += self.spatial_hash.query((left * self.block_size, top * self.block_size), dist_x=(right - left, 1), dist_y=(bottom - top, 1), layers=("dynamic_blocks",))
+
+        return in_range
+
+    def has_line_of_sight(self, start, end, include_doors=True) -> bool:
+        # walks only the grid cells the line actually crosses, in order (Amanatides & Woo), instead of sampling every pixel
+        x = int(start[0] // self.block_size)
+        y = int(start[1] // self.block_size)
+        end_x = int(end[0] // self.block_size)
+        end_y = int(end[1] // self.block_size)
+        delta_x = end[0] - start[0]
+        delta_y = end[1] - start[1]
+        step_x = 1 if delta_x > 0 else -1
+        step_y = 1 if delta_y > 0 else -1
+        # these are measured as a fraction of the line's length from the centre of the first pixel: how far until the next cell boundary, and how far one whole cell is
+        next_x = ((((x + 1) if step_x > 0 else x) * self.block_size) - (start[0] + 0.5)) / delta_x if delta_x != 0 else math.inf
+        next_y = ((((y + 1) if step_y > 0 else y) * self.block_size) - (start[1] + 0.5)) / delta_y if delta_y != 0 else math.inf
+        cell_x = self.block_size / abs(delta_x) if delta_x != 0 else math.inf
+        cell_y = self.block_size / abs(delta_y) if delta_y != 0 else math.inf
+
+        for _ in range(abs(end_x - x) + abs(end_y - y) + 1):
+            if 0 <= y < len(self.static_blocks) and 0 <= x < len(self.static_blocks[y]):
+                block = self.static_blocks[y][x]
+                if block is not None and block.rect.clipline(start, end):
+                    return False
+            if next_x < next_y:
+                next_x += cell_x
+                x += step_x
+            else:
+                next_y += cell_y
+                y += step_y
+
+        if include_doors:
+            # doors are stored by the column they start in, so one that hangs into the line from the left still counts
+            for column in range(int(min(start[0], end[0]) // self.block_size) - 1, int(max(start[0], end[0]) // self.block_size) + 1):
+                if self.doors.get(column) is not None:
+                    for door in self.doors[column]:
+                        if door.rect.clipline(start, end):
+                            return False
+        return True
+
+    def __get_moving_entities__(self) -> list:
+        movers = [self.player] + self.enemies + self.dynamic_blocks + self.hazards + [door for doors in self.doors.values() for door in doors]
+        for actor in [self.player] + self.enemies:
+            movers += actor.active_projectiles
+        return movers
+
+    def store_positions(self) -> None:
+        self.previous_positions = {ent: ent.rect.topleft for ent in self.__get_moving_entities__()}
+
+    def interpolate_positions(self, alpha: float) -> None:
+        self.current_positions = {}
+        for ent, previous in self.previous_positions.items():
+            current = ent.rect.topleft
+            # anything that moved more than a block in one step was teleported, so don't smear it across the screen
+            if current != previous and abs(current[0] - previous[0]) <= self.block_size and abs(current[1] - previous[1]) <= self.block_size:
+                self.current_positions[ent] = current
+                ent.rect.topleft = (round(previous[0] + ((current[0] - previous[0]) * alpha)), round(previous[1] + ((current[1] - previous[1]) * alpha)))
+
+    def restore_positions(self) -> None:
+        for ent, current in self.current_positions.items():
+            ent.rect.topleft = current
+        self.current_positions = {}
+
     def queue_purge(self, ent) -> None:
         if isinstance(ent, Trigger):
             self.purge_queue["triggers"].add(ent)
@@ -165,32 +334,36 @@ class Level:
             self.purge_queue["objectives"].add(ent)
 
     def purge(self) -> None:
+        for queued in self.purge_queue.values():
+            for ent in queued:
+                self.spatial_hash.remove(ent)
         if bool(self.purge_queue["triggers"]):
-            self.triggers = [ent for ent in self.triggers if ent not in self.purge_queue["triggers"]]
+            self.registry.remove(self.purge_queue["triggers"], "triggers")
             self.purge_queue["triggers"].clear()
         if bool(self.purge_queue["hazards"]):
-            self.hazards = [ent for ent in self.hazards if ent not in self.purge_queue["hazards"]]
+            self.registry.remove(self.purge_queue["hazards"], "hazards")
             for ent in self.purge_queue["hazards"]:
-                if isinstance(ent, FallingHazard):
-                    for x in list(self.falling_hazards.keys()):
-                        for falling_hazard in self.falling_hazards[x]:
-                            if falling_hazard == ent:
-                                if len(self.falling_hazards[x]) == 1:
-                                    self.falling_hazards.pop(x)
-                                else:
-                                    self.falling_hazards[x].remove(falling_hazard)
+                if isinstance(ent, FallingHazard) and self.falling_hazards.get(ent.column) is not None and ent in self.falling_hazards[ent.column]:
+                    if len(self.falling_hazards[ent.column]) == 1:
+                        self.falling_hazards.pop(ent.column)
+                    else:
+                        self.falling_hazards[ent.column].remove(ent)
             self.purge_queue["hazards"].clear()
         if bool(self.purge_queue["blocks"]):
-            self.blocks = [ent for ent in self.blocks if ent not in self.purge_queue["blocks"]]
-            self.dynamic_blocks = [ent for ent in self.dynamic_blocks if ent not in self.purge_queue["blocks"]]
-            for i in range(len(self.static_blocks)):
-                self.static_blocks[i] = [ent for ent in self.static_blocks[i] if ent not in self.purge_queue["blocks"]]
+            self.registry.remove(self.purge_queue["blocks"], "blocks")
+            for ent in self.purge_queue["blocks"]:
+                self.dynamic_blocks.discard(ent)
+                self.static_chunks.invalidate(ent)
+                # purged blocks leave an empty cell behind so the rest of the row stays lined up with the grid
+                if ent.grid_cell is not None and self.static_blocks[ent.grid_cell[0]][ent.grid_cell[1]] is ent:
+                    self.static_blocks[ent.grid_cell[0]][ent.grid_cell[1]] = None
+                    self.static_colliders.invalidate(ent)
             self.purge_queue["blocks"].clear()
         if bool(self.purge_queue["enemies"]):
-            self.enemies = [ent for ent in self.enemies if ent not in self.purge_queue["enemies"]]
+            self.registry.remove(self.purge_queue["enemies"], "enemies")
             self.purge_queue["enemies"].clear()
         if bool(self.purge_queue["objectives"]):
-            self.objectives = [ent for ent in self.objectives if ent not in self.purge_queue["objectives"]]
+            self.registry.remove(self.purge_queue["objectives"], "objectives")
             self.purge_queue["objectives"].clear()
 
     #NOTE: having weather with lots of particles + lots of enemies + bullets will decrease the frame rate
@@ -227,15 +400,15 @@ class Level:
             img.blit(square, (block.rect.x, block.rect.y))
         pygame.image.save(img, join(ASSETS_FOLDER, "Misc", self.name + "_bg.png"))
 
-    def __get_static_block_slice__(self, win, offset_x, offset_y) -> list:
-        return [row[int(offset_x // self.block_size):int((offset_x + (1.5 * win.get_width())) // self.block_size)] for row in self.static_blocks[int(offset_y // self.block_size):int((offset_y + (1.5 * win.get_height())) // self.block_size)]]
-
     def draw(self, win, offset_x, offset_y, master_volume) -> None:
         self.visual_effects_manager.draw(win, (offset_x, offset_y))
 
         above_player = []
 
-        for ent in self.triggers + self.__get_static_block_slice__(win, offset_x, offset_y) + self.dynamic_blocks + list(self.doors.values()) + self.hazards + self.objectives:
+        # static blocks are pre-drawn into large chunks, so this is a few blits instead of one for every tile on screen
+        self.static_chunks.draw(win, offset_x, offset_y, above=False)
+
+        for ent in self.triggers + self.dynamic_blocks + list(self.doors.values()) + self.hazards + self.objectives:
             if isinstance(ent, list):
                 for ent_lower in ent:
                     if ent_lower is not None:
@@ -254,6 +427,7 @@ class Level:
 
         self.player.draw(win, offset_x, offset_y, master_volume)
 
+        self.static_chunks.draw(win, offset_x, offset_y, above=True)
         for ent in above_player:
             ent.draw(win, offset_x, offset_y, master_volume)
 
@@ -261,156 +435,128 @@ class Level:
             effect.draw(win, offset_x, offset_y, master_volume)
 
     @staticmethod
-    def build_level(level, layout, sprite_master, image_master, objects_dict, player_audios, enemy_audios, block_audios, message_audios, win, controller, player_sprite, block_size, loading_screen) -> tuple:
-        width = len(layout[-1]) * block_size
-        height = len(layout) * block_size
+    def build_level(level, layout: CompiledLevel, sprite_master, image_master, objects_dict, player_audios, enemy_audios, block_audios, message_audios, controller, player_sprite, block_size):
+        width = int(layout.row_lengths[-1]) * block_size
+        height = layout.rows * block_size
         level_bounds = ((0, 0), (width, height))
         player_start = (0, 0)
         player_face_left = False
 
-        blocks = []
+        blocks = SlotList()
         doors = {}
-        dynamic_blocks = []
+        dynamic_blocks = SlotList()
         static_blocks = []
         triggers = []
         enemies = []
-        hazards = []
+        hazards = SlotList()
         falling_hazards = {}
         objectives = []
-        bar_colour = RETRO_WHITE if level.retro else NORMAL_WHITE
 
-        def __convert_coords__(coord: int) -> int:
-            actual_size = block_size // 2
-            if coord < actual_size:
-                return coord * actual_size
-            else:
-                return coord
-
-        for i in range(len(layout)):
-            win.fill((0, 0, 0))
-            win.blit(loading_screen, ((win.get_width() - loading_screen.get_width()) / 2, (win.get_height() - loading_screen.get_height()) / 2))
-            bar = pygame.Surface((int(win.get_width() * ((i + 1) / len(layout))), 10), pygame.SRCALPHA)
-            bar.fill(bar_colour)
-            win.blit(bar, (0, win.get_height() - 12))
-            pct = 100 * (i + 1)//len(layout)
-            display_text(f'Building level... {" " if pct < 100 else ""}{" " if pct < 10 else ""}{pct}%', controller, min_pause_time=0, should_sleep=False, retro=level.retro, background=True)
-            static_blocks.append([])
-            for j in range(len(layout[i])):
-                static_blocks[-1].append(None)
-                for element in [str(i) for i in layout[i][j].split(' ')]:
-                    if len(element) > 0 and objects_dict.get(element) is not None:
-                        entry = objects_dict[element]
-                        if entry.get("data") is None or entry.get("type") is None:
-                            continue
-                        data = entry["data"]
-                        match entry["type"].upper():
-                            case "PLAYER":
-                                player_start = ((j * block_size), (i * block_size))
-                                player_face_left = False if data.get('face_left') is None else data['face_left']
-                            case "OBJECTIVE":
-                                objectives.append(Objective(level, controller, j * block_size, i * block_size, block_size, block_size, sprite_master, block_audios, is_active=(False if data.get("is_active") is None else data["is_active"]), sprite=(None if data.get("sprite") is None else data["sprite"]), sound=("objective" if data.get("sound") is None else data["sound"].lower()), text=(None if data.get("text") is None else data["text"]), trigger=(None if data.get("trigger") is None else data["trigger"]), is_blocking=(False if data.get("is_blocking") is None else data["is_blocking"]), achievement=(None if data.get("achievement") is None else data["achievement"]),  name=(element if data.get("name") is None else data["name"])))
-                            case "BLOCK":
-                                if i > 0 and len(str(layout[i - 1][j])) > 0 and objects_dict.get(str(layout[i - 1][j])) is not None and objects_dict[str(layout[i - 1][j])]["type"] in ["Block"] and (objects_dict[str(layout[i - 1][j])].get("is_blocking") is not None and objects_dict[str(layout[i - 1][j])]["is_blocking"]):
-                                    is_stacked = True
-                                else:
-                                    is_stacked = False
-                                block = Block(level, controller, j * block_size, i * block_size, block_size, block_size, image_master, block_audios, is_stacked, coord_x=__convert_coords__(data["coord_x"]), coord_y=__convert_coords__(data["coord_y"]), is_blocking=(True if data.get("is_blocking") is None else data["is_blocking"]), name=(element if data.get("name") is None else data["name"]))
-                                blocks.append(block)
-                                static_blocks[-1][-1] = block
-                            case "BREAKABLEBLOCK":
-                                if i > 0 and len(str(layout[i - 1][j])) > 0 and objects_dict.get(str(layout[i - 1][j])) is not None and objects_dict[str(layout[i - 1][j])]["type"] in ["Block"] and (objects_dict[str(layout[i - 1][j])].get("is_blocking") is not None and objects_dict[str(layout[i - 1][j])]["is_blocking"]):
-                                    is_stacked = True
-                                else:
-                                    is_stacked = False
-                                block = BreakableBlock(level, controller, j * block_size, i * block_size, block_size, block_size, image_master, block_audios, is_stacked, coord_x=__convert_coords__(data["coord_x"]), coord_y=__convert_coords__(data["coord_y"]), coord_x2=__convert_coords__(data["coord_x2"]), coord_y2=__convert_coords__(data["coord_y2"]), name=(element if data.get("name") is None else data["name"]))
-                                blocks.append(block)
-                                static_blocks[-1][-1] = block
-                            case "MOVINGBLOCK":
-                                path = None if data["path"] is None else load_path(data["path"], i, j, block_size)
-                                is_stacked = False
-                                block = MovingBlock(level, controller, j * block_size, i * block_size, block_size, block_size, image_master, block_audios, is_stacked, is_enabled=(True if data.get("is_enabled") is None else data["is_enabled"]), hold_for_collision=(False if data.get("hold_for_collision") is None else data["hold_for_collision"]), speed=data["speed"], path=path, coord_x=__convert_coords__(data["coord_x"]), coord_y=__convert_coords__(data["coord_y"]), is_blocking=(True if data.get("is_blocking") is None else data["is_blocking"]), name=(element if data.get("name") is None else data["name"]))
-                                blocks.append(block)
-                                dynamic_blocks.append(block)
-                            case "DOOR":
-                                is_stacked = True
-                                block = Door(level, controller, j * block_size, i * block_size, block_size, block_size, image_master, block_audios, is_stacked, speed=data["speed"], direction=data["direction"], is_locked=(False if data.get("is_locked") is None else data["is_locked"]), coord_x=(0 if data.get("coord_x") is None else __convert_coords__(data["coord_x"])), coord_y=(0 if data.get("coord_y") is None else __convert_coords__(data["coord_y"])), locked_coord_x=(None if data.get("locked_coord_x") is None else __convert_coords__(data["locked_coord_x"])), locked_coord_y=(None if data.get("locked_coord_y") is None else __convert_coords__(data["locked_coord_y"])), unlocked_coord_x=(None if data.get("unlocked_coord_x") is None else __convert_coords__(data["unlocked_coord_x"])), unlocked_coord_y=(None if data.get("unlocked_coord_y") is None else __convert_coords__(data["unlocked_coord_y"])), name=(element if data.get("name") is None else data["name"]))
-                                blocks.append(block)
-                                if doors.get(j) is None:
-                                    doors[j] = [block]
-                                else:
-                                    doors[j].append(block)
-                            case "MOVABLEBLOCK":
-                                is_stacked = False
-                                block = MovableBlock(level, controller, j * block_size, i * block_size, block_size, block_size, image_master, block_audios, is_stacked, coord_x=__convert_coords__(data["coord_x"]), coord_y=__convert_coords__(data["coord_y"]), name=(element if data.get("name") is None else data["name"]))
-                                blocks.append(block)
-                                dynamic_blocks.append(block)
-                            case "HAZARD":
-                                hazards.append(Hazard(level, controller, j * block_size, i * block_size, block_size, block_size, image_master, sprite_master, block_audios, controller.difficulty, hit_sides=("UDLR" if data.get("hit_sides") is None else data["hit_sides"].upper()), sprite=data["sprite"], coord_x=__convert_coords__(data["coord_x"]), coord_y=__convert_coords__(data["coord_y"]), name=(element if data.get("name") is None else data["name"])))
-                            case "MOVINGHAZARD":
-                                path = None if data["path"] is None else load_path(data["path"], i, j, block_size)
-                                is_stacked = False
-                                hazards.append(MovingHazard(level, controller, j * block_size, i * block_size, block_size, block_size, image_master, sprite_master, block_audios, controller.difficulty, is_stacked, speed=data["speed"], path=path, hit_sides=("UDLR" if data.get("hit_sides") is None else data["hit_sides"].upper()), sprite=data["sprite"], coord_x=__convert_coords__(data["coord_x"]), coord_y=__convert_coords__(data["coord_y"]), name=(element if data.get("name") is None else data["name"])))
-                            case "FALLINGHAZARD":
-                                falling_hazard = FallingHazard(level, controller, j * block_size, i * block_size, block_size, block_size, image_master, sprite_master, block_audios, controller.difficulty, drop_x=data["drop_x"] * block_size, drop_y=data["drop_y"] * block_size, fire_once=(True if data.get("fire_once") is None else data["fire_once"]), hit_sides=("UDLR" if data.get("hit_sides") is None else data["hit_sides"].upper()), sprite=data["sprite"], coord_x=__convert_coords__(data["coord_x"]), coord_y=__convert_coords__(data["coord_y"]), name=(element if data.get("name") is None else data["name"]))
-                                hazards.append(falling_hazard)
-                                if falling_hazards.get(j) is None:
-                                    falling_hazards[j] = [falling_hazard]
-                                else:
-                                    falling_hazards[j].append(falling_hazard)
-                            case "ENEMY":
-                                path = None if data["path"] is None else load_path(data["path"], i, j, block_size)
-                                enemies.append(NonPlayer(level, controller, j * block_size, i * block_size, sprite_master, enemy_audios, controller.difficulty, block_size, path=path, kill_at_end=(False if data.get("kill_at_end") is None else data["kill_at_end"]), is_hostile=(True if data.get("is_hostile") is None else data["is_hostile"]), collision_message=(None if data.get("collision_message") is None else data["collision_message"]), bark=(None if data.get("bark") is None else data["bark"]), hp=data["hp"], can_shoot=(False if data.get("can_shoot") is None else data["can_shoot"]), sprite=data["sprite"], proj_sprite=(None if data.get("proj_sprite") is None else data["proj_sprite"]), name=(element if data.get("name") is None else data["name"])))
-                            case "BOSS":
-                                path = None if data["path"] is None else load_path(data["path"], i, j, block_size)
-                                enemies.append(Boss(level, controller, j * block_size, i * block_size, sprite_master, enemy_audios, controller.difficulty, block_size, music=(None if data.get("music") is None else data["music"]), trigger=(None if data.get("trigger") is None else data["trigger"]), path=path, hp=data["hp"], show_health_bar=(True if data.get("show_health_bar") is None else data["show_health_bar"]), can_shoot=(False if data.get("can_shoot") is None else data["can_shoot"]), sprite=data["sprite"], proj_sprite=(None if data.get("proj_sprite") is None else data["proj_sprite"]), name=(element if data.get("name") is None else data["name"])))
-                            case "TRIGGER":
-                                packed_input = (None if data.get("input") is None else data["input"])
-                                triggers.append(Trigger(level, controller, j * block_size, (i - (data["height"] - 1)) * block_size, data["width"] * block_size, data["height"] * block_size, packed_input, fire_once=(True if data.get("fire_once") is None else data["fire_once"]), name=(element if data.get("name") is None else data["name"])))
-                            case "TEXTTRIGGER":
-                                packed_input = {'ref': message_audios, 'input': (None if data.get("input") is None else data["input"])}
-                                triggers.append(TextTrigger(level, controller, j * block_size, (i - (data["height"] - 1)) * block_size, data["width"] * block_size, data["height"] * block_size, packed_input, fire_once=(True if data.get("fire_once") is None else data["fire_once"]), name=(element if data.get("name") is None else data["name"])))
-                            case "SOUNDTRIGGER":
-                                packed_input = (None if data.get("input") is None else data["input"])
-                                triggers.append(SoundTrigger(level, controller, j * block_size, (i - (data["height"] - 1)) * block_size, data["width"] * block_size, data["height"] * block_size, packed_input, fire_once=(True if data.get("fire_once") is None else data["fire_once"]), name=(element if data.get("name") is None else data["name"])))
-                            case "SPAWNTRIGGER":
-                                all_refs = {'objects_dict': objects_dict, 'sprite_master': sprite_master, 'enemy_audios': enemy_audios, 'block_audios': block_audios, 'message_audios': message_audios, 'image_master': image_master, 'block_size': block_size}
-                                packed_input = {'ref': all_refs, 'input': (None if data.get("input") is None else data["input"])}
-                                triggers.append(SpawnTrigger(level, controller, j * block_size, (i - (data["height"] - 1)) * block_size, data["width"] * block_size, data["height"] * block_size, packed_input, fire_once=(True if data.get("fire_once") is None else data["fire_once"]), name=(element if data.get("name") is None else data["name"])))
-                            case "REVERTTRIGGER":
-                                packed_input = (None if data.get("input") is None else data["input"])
-                                triggers.append(RevertTrigger(level, controller, j * block_size, (i - (data["height"] - 1)) * block_size, data["width"] * block_size, data["height"] * block_size, packed_input, fire_once=(True if data.get("fire_once") is None else data["fire_once"]), name=(element if data.get("name") is None else data["name"])))
-                            case "SAVETRIGGER":
-                                packed_input = (None if data.get("input") is None else data["input"])
-                                triggers.append(SaveTrigger(level, controller, j * block_size, (i - (data["height"] - 1)) * block_size, data["width"] * block_size, data["height"] * block_size, packed_input, fire_once=(True if data.get("fire_once") is None else data["fire_once"]), name=(element if data.get("name") is None else data["name"])))
-                            case "CHANGELEVELTRIGGER":
-                                packed_input = (None if data.get("input") is None else data["input"])
-                                triggers.append(ChangeLevelTrigger(level, controller, j * block_size, (i - (data["height"] - 1)) * block_size, data["width"] * block_size, data["height"] * block_size, packed_input, fire_once=(True if data.get("fire_once") is None else data["fire_once"]), name=(element if data.get("name") is None else data["name"])))
-                            case "PROPERTYTRIGGER":
-                                packed_input = (None if data.get("input") is None else data["input"])
-                                triggers.append(PropertyTrigger(level, controller, j * block_size, (i - (data["height"] - 1)) * block_size, data["width"] * block_size, data["height"] * block_size, packed_input, fire_once=(True if data.get("fire_once") is None else data["fire_once"]), name=(element if data.get("name") is None else data["name"])))
-                            case "CINEMATICTRIGGER":
-                                packed_input = (None if data.get("input") is None else data["input"])
-                                triggers.append(CinematicTrigger(level, controller, j * block_size, (i - (data["height"] - 1)) * block_size, data["width"] * block_size, data["height"] * block_size, packed_input, fire_once=(True if data.get("fire_once") is None else data["fire_once"]), name=(element if data.get("name") is None else data["name"])))
-                            case "ACHIEVEMENTTRIGGER":
-                                packed_input = (None if data.get("input") is None else data["input"])
-                                triggers.append(AchievementTrigger(level, controller, j * block_size, (i - (data["height"] - 1)) * block_size, data["width"] * block_size, data["height"] * block_size, packed_input, fire_once=(True if data.get("fire_once") is None else data["fire_once"]), name=(element if data.get("name") is None else data["name"])))
-                            case "OBJECTIVETRIGGER":
-                                packed_input = (None if data.get("input") is None else data["input"])
-                                triggers.append(ObjectiveTrigger(level, controller, j * block_size, (i - (data["height"] - 1)) * block_size, data["width"] * block_size, data["height"] * block_size, packed_input, fire_once=(True if data.get("fire_once") is None else data["fire_once"]), name=(element if data.get("name") is None else data["name"])))
-                            case "SWAPLEVELTRIGGER":
-                                packed_input = (None if data.get("input") is None else data["input"])
-                                triggers.append(SwapLevelTrigger(level, controller, j * block_size, (i - (data["height"] - 1)) * block_size, data["width"] * block_size, data["height"] * block_size, packed_input, fire_once=(True if data.get("fire_once") is None else data["fire_once"]), name=(element if data.get("name") is None else data["name"])))
-                            case "CAMERATOPOINTTRIGGER":
-                                packed_input = {'ref': block_size, 'input': (None if data.get("input") is None else data["input"])}
-                                triggers.append(CameraToPointTrigger(level, controller, j * block_size, (i - (data["height"] - 1)) * block_size, data["width"] * block_size, data["height"] * block_size, packed_input, fire_once=(True if data.get("fire_once") is None else data["fire_once"]), name=(element if data.get("name") is None else data["name"])))
-                            case "CAMERATOPLAYERTRIGGER":
-                                packed_input = (None if data.get("input") is None else data["input"])
-                                triggers.append(CameraToPlayerTrigger(level, controller, j * block_size, (i - (data["height"] - 1)) * block_size, data["width"] * block_size, data["height"] * block_size, packed_input, fire_once=(True if data.get("fire_once") is None else data["fire_once"]), name=(element if data.get("name") is None else data["name"])))
-                            case "DISCORDSTATUSTRIGGER":
-                                packed_input = (None if data.get("input") is None else data["input"])
-                                triggers.append(DiscordStatusTrigger(level, controller, j * block_size, (i - (data["height"] - 1)) * block_size, data["width"] * block_size, data["height"] * block_size, packed_input, fire_once=(True if data.get("fire_once") is None else data["fire_once"]), name=(element if data.get("name") is None else data["name"])))
-                            case _:
-                                pass
+        for i in range(layout.rows):
+            static_blocks.append([None] * int(layout.row_lengths[i]))
+            row = layout.grid[i].tolist()
+            stacked = layout.stacked[i].tolist()
+            for j in range(len(static_blocks[-1])):
+                if row[j] == 0:
+                    continue
+                # a step per tile with something on it, since a single row of a big level is already too much for one frame
+                yield "Building level...", (i + ((j + 1) / len(row))) / layout.rows
+                for element, entry_type in layout.cells[row[j]]:
+                    args = layout.args[element]
+                    kwargs = args["kwargs"]
+                    match entry_type:
+                        case "PLAYER":
+                            player_start = ((j * block_size), (i * block_size))
+                            player_face_left = args["face_left"]
+                        case "OBJECTIVE":
+                            objectives.append(Objective(level, controller, j * block_size, i * block_size, block_size, block_size, sprite_master, block_audios, **kwargs))
+                        case "BLOCK":
+                            is_stacked = bool(stacked[j])
+                            block = Block(level, controller, j * block_size, i * block_size, block_size, block_size, image_master, block_audios, is_stacked, **kwargs)
+                            block.grid_cell = (i, j)
+                            blocks.append(block)
+                            static_blocks[-1][j] = block
+                        case "BREAKABLEBLOCK":
+                            is_stacked = bool(stacked[j])
+                            block = BreakableBlock(level, controller, j * block_size, i * block_size, block_size, block_size, image_master, block_audios, is_stacked, **kwargs)
+                            block.grid_cell = (i, j)
+                            blocks.append(block)
+                            static_blocks[-1][j] = block
+                        case "MOVINGBLOCK":
+                            path = None if args["path"] is None else load_path(args["path"], i, j, block_size)
+                            is_stacked = False
+                            block = MovingBlock(level, controller, j * block_size, i * block_size, block_size, block_size, image_master, block_audios, is_stacked, path=path, **kwargs)
+                            blocks.append(block)
+                            dynamic_blocks.append(block)
+                        case "DOOR":
+                            is_stacked = True
+                            block = Door(level, controller, j * block_size, i * block_size, block_size, block_size, image_master, block_audios, is_stacked, **kwargs)
+                            blocks.append(block)
+                            if doors.get(j) is None:
+                                doors[j] = [block]
+                            else:
+                                doors[j].append(block)
+                        case "MOVABLEBLOCK":
+                            is_stacked = False
+                            block = MovableBlock(level, controller, j * block_size, i * block_size, block_size, block_size, image_master, block_audios, is_stacked, **kwargs)
+                            blocks.append(block)
+                            dynamic_blocks.append(block)
+                        case "HAZARD":
+                            hazards.append(Hazard(level, controller, j * block_size, i * block_size, block_size, block_size, image_master, sprite_master, block_audios, controller.difficulty, **kwargs))
+                        case "MOVINGHAZARD":
+                            path = None if args["path"] is None else load_path(args["path"], i, j, block_size)
+                            is_stacked = False
+                            hazards.append(MovingHazard(level, controller, j * block_size, i * block_size, block_size, block_size, image_master, sprite_master, block_audios, controller.difficulty, is_stacked, path=path, **kwargs))
+                        case "FALLINGHAZARD":
+                            falling_hazard = FallingHazard(level, controller, j * block_size, i * block_size, block_size, block_size, image_master, sprite_master, block_audios, controller.difficulty, **kwargs)
+                            falling_hazard.column = j
+                            hazards.append(falling_hazard)
+                            if falling_hazards.get(j) is None:
+                                falling_hazards[j] = [falling_hazard]
+                            else:
+                                falling_hazards[j].append(falling_hazard)
+                        case "ENEMY":
+                            path = None if args["path"] is None else load_path(args["path"], i, j, block_size)
+                            enemies.append(NonPlayer(level, controller, j * block_size, i * block_size, sprite_master, enemy_audios, controller.difficulty, block_size, path=path, **kwargs))
+                        case "BOSS":
+                            path = None if args["path"] is None else load_path(args["path"], i, j, block_size)
+                            enemies.append(Boss(level, controller, j * block_size, i * block_size, sprite_master, enemy_audios, controller.difficulty, block_size, path=path, **kwargs))
+                        case "TRIGGER":
+                            triggers.append(Trigger(level, controller, j * block_size, (i * block_size) - args["rise"], args["width"], args["height"], args["input"], **kwargs))
+                        case "TEXTTRIGGER":
+                            packed_input = {'ref': message_audios, 'input': args["input"]}
+                            triggers.append(TextTrigger(level, controller, j * block_size, (i * block_size) - args["rise"], args["width"], args["height"], packed_input, **kwargs))
+                        case "SOUNDTRIGGER":
+                            triggers.append(SoundTrigger(level, controller, j * block_size, (i * block_size) - args["rise"], args["width"], args["height"], args["input"], **kwargs))
+                        case "SPAWNTRIGGER":
+                            all_refs = {'objects_dict': objects_dict, 'sprite_master': sprite_master, 'enemy_audios': enemy_audios, 'block_audios': block_audios, 'message_audios': message_audios, 'image_master': image_master, 'block_size': block_size}
+                            packed_input = {'ref': all_refs, 'input': args["input"]}
+                            triggers.append(SpawnTrigger(level, controller, j * block_size, (i * block_size) - args["rise"], args["width"], args["height"], packed_input, **kwargs))
+                        case "REVERTTRIGGER":
+                            triggers.append(RevertTrigger(level, controller, j * block_size, (i * block_size) - args["rise"], args["width"], args["height"], args["input"], **kwargs))
+                        case "SAVETRIGGER":
+                            triggers.append(SaveTrigger(level, controller, j * block_size, (i * block_size) - args["rise"], args["width"], args["height"], args["input"], **kwargs))
+                        case "CHANGELEVELTRIGGER":
+                            triggers.append(ChangeLevelTrigger(level, controller, j * block_size, (i * block_size) - args["rise"], args["width"], args["height"], args["input"], **kwargs))
+                        case "PROPERTYTRIGGER":
+                            triggers.append(PropertyTrigger(level, controller, j * block_size, (i * block_size) - args["rise"], args["width"], args["height"], args["input"], **kwargs))
+                        case "CINEMATICTRIGGER":
+                            triggers.append(CinematicTrigger(level, controller, j * block_size, (i * block_size) - args["rise"], args["width"], args["height"], args["input"], **kwargs))
+                        case "ACHIEVEMENTTRIGGER":
+                            triggers.append(AchievementTrigger(level, controller, j * block_size, (i * block_size) - args["rise"], args["width"], args["height"], args["input"], **kwargs))
+                        case "OBJECTIVETRIGGER":
+                            triggers.append(ObjectiveTrigger(level, controller, j * block_size, (i * block_size) - args["rise"], args["width"], args["height"], args["input"], **kwargs))
+                        case "SWAPLEVELTRIGGER":
+                            triggers.append(SwapLevelTrigger(level, controller, j * block_size, (i * block_size) - args["rise"], args["width"], args["height"], args["input"], **kwargs))
+                        case "CAMERATOPOINTTRIGGER":
+                            packed_input = {'ref': block_size, 'input': args["input"]}
+                            triggers.append(CameraToPointTrigger(level, controller, j * block_size, (i * block_size) - args["rise"], args["width"], args["height"], packed_input, **kwargs))
+                        case "CAMERATOPLAYERTRIGGER":
+                            triggers.append(CameraToPlayerTrigger(level, controller, j * block_size, (i * block_size) - args["rise"], args["width"], args["height"], args["input"], **kwargs))
+                        case "DISCORDSTATUSTRIGGER":
+                            triggers.append(DiscordStatusTrigger(level, controller, j * block_size, (i * block_size) - args["rise"], args["width"], args["height"], args["input"], **kwargs))
+                        case _:
+                            pass
 
         if player_sprite is not None:
             selected_sprite = selected_retro_sprite = f'{player_sprite}Player{controller.player_sprite_selected}'
@@ -422,14 +568,9 @@ class Level:
             player.direction = player.facing = MovementDirection.LEFT
 
         to_link = [ent for ent in [player] + blocks + hazards + enemies + objectives if hasattr(ent, 'trigger')]
+        trigger_index = NameIndex(triggers)
         for i, ent in enumerate(to_link):
-            win.fill((0, 0, 0))
-            win.blit(loading_screen, ((win.get_width() - loading_screen.get_width()) / 2, (win.get_height() - loading_screen.get_height()) / 2))
-            bar = pygame.Surface((int(win.get_width() * ((i + 1) / len(to_link))), 10), pygame.SRCALPHA)
-            bar.fill(bar_colour)
-            win.blit(bar, (0, win.get_height() - 12))
-            pct = 100 * (i + 1) // len(to_link)
-            display_text(f'Linking game objects... {" " if pct < 100 else ""}{" " if pct < 10 else ""}{pct}%', controller, min_pause_time=0, should_sleep=False, retro=level.retro, background=True)
-            ent.link_triggers(triggers)
+            yield "Linking game objects...", (i + 1) / len(to_link)
+            ent.link_triggers(trigger_index)
 
         return level_bounds, player, triggers, blocks, dynamic_blocks, doors, static_blocks, hazards, falling_hazards, enemies, objectives
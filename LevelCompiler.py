@@ -0,0 +1,182 @@
+import csv
+import hashlib
+import io
+import json
+import struct
+import threading
+import numpy as np
+from os import makedirs, getpid, remove, replace
+from os.path import join, isfile
+from Helpers import GAME_DATA_FOLDER
+
+
+class CompiledLevel:
+    def __init__(self, grid: np.ndarray, row_lengths: np.ndarray, stacked: np.ndarray, cells: list[tuple], args: dict[str, dict]) -> None:
+        # grid holds an index into cells for every tile (0 is an empty tile), and cells holds the (element, type) pairs each index stands for
+        self.grid: np.ndarray = grid
+        self.row_lengths: np.ndarray = row_lengths
+        self.stacked: np.ndarray = stacked
+        self.cells: list[tuple] = cells
+        # each element's constructor arguments, with the defaults and block size already applied, so building a tile is just the call
+        self.args: dict[str, dict] = args
+
+    @property
+    def rows(self) -> int:
+        return self.grid.shape[0]
+
+
+class LevelCompiler:
+    MAGIC: bytes = b"AGLC"
+    VERSION: int = 2
+    HEADER: struct.Struct = struct.Struct("<4sH32sIII")
+    TRIGGER_TYPES: tuple[str, ...] = ("TRIGGER", "TEXTTRIGGER", "SOUNDTRIGGER", "SPAWNTRIGGER", "REVERTTRIGGER", "SAVETRIGGER", "CHANGELEVELTRIGGER", "PROPERTYTRIGGER", "CINEMATICTRIGGER", "ACHIEVEMENTTRIGGER", "OBJECTIVETRIGGER", "SWAPLEVELTRIGGER", "CAMERATOPOINTTRIGGER", "CAMERATOPLAYERTRIGGER", "DISCORDSTATUSTRIGGER")
+    CACHE_FOLDER: str = join(GAME_DATA_FOLDER, "CompiledLevels")
+
+    @staticmethod
+    def load(name: str, path: str, objects_dict: dict, block_size: int) -> CompiledLevel:
+        with open(path, "rb") as file:
+            source = file.read()
+        # the compiled level depends on the layout, the object definitions and the block size, so a change to any of them recompiles it
+        digest = hashlib.sha256(source + json.dumps({"objects": objects_dict, "block_size": block_size}, sort_keys=True).encode()).digest()
+        cache_file = join(LevelCompiler.CACHE_FOLDER, f'{name}.aglc')
+
+        if isfile(cache_file):
+            compiled = LevelCompiler.__read__(cache_file, digest)
+            if compiled is not None:
+                return compiled
+
+        compiled = LevelCompiler.compile(source.decode(), objects_dict, block_size)
+        try:
+            LevelCompiler.__write__(cache_file, digest, compiled)
+        except OSError:
+            # the cache only saves time, so a read-only game folder shouldn't stop the level from loading
+            pass
+        return compiled
+
+    @staticmethod
+    def compile(source: str, objects_dict: dict, block_size: int) -> CompiledLevel:
+        layout = [row for row in csv.reader(io.StringIO(source), delimiter=",", quotechar='"')]
+        row_lengths = np.array([len(row) for row in layout], dtype=np.int32)
+        grid = np.zeros((len(layout), (0 if len(layout) == 0 else int(row_lengths.max()))), dtype=np.int32)
+        stacked = np.zeros(grid.shape, dtype=np.uint8)
+        cells = [()]
+        cell_ids = {(): 0}
+        args = {}
+
+        for i in range(len(layout)):
+            for j in range(len(layout[i])):
+                cell = []
+                for element in [str(i) for i in layout[i][j].split(' ')]:
+                    if len(element) > 0 and objects_dict.get(element) is not None:
+                        entry = objects_dict[element]
+                        if entry.get("data") is None or entry.get("type") is None:
+                            continue
+                        cell.append((element, entry["type"].upper()))
+                        # only elements that are actually placed get resolved, so a broken definition nobody uses still doesn't stop the level
+                        if args.get(element) is None:
+                            args[element] = LevelCompiler.__resolve__(element, entry["type"].upper(), entry["data"], block_size)
+                cell = tuple(cell)
+                if cell_ids.get(cell) is None:
+                    cell_ids[cell] = len(cells)
+                    cells.append(cell)
+                grid[i, j] = cell_ids[cell]
+
+                # this looks at the whole tile above (not its separate elements) and the top level of its entry, exactly like the original builder did
+                if i > 0 and j < len(layout[i - 1]):
+                    above = str(layout[i - 1][j])
+                    if len(above) > 0 and objects_dict.get(above) is not None and objects_dict[above].get("type") in ["Block"] and (objects_dict[above].get("is_blocking") is not None and objects_dict[above]["is_blocking"]):
+                        stacked[i, j] = 1
+
+        return CompiledLevel(grid, row_lengths, stacked, cells, args)
+
+    @staticmethod
+    def __resolve__(element: str, entry_type: str, data: dict, block_size: int) -> dict:
+        # kwargs go straight to the constructor, and anything that still depends on where the tile is (a path, a trigger's height) is kept next to them
+        def __convert_coords__(coord: int) -> int:
+            actual_size = block_size // 2
+            if coord < actual_size:
+                return coord * actual_size
+            else:
+                return coord
+
+        name = (element if data.get("name") is None else data["name"])
+        match entry_type:
+            case "PLAYER":
+                return {"kwargs": {}, "face_left": (False if data.get("face_left") is None else data["face_left"])}
+            case "OBJECTIVE":
+                return {"kwargs": {"is_active": (False if data.get("is_active") is None else data["is_active"]), "sprite": (None if data.get("sprite") is None else data["sprite"]), "sound": ("objective" if data.get("sound") is None else data["sound"].lower()), "text": (None if data.get("text") is None else data["text"]), "trigger": (None if data.get("trigger") is None else data["trigger"]), "is_blocking": (False if data.get("is_blocking") is None else data["is_blocking"]), "achievement": (None if data.get("achievement") is None else data["achievement"]), "name": name}}
+            case "BLOCK":
+                return {"kwargs": {"coord_x": __convert_coords__(data["coord_x"]), "coord_y": __convert_coords__(data["coord_y"]), "is_blocking": (True if data.get("is_blocking") is None else data["is_blocking"]), "name": name}}
+            case "BREAKABLEBLOCK":
+                return {"kwargs": {"coord_x": __convert_coords__(data["coord_x"]), "coord_y": __convert_coords__(data["coord_y"]), "coord_x2": __convert_coords__(data["coord_x2"]), "coord_y2": __convert_coords__(data["coord_y2"]), "name": name}}
+            case "MOVINGBLOCK":
+                return {"kwargs": {"is_enabled": (True if data.get("is_enabled") is None else data["is_enabled"]), "hold_for_collision": (False if data.get("hold_for_collision") is None else data["hold_for_collision"]), "speed": data["speed"], "coord_x": __convert_coords__(data["coord_x"]), "coord_y": __convert_coords__(data["coord_y"]), "is_blocking": (True if data.get("is_blocking") is None else data["is_blocking"]), "name": name}, "path": data["path"]}
+            case "DOOR":
+                return {"kwargs": {"speed": data["speed"], "direction": data["direction"], "is_locked": (False if data.get("is_locked") is None else data["is_locked"]), "coord_x": (0 if data.get("coord_x") is None else __convert_coords__(data["coord_x"])), "coord_y": (0 if data.get("coord_y") is None else __convert_coords__(data["coord_y"])), "locked_coord_x": (None if data.get("locked_coord_x") is None else __convert_coords__(data["locked_coord_x"])), "locked_coord_y": (None if data.get("locked_coord_y") is None else __convert_coords__(data["locked_coord_y"])), "unlocked_coord_x": (None if data.get("unlocked_coord_x") is None else __convert_coords__(data["unlocked_coord_x"])), "unlocked_coord_y": (None if data.get("unlocked_coord_y") is None else __convert_coords__(data["unlocked_coord_y"])), "name": name}}
+            case "MOVABLEBLOCK":
+                return {"kwargs": {"coord_x": __convert_coords__(data["coord_x"]), "coord_y": __convert_coords__(data["coord_y"]), "name": name}}
+            case "HAZARD":
+                return {"kwargs": {"hit_sides": ("UDLR" if data.get("hit_sides") is None else data["hit_sides"].upper()), "sprite": data["sprite"], "coord_x": __convert_coords__(data["coord_x"]), "coord_y": __convert_coords__(data["coord_y"]), "name": name}}
+            case "MOVINGHAZARD":
+                return {"kwargs": {"speed": data["speed"], "hit_sides": ("UDLR" if data.get("hit_sides") is None else data["hit_sides"].upper()), "sprite": data["sprite"], "coord_x": __convert_coords__(data["coord_x"]), "coord_y": __convert_coords__(data["coord_y"]), "name": name}, "path": data["path"]}
+            case "FALLINGHAZARD":
+                return {"kwargs": {"drop_x": data["drop_x"] * block_size, "drop_y": data["drop_y"] * block_size, "fire_once": (True if data.get("fire_once") is None else data["fire_once"]), "hit_sides": ("UDLR" if data.get("hit_sides") is None else data["hit_sides"].upper()), "sprite": data["sprite"], "coord_x": __convert_coords__(data["coord_x"]), "coord_y": __convert_coords__(data["coord_y"]), "name": name}}
+            case "ENEMY":
+                return {"kwargs": {"kill_at_end": (False if data.get("kill_at_end") is None else data["kill_at_end"]), "is_hostile": (True if data.get("is_hostile") is None else data["is_hostile"]), "collision_message": (None if data.get("collision_message") is None else data["collision_message"]), "bark": (None if data.get("bark") is None else data["bark"]), "hp": data["hp"], "can_shoot": (False if data.get("can_shoot") is None else data["can_shoot"]), "sprite": data["sprite"], "proj_sprite": (None if data.get("proj_sprite") is None else data["proj_sprite"]), "name": name}, "path": data["path"]}
+            case "BOSS":
+                return {"kwargs": {"music": (None if data.get("music") is None else data["music"]), "trigger": (None if data.get("trigger") is None else data["trigger"]), "hp": data["hp"], "show_health_bar": (True if data.get("show_health_bar") is None else data["show_health_bar"]), "can_shoot": (False if data.get("can_shoot") is None else data["can_shoot"]), "sprite": data["sprite"], "proj_sprite": (None if data.get("proj_sprite") is None else data["proj_sprite"]), "name": name}, "path": data["path"]}
+            case _ if entry_type in LevelCompiler.TRIGGER_TYPES:
+                # a trigger is placed by its bottom tile, so it reaches up by everything above that
+                return {"kwargs": {"fire_once": (True if data.get("fire_once") is None else data["fire_once"]), "name": name}, "input": (None if data.get("input") is None else data["input"]), "width": data["width"] * block_size, "height": data["height"] * block_size, "rise": (data["height"] - 1) * block_size}
+            case _:
+                return {"kwargs": {}}
+
+    @staticmethod
+    def __write__(cache_file: str, digest: bytes, compiled: CompiledLevel) -> None:
+        makedirs(LevelCompiler.CACHE_FOLDER, exist_ok=True)
+        table = json.dumps({"cells": compiled.cells, "args": compiled.args}).encode()
+        # it's written next to the cache and then swapped in, so a killed game or another loader writing the same level never leaves half a file behind
+        temp_file = f'{cache_file}.{getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(temp_file, "wb") as file:
+                file.write(LevelCompiler.HEADER.pack(LevelCompiler.MAGIC, LevelCompiler.VERSION, digest, compiled.grid.shape[0], compiled.grid.shape[1], len(table)))
+                file.write(table)
+                file.write(compiled.row_lengths.astype("<i4").tobytes())
+                file.write(compiled.grid.astype("<i4").tobytes())
+                file.write(compiled.stacked.tobytes())
+            replace(temp_file, cache_file)
+        except OSError:
+            if isfile(temp_file):
+                remove(temp_file)
+            raise
+
+    @staticmethod
+    def __read__(cache_file: str, digest: bytes) -> CompiledLevel | None:
+        try:
+            with open(cache_file, "rb") as file:
+                data = file.read()
+        except OSError:
+            return None
+        if len(data) < LevelCompiler.HEADER.size:
+            return None
+        # a damaged cache file counts as a miss, so the level just gets compiled again and the file replaced
+        try:
+            magic, version, cached_digest, rows, cols, table_size = LevelCompiler.HEADER.unpack_from(data)
+            if magic != LevelCompiler.MAGIC or version != LevelCompiler.VERSION or cached_digest != digest:
+                return None
+
+            offset = LevelCompiler.HEADER.size
+            table = json.loads(data[offset:offset + table_size])
+            cells = [tuple(tuple(element) for element in cell) for cell in table["cells"]]
+            args = table["args"]
+            offset += table_size
+            if len(data) != offset + (4 * rows) + (5 * rows * cols):
+                return None
+            row_lengths = np.frombuffer(data, dtype="<i4", count=rows, offset=offset)
+            offset += 4 * rows
+            grid = np.frombuffer(data, dtype="<i4", count=rows * cols, offset=offset).reshape((rows, cols))
+            offset += 4 * rows * cols
+            stacked = np.frombuffer(data, dtype=np.uint8, count=rows * cols, offset=offset).reshape((rows, cols))
+        except (ValueError, TypeError, KeyError, struct.error):
+            return None
+        return CompiledLevel(grid, row_lengths, stacked, cells, args)
@@ -0,0 +1,193 @@
+import threading
+import time
+import pygame
+from Helpers import display_text, is_headless, NORMAL_WHITE, RETRO_WHITE
+
+
+class LevelLoader:
+    FPS: int = 30
+
+    def __init__(self, win: pygame.Surface, controller, loading_screen: pygame.Surface, retro: bool=False) -> None:
+        self.win = win
+        self.controller = controller
+        self.loading_screen = loading_screen
+        self.retro = retro
+        self.lock = threading.Lock()
+        self.text: str = "Loading mission..."
+        self.fraction: float | None = None
+        self.last_draw: float = 0.0
+
+    def report(self, text: str, fraction: float | None=None) -> None:
+        # the worker can call this as often as it likes, the loading screen only picks up whatever the latest value is when it redraws
+        with self.lock:
+            self.text = text
+            self.fraction = fraction
+
+    def step(self, text: str, fraction: float | None=None) -> None:
+        # the main thread calls this between steps of the build, and the screen is only redrawn once a frame's worth of time has gone by
+        self.report(text, fraction)
+        if not is_headless() and time.perf_counter() - self.last_draw >= 1 / LevelLoader.FPS:
+            self.__pump__()
+
+    def __pump__(self) -> None:
+        # only quitting is handled while loading, anything else (a gamepad plugged in, the music ending) stays queued for the game loop
+        for event in pygame.event.get(pygame.QUIT):
+            self.controller.quit()
+        self.__draw__()
+        self.last_draw = time.perf_counter()
+
+    def __draw__(self) -> None:
+        with self.lock:
+            text, fraction = self.text, self.fraction
+        self.win.fill((0, 0, 0))
+        self.win.blit(self.loading_screen, ((self.win.get_width() - self.loading_screen.get_width()) / 2, (self.win.get_height() - self.loading_screen.get_height()) / 2))
+        if fraction is not None:
+            bar = pygame.Surface((int(self.win.get_width() * fraction), 10), pygame.SRCALPHA)
+            bar.fill(RETRO_WHITE if self.retro else NORMAL_WHITE)
+            self.win.blit(bar, (0, self.win.get_height() - 12))
+            pct = int(100 * fraction)
+            text = f'{text} {" " if pct < 100 else ""}{" " if pct < 10 else ""}{pct}%'
+        display_text(text, self.controller, min_pause_time=0, should_sleep=False, retro=self.retro, background=True)
+
+    def run(self, prepare, build=None):
+        # prepare only reads and decodes data (no surfaces, SDL can't make those off the main thread), build then makes the entities and sprites here from what it returned
+        if is_headless():
+            data = prepare(self.report)
+            return data if build is None else build(data, self.step)
+
+        result = {}
+
+        def __work__() -> None:
+            try:
+                result["value"] = prepare(self.report)
+            except BaseException as e:
+                result["error"] = e
+
+        # the data is read on its own thread, so the window keeps handling events and the loading screen keeps moving while it runs
+        thread = threading.Thread(target=__work__, name="LevelLoader", daemon=True)
+        thread.start()
+        clock = pygame.time.Clock()
+        while thread.is_alive():
+            self.__pump__()
+            clock.tick(LevelLoader.FPS)
+        thread.join()
+
+        if result.get("error") is not None:
+            raise result["error"]
+        if build is None:
+            return result.get("value")
+        self.__pump__()
+        return build(result.get("value"), self.step)
+
+
+def run_steps(steps, report=None):
+    # runs a build written as steps straight through, handing each (text, fraction) it yields to report, and returns what the build returns
+    while True:
+        try:
+            text, fraction = next(steps)
+        except StopIteration as e:
+            return e.value
+        if report is not None:
+            report(text, fraction)
+
+
+class BuildCancelled(Exception):
+    pass
+
+
+class LevelPreloader:
+    # the worker sleeps for this long at every progress report, so the game thread keeps getting its turn while the next level's data is read
+    YIELD_TIME: float = 0.002
+
+    def __init__(self, prepare, budget: int | None=None, build=None) -> None:
+        # prepare gets the same (name, report) as LevelLoader's first phase, and must not make any surfaces since this runs during play
+        self.prepare = prepare
+        self.budget: int | None = budget
+        # build turns what prepare returned into steps (see run_steps), which advance then runs on the main thread a slice at a time
+        self.build = build
+        self.steps = None
+        self.key: tuple | None = None
+        self.thread: threading.Thread | None = None
+        self.result: dict = {}
+        self.cancelled: threading.Event | None = None
+
+    def start(self, key: tuple, headroom: int | None=None) -> None:
+        # the first part of the key is the level name, the rest is whatever else the data depends on
+        if key[0] is None or key == self.key or (self.budget is not None and (self.budget <= 0 or headroom is None or headroom < self.budget)):
+            return
+        self.discard()
+        self.key = key
+        result = self.result = {}
+        cancelled = self.cancelled = threading.Event()
+
+        def __report__(text: str, fraction: float | None=None) -> None:
+            # a discarded build stops at its next report, instead of carrying on and filling the caches for nothing
+            if cancelled.is_set():
+                raise BuildCancelled(key[0])
+            time.sleep(LevelPreloader.YIELD_TIME)
+
+        def __work__() -> None:
+            try:
+                result["value"] = self.prepare(key[0], __report__)
+            except BaseException as e:
+                result["error"] = e
+
+        self.thread = threading.Thread(target=__work__, name="LevelPreloader", daemon=True)
+        self.thread.start()
+
+    def is_ready(self, key: tuple) -> bool:
+        return self.thread is not None and key == self.key and not self.thread.is_alive()
+
+    def is_built(self, key: tuple) -> bool:
+        return self.is_ready(key) and self.result.get("built") is not None
+
+    def advance(self, time_budget: float) -> None:
+        # the game loop calls this once a frame, and once the data has been read the build goes on from wherever it was until the time is used up
+        if self.build is None or not self.is_ready(self.key) or self.result.get("value") is None or self.result.get("built") is not None or self.result.get("error") is not None:
+            return
+        if self.steps is None:
+            self.steps = self.build(self.result["value"])
+        end = time.perf_counter() + time_budget
+        try:
+            while time.perf_counter() < end:
+                next(self.steps)
+        except StopIteration as e:
+            self.result["built"] = e.value
+            self.steps = None
+        except Exception as e:
+            # a build that fails here is just done again when the level is reached, where the error can be seen
+            self.result["error"] = e
+            self.steps = None
+
+    @staticmethod
+    def __built__(value):
+        yield from ()
+        return value
+
+    def take(self, key: tuple):
+        # a failed build just means the level gets loaded the normal way, and one for another level is kept since that one may still come next
+        if self.thread is None or key != self.key:
+            return None
+        self.thread.join()
+        # with a build, this hands back the steps still left to run (none, if it's finished), so the loading screen only covers what play didn't
+        if self.build is None:
+            value = self.result.get("value")
+        elif self.result.get("built") is not None:
+            value = LevelPreloader.__built__(self.result["built"])
+        elif self.result.get("value") is None or self.result.get("error") is not None:
+            value = None
+        elif self.steps is not None:
+            value = self.steps
+        else:
+            value = self.build(self.result["value"])
+        self.discard()
+        return value
+
+    def discard(self) -> None:
+        if self.cancelled is not None:
+            self.cancelled.set()
+        self.cancelled = None
+        self.key = None
+        self.thread = None
+        self.result = {}
+        self.steps = None
@@ -0,0 +1,58 @@
+from bisect import bisect_left, insort
+
+
+class NameIndex:
+    def __init__(self, ents=()) -> None:
+        self.seq: int = 0
+        # names are kept sorted together with the order they were added in, so every entity sharing a prefix sits in one run of the list
+        self.sorted_names: list[tuple[str, int]] = []
+        self.entries: dict[int, object] = {}
+        self.keys: dict = {}
+        self.names: dict[str, list] = {}
+        for ent in ents:
+            self.sorted_names.append(self.__register__(ent))
+        self.sorted_names.sort()
+
+    def __register__(self, ent) -> tuple[str, int]:
+        key = (ent.name.casefold(), self.seq)
+        self.seq += 1
+        self.keys[ent] = key
+        self.entries[key[1]] = ent
+        if self.names.get(key[0]) is None:
+            self.names[key[0]] = [ent]
+        else:
+            self.names[key[0]].append(ent)
+        return key
+
+    def __prefix_seqs__(self, prefix: str) -> list[int]:
+        prefix = prefix.casefold()
+        seqs = []
+        for i in range(bisect_left(self.sorted_names, (prefix,)), len(self.sorted_names)):
+            name, seq = self.sorted_names[i]
+            if not name.startswith(prefix):
+                break
+            seqs.append(seq)
+        return seqs
+
+    def add(self, ent) -> None:
+        if ent not in self.keys:
+            insort(self.sorted_names, self.__register__(ent))
+
+    def remove(self, ent) -> None:
+        key = self.keys.pop(ent, None)
+        if key is not None:
+            self.sorted_names.pop(bisect_left(self.sorted_names, key))
+            self.entries.pop(key[1])
+            self.names[key[0]].remove(ent)
+            if len(self.names[key[0]]) == 0:
+                self.names.pop(key[0])
+
+    def find(self, name: str) -> list:
+        return list(self.names.get(name.casefold(), []))
+
+    def find_prefix(self, prefix: str) -> list:
+        return [self.entries[seq] for seq in sorted(self.__prefix_seqs__(prefix))]
+
+    def first_with_prefix(self, prefix: str):
+        seqs = self.__prefix_seqs__(prefix)
+        return None if len(seqs) == 0 else self.entries[min(seqs)]
@@ -5,14 +5,16 @@ import re
 from Actor import Actor, MovementState
 from Block import Door
 from Helpers import DifficultyScale, MovementDirection, load_text_from_file, display_text, ASSETS_FOLDER, \
-    retroify_image, RETRO_BLACK, RETRO_WHITE, NORMAL_WHITE, NORMAL_BLACK, TEXT_BOX_BORDER_RADIUS, process_text
+    retroify_image, RETRO_BLACK, RETRO_WHITE, NORMAL_WHITE, NORMAL_BLACK, TEXT_BOX_BORDER_RADIUS, process_text, collide_mask
 from os.path import isfile, join
+from TransformCache import transform_cache
 
 
 class NonPlayer(Actor):
     VELOCITY_TARGET = 250
     PLAYER_SPOT_RANGE = 3
     PLAYER_SPOT_COOLDOWN = 2
+    VISION: dict[bool, dict] = {}
 
     def __init__(self, level, controller, x, y, sprite_master, audios, difficulty, block_size, path=None, kill_at_end=False, is_hostile=True, collision_message=None, bark=None, hp=100, can_shoot=False, spot_range=PLAYER_SPOT_RANGE, sprite=None, proj_sprite=None, name="Enemy"):
         super().__init__(level, controller, x, y, sprite_master, audios, difficulty, block_size, can_shoot=can_shoot, sprite=sprite, proj_sprite=proj_sprite, name=name)
@@ -49,6 +51,15 @@ class NonPlayer(Actor):
         self.max_hp = self.hp = hp * self.difficulty
         self.cooldowns.update({"spot_player": 0})
         self.cached_cooldowns = self.cooldowns.copy()
+        # every guard shares the same vision cones, so the scaled copies can be shared too
+        if NonPlayer.VISION.get(self.level.retro) is None:
+            NonPlayer.VISION[self.level.retro] = NonPlayer.__make_vision__(self.level.retro)
+        self.vision = NonPlayer.VISION[self.level.retro]
+        self.bark: pygame.Surface | None = None if bark is None else self.set_bark(load_text_from_file(bark))
+        self.has_barked = False
+
+    @staticmethod
+    def __make_vision__(retro: bool) -> dict:
         vision_hidden = pygame.Surface((256, 10), pygame.SRCALPHA)
         vision_spotted = vision_hidden.copy()
         chunk = pygame.Surface((1, 10), pygame.SRCALPHA)
@@ -60,12 +71,10 @@ class NonPlayer(Actor):
         for i in range(256):
             chunk.set_alpha(i)
             vision_spotted.blit(chunk, (i, 0))
-        if self.level.retro:
+        if retro:
             vision_hidden = retroify_image(vision_hidden)
             vision_spotted = retroify_image(vision_spotted)
-        self.vision = {"hidden": {MovementDirection.LEFT: vision_hidden, MovementDirection.RIGHT: pygame.transform.flip(vision_hidden, True, False)}, "spotted": {MovementDirection.LEFT: vision_spotted, MovementDirection.RIGHT: pygame.transform.flip(vision_spotted, True, False)}}
-        self.bark: pygame.Surface | None = None if bark is None else self.set_bark(load_text_from_file(bark))
-        self.has_barked = False
+        return {"hidden": {MovementDirection.LEFT: vision_hidden, MovementDirection.RIGHT: pygame.transform.flip(vision_hidden, True, False)}, "spotted": {MovementDirection.LEFT: vision_spotted, MovementDirection.RIGHT: pygame.transform.flip(vision_spotted, True, False)}}
 
     def set_bark(self, output: list[str] | str | None) -> pygame.Surface | None:
         if output is None or output == "":
@@ -150,7 +159,7 @@ class NonPlayer(Actor):
                     else:
                         if pygame.sprite.collide_rect(self, self.level.player):
                             self.is_attacking = True
-                            if abs(self.rect.x - self.level.player.rect.x) <= 5 or pygame.sprite.collide_mask(self, self.level.player):
+                            if abs(self.rect.x - self.level.player.rect.x) <= 5 or collide_mask(self, self.level.player):
                                 self.x_vel = 0.0
                                 if not self.is_animated_attack:
                                     self.play_attack_audio("ATTACK_MELEE")
@@ -188,10 +197,11 @@ class NonPlayer(Actor):
     def __spot_player__(self) -> bool:
         dist = math.dist(self.level.player.rect.center, self.rect.center)
         if dist <= self.__adj_spot_range__() and(self.facing == (MovementDirection.RIGHT if self.level.player.rect.centerx - self.rect.centerx >= 0 else MovementDirection.LEFT) or self.cooldowns["get_hit"] > 0):
-            for i in range(round(dist)):
-                for ent in self.level.get_entities_in_range((self.rect.centerx + (self.facing * ((self.rect.width // 2) + i)), self.rect.y), blocks_only=True):
-                    if ent.rect.collidepoint(self.rect.centerx + (self.facing * ((self.rect.width // 2) + i)), self.rect.y):
-                        return False
+            # this looks straight ahead at head height, as far as the player is
+            if round(dist) > 0:
+                start = (self.rect.centerx + (self.facing * (self.rect.width // 2)), self.rect.y)
+                if not self.level.has_line_of_sight(start, (start[0] + (self.facing * (round(dist) - 1)), start[1])):
+                    return False
             self.cooldowns["spot_player"] = NonPlayer.PLAYER_SPOT_COOLDOWN
             if self.state in [MovementState.IDLE, MovementState.CROUCH, MovementState.RUN, MovementState.IDLE_ATTACK, MovementState.CROUCH_ATTACK, MovementState.RUN_ATTACK] and self.abilities["can_shoot"] and dist > self.spot_range // 3:
                 self.shoot_at_target(self.level.player.rect.center)
@@ -235,7 +245,7 @@ class NonPlayer(Actor):
                     vision = self.vision["spotted"][self.facing]
                 else:
                     vision = self.vision["hidden"][self.facing]
-                win.blit(pygame.transform.scale(vision, (self.__adj_spot_range__(), self.rect.height // 4)), (adj_x, adj_y))
+                win.blit(transform_cache.scale(vision, (self.__adj_spot_range__(), self.rect.height // 4)), (adj_x, adj_y))
         super().draw(win, offset_x, offset_y, master_volume)
         if self.cooldowns["bark"] > 0 and self.bark is not None:
             adj_x = self.rect.x - offset_x
@@ -1,11 +1,12 @@
 import math
-import random
 import time
 
 import pygame
 from os.path import join, isfile, abspath
 from Entity import Entity
-from Helpers import handle_exception, set_sound_source, load_sprite_sheets, ASSETS_FOLDER, retroify_image
+from Helpers import handle_exception, set_sound_source, load_sprite_sheets, ASSETS_FOLDER, retroify_image, get_mask
+from TransformCache import transform_cache
+from RandomStreams import rng
 
 
 class Objective(Entity):
@@ -76,10 +77,7 @@ class Objective(Entity):
     def __collect__(self) -> float:
         start = time.perf_counter()
         self.level.objectives_collected.append(self)
-        alive = []
-        for objective in self.level.objectives:
-            if objective.hp > 0 and objective.name.casefold().split(" ")[0] == self.name.casefold().split(" ")[0]:
-                alive.append(objective)
+        alive = [objective for objective in self.level.registry.objective_group(self.name) if objective.hp > 0]
         dtime_offset: float = time.perf_counter() - start
         if len(alive) == 0:
             self.controller.activate_objective(None, True, popup=False)
@@ -92,7 +90,7 @@ class Objective(Entity):
         if self.sound is not None and self.audios.get(name.upper()) is not None:
             active_audio_channel = pygame.mixer.find_channel(force=True)
             if active_audio_channel is not None:
-                active_audio_channel.play(self.audios[name.upper()][random.randrange(len(self.audios[name.upper()]))])
+                active_audio_channel.play(self.audios[name.upper()][rng.audio.randrange(len(self.audios[name.upper()]))])
                 set_sound_source(self.rect, self.level.player.rect, self.controller.master_volume["non-player"], active_audio_channel)
 
     def update_sprite(self) -> int:
@@ -105,7 +103,7 @@ class Objective(Entity):
 
     def update_geo(self) -> None:
         self.rect = self.sprite.get_rect(topleft=(self.rect.x, self.rect.y))
-        self.mask = pygame.mask.from_surface(self.sprite)
+        self.mask = get_mask(self.sprite)
 
     def loop(self, dtime: float) -> float:
         self.animation_count += dtime
@@ -141,4 +139,4 @@ class Objective(Entity):
 
                 rotation = math.degrees(math.atan2(self.rect.x - self.level.player.rect.x, self.rect.y - self.level.player.rect.y))
 
-                win.blit(pygame.transform.rotate(self.pointer, rotation), (pointer_x, pointer_y))
+                win.blit(transform_cache.rotate(self.pointer, rotation), (pointer_x, pointer_y))
@@ -1,8 +1,8 @@
 import pygame
-import random
 from enum import Enum
 
 from Helpers import retroify_image, NORMAL_WHITE, RETRO_WHITE
+from RandomStreams import rng
 
 
 class ParticleType(Enum):
@@ -39,7 +39,7 @@ class ParticleEffect:
     def generate_static_effect(width, height, amount, color, bounds, is_retro) -> pygame.Surface:
         points = []
         for i in range(amount):
-            points.append((random.randint(0, bounds[1][0]), random.randint(0, bounds[1][1])))
+            points.append((rng.cosmetic.randint(0, bounds[1][0]), rng.cosmetic.randint(0, bounds[1][1])))
 
         image = pygame.Surface(bounds[1], pygame.SRCALPHA)
         image.set_colorkey((0, 0, 0))
@@ -57,13 +57,13 @@ class ParticleEffect:
     def generate_variable_effect(width, height, amount, color, bounds, is_retro) -> list[pygame.Surface]:
         images = []
         for i in range(amount):
-            if random.randint(0, 1) == 0:
-                radius = random.randint(1, width) * random.randint(1, width)
-                border_thickness = random.randint(0, 1)
+            if rng.cosmetic.randint(0, 1) == 0:
+                radius = rng.cosmetic.randint(1, width) * rng.cosmetic.randint(1, width)
+                border_thickness = rng.cosmetic.randint(0, 1)
                 particle = pygame.Surface(((radius + border_thickness) * 2, (radius + border_thickness) * 2), pygame.SRCALPHA)
                 pygame.draw.circle(particle, color, (radius, radius), radius, border_thickness)
             else:
-                particle = pygame.Surface((random.randint(0, width), random.randint(0, height)), pygame.SRCALPHA)
+                particle = pygame.Surface((rng.cosmetic.randint(0, width), rng.cosmetic.randint(0, height)), pygame.SRCALPHA)
                 particle.fill(color)
             images.append(particle)
         return images
@@ -87,7 +87,7 @@ class ParticleEffect:
         if self.image_count > ParticleEffect.VARIABLE_IMAGE_DISPLAY_TIME:
             self.image_count = 0
             for i in range(2):
-                next_ind = random.randint(0, len(self.image) - 1)
+                next_ind = rng.cosmetic.randint(0, len(self.image) - 1)
                 if self.image_index != next_ind:
                     self.image_index = next_ind
                     break
@@ -118,8 +118,8 @@ class ParticleEffect:
                 win.blit(self.image, (0, 0))
             elif isinstance(self.image, list):
                 for image in self.image:
-                    if random.randint(0, 1) == 1:
-                        win.blit(image, (random.randint(-image.get_width(), win.get_width() + image.get_width()), random.randint(-image.get_height(), win.get_height() + image.get_height())))
+                    if rng.cosmetic.randint(0, 1) == 1:
+                        win.blit(image, (rng.cosmetic.randint(-image.get_width(), win.get_width() + image.get_width()), rng.cosmetic.randint(-image.get_height(), win.get_height() + image.get_height())))
                 return
 
 
@@ -1,4 +1,3 @@
-import random
 import time
 import pygame
 from Actor import Actor, MovementState
@@ -6,6 +5,7 @@ from Entity import Entity
 from NonPlayer import NonPlayer
 from Block import BreakableBlock
 from Helpers import MovementDirection, load_sprite_sheets, display_text, RUMBLE_EFFECT_LOW, RUMBLE_EFFECT_DURATION
+from RandomStreams import rng
 from SimpleVFX.SimpleVFX import VisualEffect, ImageDirection
 
 
@@ -117,7 +117,7 @@ class Player(Actor):
     def revert(self) -> float:
         start = time.perf_counter()
         text = ["Careful!", "You died.", "Watch out!", "OUCH!", "Don't try that again!", "Initiating respawn...", "Reverting time..."]
-        display_text(text[random.randrange(len(text))], self.controller, min_pause_time=0, should_sleep=True, retro=self.level.retro)
+        display_text(text[rng.cosmetic.randrange(len(text))], self.controller, min_pause_time=0, should_sleep=True, retro=self.level.retro)
         self.should_move_vert = False
         self.rect.x, self.rect.y = self.cached_x, self.cached_y
         self.hp = self.max_hp
@@ -175,7 +175,7 @@ class Player(Actor):
                 if self.audios.get("BULLET_TIME") is not None:
                     active_audio_channel = pygame.mixer.find_channel()
                     if active_audio_channel is not None:
-                        active_audio_channel.play(self.audios["BULLET_TIME"][random.randrange(len(self.audios["BULLET_TIME"]))])
+                        active_audio_channel.play(self.audios["BULLET_TIME"][rng.audio.randrange(len(self.audios["BULLET_TIME"]))])
                         active_audio_channel.set_volume(self.controller.master_volume["player"])
 
     def get_triggers(self) -> float:
@@ -192,7 +192,7 @@ class Player(Actor):
         if self.teleport_distance != 0:
             self.animation_count += dtime
             if self.cooldowns["teleport_delay"] <= 0:
-                self.move(self.teleport_distance, 0)
+                self.move(self.teleport_distance, 0, sweep=False)
                 self.level.visual_effects_manager.spawn(VisualEffect(self, self.level.visual_effects_manager.image_master, image_name="DASHCLOUD", direction=(ImageDirection.RIGHT if self.facing == MovementDirection.RIGHT else ImageDirection.LEFT), alpha=64, offset=(self.rect.width // 2, 0), scale=(abs(self.teleport_distance), self.rect.height * 0.8)), time=Player.TELEPORT_EFFECT_TRAIL)
                 self.teleport_distance = 0
             self.update_cooldowns(dtime)
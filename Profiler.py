@@ -0,0 +1,109 @@
+import json
+import time
+from collections import deque
+
+
+class Profiler:
+    PHASES: tuple[str, ...] = ("events", "input", "vfx", "entities", "purge", "particles", "draw", "display", "preload")
+    COUNTERS: tuple[str, ...] = ("entity queries", "mask tests", "blits")
+    HISTORY: int = 300
+
+    def __init__(self) -> None:
+        self.enabled: bool = False
+        self.frames: deque = deque(maxlen=Profiler.HISTORY)
+        self.frame_start: float = 0.0
+        self.timings: dict[str, float] = {}
+        self.counts: dict[str, int] = {}
+        self.starts: dict[str, float] = {}
+        self.spans: list[tuple[str, float, float]] = []
+        self.trace_file = None
+        self.trace_format: str | None = None
+        self.trace_origin: float = 0.0
+        self.trace_first_event: bool = True
+
+    @property
+    def is_recording(self) -> bool:
+        return self.enabled or self.trace_file is not None
+
+    def toggle(self) -> None:
+        self.enabled = not self.enabled
+        self.frames.clear()
+
+    def begin_frame(self) -> None:
+        if self.is_recording:
+            self.frame_start = time.perf_counter()
+            self.timings = dict.fromkeys(Profiler.PHASES, 0.0)
+            self.counts = dict.fromkeys(Profiler.COUNTERS, 0)
+            self.spans = []
+
+    def start(self, phase: str) -> None:
+        if self.is_recording:
+            self.starts[phase] = time.perf_counter()
+
+    def stop(self, phase: str) -> None:
+        if self.is_recording and self.starts.get(phase) is not None:
+            start = self.starts.pop(phase)
+            duration = time.perf_counter() - start
+            # phases inside the simulation can run several times in one frame, so they add up
+            self.timings[phase] = self.timings.get(phase, 0.0) + duration
+            if self.trace_file is not None:
+                self.spans.append((phase, start, duration))
+
+    def count(self, counter: str, amount: int=1) -> None:
+        if self.is_recording:
+            self.counts[counter] = self.counts.get(counter, 0) + amount
+
+    def end_frame(self) -> None:
+        if self.is_recording and self.frame_start > 0:
+            frame = {"frame": time.perf_counter() - self.frame_start, "timings": self.timings, "counts": self.counts}
+            if self.enabled:
+                self.frames.append(frame)
+            if self.trace_file is not None:
+                self.__write_trace__(frame)
+
+    def summary(self) -> dict | None:
+        if len(self.frames) == 0:
+            return None
+        frame_times = [frame["frame"] for frame in self.frames]
+        return {"frame": sum(frame_times) / len(frame_times),
+                "worst": max(frame_times),
+                "timings": {phase: sum(frame["timings"].get(phase, 0.0) for frame in self.frames) / len(self.frames) for phase in Profiler.PHASES},
+                "counts": {counter: sum(frame["counts"].get(counter, 0) for frame in self.frames) / len(self.frames) for counter in Profiler.COUNTERS}}
+
+    def start_trace(self, path: str) -> None:
+        self.stop_trace()
+        self.trace_format = "jsonl" if path.lower().endswith(".jsonl") else "chrome"
+        self.trace_file = open(path, "w")
+        self.trace_origin = time.perf_counter()
+        self.trace_first_event = True
+        if self.trace_format == "chrome":
+            self.trace_file.write("[\n")
+
+    def stop_trace(self) -> None:
+        if self.trace_file is not None:
+            if self.trace_format == "chrome":
+                self.trace_file.write("\n]\n")
+            self.trace_file.close()
+            self.trace_file = None
+            self.trace_format = None
+
+    def __write_event__(self, event: dict) -> None:
+        if self.trace_format == "chrome" and not self.trace_first_event:
+            self.trace_file.write(",\n")
+        self.trace_file.write(json.dumps(event))
+        if self.trace_format == "jsonl":
+            self.trace_file.write("\n")
+        self.trace_first_event = False
+
+    def __write_trace__(self, frame: dict) -> None:
+        if self.trace_format == "jsonl":
+            self.__write_event__({"time": self.frame_start - self.trace_origin, **frame})
+        else:
+            # chrome://tracing and Perfetto both read complete events ("X") and counters ("C"), in microseconds
+            self.__write_event__({"name": "frame", "ph": "X", "ts": (self.frame_start - self.trace_origin) * 1000000, "dur": frame["frame"] * 1000000, "pid": 0, "tid": 0})
+            for phase, start, duration in self.spans:
+                self.__write_event__({"name": phase, "ph": "X", "ts": (start - self.trace_origin) * 1000000, "dur": duration * 1000000, "pid": 0, "tid": 0})
+            self.__write_event__({"name": "work", "ph": "C", "ts": (self.frame_start - self.trace_origin) * 1000000, "pid": 0, "args": frame["counts"]})
+
+
+profiler: Profiler = Profiler()
@@ -1,11 +1,13 @@
 import math
-import pygame
 from Entity import Entity
+from Helpers import collide_mask, get_mask, sweep_rect
+from TransformCache import transform_cache
 
 
 class Projectile(Entity):
     MAX_SPEED = 1700
     STOCK_PROJECTILE_SIZE = 16
+    SWEEP_OVERLAP = 2
 
     def __init__(self, level, controller, x, y, target, max_dist, attack_damage, difficulty, speed=MAX_SPEED, stock_size=STOCK_PROJECTILE_SIZE, sprite=None, name=None):
         super().__init__(level, controller, x, y, sprite.get_width(), sprite.get_height(), name=name)
@@ -19,8 +21,8 @@ class Projectile(Entity):
         self.clamp_target()
         self.sprite = sprite
         self.angle = math.degrees(math.atan2(self.target[1] - self.rect.centery, self.target[0] - self.rect.centerx))
-        self.sprite = pygame.transform.rotate(self.sprite, self.angle)
-        self.mask = pygame.mask.from_surface(self.sprite)
+        self.sprite = transform_cache.rotate(self.sprite, self.angle)
+        self.mask = get_mask(self.sprite)
         self.attack_damage = attack_damage
 
     def save(self) -> dict:
@@ -45,21 +47,46 @@ class Projectile(Entity):
         if dist != 0:
             self.target = self.lerp(self.rect.center, self.target, self.max_dist / dist)
 
+    def __sweep__(self, end: tuple[float, float]) -> bool:
+        # checks everything between here and the end of this step in the order it would be reached, so a fast shot can't skip over a thin wall or the player
+        start = self.rect.center
+        dx, dy = end[0] - start[0], end[1] - start[1]
+        dist = math.dist(start, end)
+        rect = self.collision_rect.move(self.rect.x, self.rect.y)
+        hits = []
+        for ent in [self.level.player] + self.level.get_entities_along(rect, dx, dy):
+            impact = sweep_rect(rect, dx, dy, ent.collision_rect.move(ent.rect.x, ent.rect.y))
+            if impact is not None:
+                hits.append((impact, ent))
+
+        for impact, ent in sorted(hits, key=lambda hit: hit[0]):
+            # the tight rects only say where it could touch, so it's moved just inside and anything that isn't a solid rect gets the pixel test there
+            self.rect.center = self.lerp(start, end, min(impact + (Projectile.SWEEP_OVERLAP / dist), 1.0))
+            if collide_mask(self, ent):
+                self.collide(ent)
+                if ent == self.level.player:
+                    self.level.player.get_hit(self)
+                return True
+        return False
+
     def move(self, speed) -> None:
-        if self.rect.colliderect(self.level.player) and pygame.sprite.collide_mask(self, self.level.player):
+        if self.rect.colliderect(self.level.player) and collide_mask(self, self.level.player):
             self.collide(self.level.player)
             self.level.player.get_hit(self)
             return
 
         for ent in self.level.get_entities_in_range((self.rect.x, self.rect.y), blocks_only=True):
             if self.rect.colliderect(ent.rect):
-                if pygame.sprite.collide_mask(self, ent):
+                if collide_mask(self, ent):
                     self.collide(ent)
                     return
 
         dist = math.dist(self.rect.center, self.target)
         if dist != 0:
-            self.rect.center = self.lerp(self.rect.center, self.target, speed / dist)
+            end = self.lerp(self.rect.center, self.target, speed / dist)
+            if self.__sweep__(end):
+                return
+            self.rect.center = end
         TOLERANCE = 1
         if abs(math.dist(self.rect.center, self.target)) <= TOLERANCE:
             self.die()
@@ -0,0 +1,58 @@
+import random
+
+
+class RandomStreams:
+    # gameplay, looks and sounds each draw from their own generator, so a glitch on screen or a different footstep can never change what happens in the level
+    STREAMS: tuple[str, ...] = ("simulation", "cosmetic", "audio", "loading")
+
+    def __init__(self, seed: int | None=None) -> None:
+        self.seed: int = 0
+        self.simulation: random.Random = random.Random()
+        self.cosmetic: random.Random = random.Random()
+        self.audio: random.Random = random.Random()
+        # building a level (picking sprite variants and such) has a stream of its own, so when and where a level gets built never shifts the others
+        self.loading: random.Random = random.Random()
+        self.reseed(seed)
+
+    def reseed(self, seed: int | None=None) -> int:
+        self.seed = (random.randrange(2 ** 32) if seed is None else int(seed))
+        # every stream is seeded from the one seed and its own name, so the seed alone is enough to bring all of them back
+        for name in RandomStreams.STREAMS:
+            getattr(self, name).seed(f'{self.seed}/{name}')
+        return self.seed
+
+    def reseed_stream(self, name: str, seed: int | None=None) -> int:
+        # one stream can start over by itself (loading, for every level that gets built) without moving the others
+        seed = (random.randrange(2 ** 32) if seed is None else int(seed))
+        getattr(self, name).seed(f'{seed}/{name}')
+        return seed
+
+    def isolated(self, name: str, steps):
+        # runs a build written as steps (see run_steps) with a place in the stream of its own, so when it's spread over frames, another build in between can't shift its picks
+        stream = getattr(self, name)
+        state = stream.getstate()
+        while True:
+            outer = stream.getstate()
+            stream.setstate(state)
+            try:
+                step = next(steps)
+            except StopIteration as e:
+                return e.value
+            finally:
+                state = stream.getstate()
+                stream.setstate(outer)
+            yield step
+
+    def get_state(self) -> dict:
+        return {"seed": self.seed, "streams": {name: getattr(self, name).getstate() for name in RandomStreams.STREAMS}}
+
+    def set_state(self, state: dict) -> None:
+        # picks every stream up exactly where it was, a stream the state doesn't have (from an older save) starts over from the seed
+        self.reseed(state["seed"])
+        for name, stream_state in state["streams"].items():
+            if name in RandomStreams.STREAMS:
+                # a state read back from JSON (like the save in a recording) has lists where setstate wants tuples
+                getattr(self, name).setstate((stream_state[0], tuple(stream_state[1]), stream_state[2]))
+
+
+rng: RandomStreams = RandomStreams()
@@ -1,9 +1,11 @@
 import pygame
 import pickle
+from itertools import chain
 from os.path import join, isfile
 from Actor import Actor
 from Block import BreakableBlock
 from Helpers import GAME_DATA_FOLDER
+from RandomStreams import rng
 
 
 def save_player_profile(controller, level):
@@ -49,24 +51,23 @@ def load_player_profile(controller):
         return []
 
 
-def save(level, hud, controller):
+def save(level, hud, controller, file=join(GAME_DATA_FOLDER, "save.p")):
     if level is None:
         return
     else:
         if hud is not None:
             hud.save_icon_timer = 1.0
 
-        data = {"level": level.name, "time": level.time, "objective": controller.active_objective}
-        for ent in level.entities + level.objectives_collected:
+        data = {"level": level.name, "time": level.time, "objective": controller.active_objective, "seed": rng.seed, "rng": rng.get_state()}
+        for ent in chain(level.entities, level.objectives_collected):
             ent_data = ent.save()
             if ent_data is not None:
                 data.update(ent_data)
-        with open(join(GAME_DATA_FOLDER, "save.p"), "wb") as f:
+        with open(file, "wb") as f:
             pickle.dump(data, f)
 
 
-def load_part1():
-    save_file = join(GAME_DATA_FOLDER, "save.p")
+def load_part1(save_file=join(GAME_DATA_FOLDER, "save.p")):
     if isfile(save_file):
         with open(save_file, "rb") as f:
             data = pickle.load(f)
@@ -84,6 +85,11 @@ def load_part2(data, level, controller):
     else:
         level.time = 0 if data.get("time") is None else data["time"]
         controller.active_objective = None if data.get("objective") is None else data["objective"]
+        # the streams go on from where they were when the game was saved, saves that only have the seed start them over from it, and older saves just keep whatever the streams are on now
+        if data.get("rng") is not None:
+            rng.set_state(data["rng"])
+        elif data.get("seed") is not None:
+            rng.reseed(data["seed"])
         for ent in level.entities:
             ent_data = data.get(ent.name)
             if ent_data is not None:
@@ -91,6 +97,7 @@ def load_part2(data, level, controller):
                     level.queue_purge(ent)
                 else:
                     ent.load(ent_data)
+                    level.spatial_hash.update(ent)
             elif isinstance(ent, Actor) or isinstance(ent, BreakableBlock):
                 level.queue_purge(ent)
         level.purge()
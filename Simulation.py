@@ -0,0 +1,40 @@
+import math
+from Actor import Actor
+from Block import MovingBlock
+from NonPlayer import NonPlayer
+from Profiler import profiler
+
+
+def simulate(level, dtime: float, focus: tuple[float, float], active_distance: float) -> float:
+    dtime_offset = 0.0
+    level.time += dtime
+    profiler.start("vfx")
+    level.visual_effects_manager.manage(dtime)
+    profiler.stop("vfx")
+
+    profiler.start("entities")
+    for ent in level.updatable_entities:
+        if isinstance(ent, MovingBlock) and not ent.is_near(focus, active_distance):
+            # it still has to be where its path says, since projectiles and actors near the edge of the range can run into it, but the rest of its loop can wait
+            ent.patrol(dtime)
+            ent.follow_path()
+            level.spatial_hash.update(ent)
+        elif not isinstance(ent, Actor) or math.dist(ent.rect.center, focus) < active_distance:
+            if hasattr(ent, "patrol") and callable(ent.patrol):
+                ent.patrol(dtime)
+            dtime_offset += ent.loop(dtime)
+            level.spatial_hash.update(ent)
+            if isinstance(ent, NonPlayer) and ent.queued_message is not None:
+                dtime_offset += ent.play_queued_message()
+    profiler.stop("entities")
+
+    profiler.start("purge")
+    level.purge()
+    profiler.stop("purge")
+
+    profiler.start("particles")
+    for effect in level.particle_effects:
+        effect.loop(dtime)
+    profiler.stop("particles")
+
+    return dtime_offset
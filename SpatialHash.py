@@ -0,0 +1,58 @@
+import math
+
+
+class SpatialHash:
+    LAYERS = ("triggers", "dynamic_blocks", "hazards", "enemies", "objectives")
+
+    def __init__(self, cell_size: int):
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int, str], dict] = {}
+        self.locations: dict = {}
+
+    def __cell_of__(self, ent) -> tuple[int, int]:
+        return math.floor(ent.rect.x / self.cell_size), math.floor(ent.rect.y / self.cell_size)
+
+    def insert(self, ent, layer: str) -> None:
+        if ent in self.locations:
+            self.remove(ent)
+        cell_x, cell_y = self.__cell_of__(ent)
+        key = (cell_x, cell_y, layer)
+        if self.cells.get(key) is None:
+            self.cells[key] = {ent: None}
+        else:
+            self.cells[key][ent] = None
+        self.locations[ent] = key
+
+    def remove(self, ent) -> None:
+        key = self.locations.pop(ent, None)
+        if key is not None:
+            cell = self.cells[key]
+            cell.pop(ent, None)
+            if len(cell) == 0:
+                self.cells.pop(key)
+
+    def update(self, ent) -> None:
+        key = self.locations.get(ent)
+        if key is not None:
+            cell_x, cell_y = self.__cell_of__(ent)
+            if cell_x != key[0] or cell_y != key[1]:
+                self.insert(ent, key[2])
+
+    def query(self, point, dist_x=(1, 1), dist_y=(1, 1), layers=LAYERS) -> list:
+        # an entity is in range when the point is within dist blocks of its top-left corner, so only the cells spanning that window can hold it
+        min_x = point[0] - (self.cell_size * dist_x[1])
+        max_x = point[0] + (self.cell_size * dist_x[0])
+        min_y = point[1] - (self.cell_size * dist_y[1])
+        max_y = point[1] + (self.cell_size * dist_y[0])
+        cells_x = range(math.floor(min_x / self.cell_size), math.floor(max_x / self.cell_size) + 1)
+        cells_y = range(math.floor(min_y / self.cell_size), math.floor(max_y / self.cell_size) + 1)
+        in_range = []
+        for layer in layers:
+            for cell_y in cells_y:
+                for cell_x in cells_x:
+                    cell = self.cells.get((cell_x, cell_y, layer))
+                    if cell is not None:
+                        for ent in cell:
+                            if min_x <= ent.rect.x <= max_x and min_y <= ent.rect.y <= max_y:
+                                in_range.append(ent)
+        return in_range
@@ -0,0 +1,68 @@
+import math
+import pygame
+from collections import OrderedDict
+from Profiler import profiler
+
+
+class StaticChunks:
+    CHUNK_BLOCKS: int = 10
+    MIN_CHUNKS: int = 32
+
+    def __init__(self, level, view_size: tuple[int, int]) -> None:
+        self.level = level
+        self.chunk_size: int = StaticChunks.CHUNK_BLOCKS * level.block_size
+        # every chunk one frame can touch (both layers, with a spare row and column for scrolling) has to fit, or drawing them in turn would re-bake each one every frame
+        self.max_chunks: int = max(StaticChunks.MIN_CHUNKS, 2 * (math.ceil(view_size[0] / self.chunk_size) + 2) * (math.ceil(view_size[1] / self.chunk_size) + 2))
+        # each key is (chunk x, chunk y, above player), and a chunk with nothing in it is stored as None so it isn't baked again
+        self.chunks: OrderedDict = OrderedDict()
+
+    def __bake__(self, chunk_x: int, chunk_y: int, above: bool) -> pygame.Surface | None:
+        surface = None
+        for row in self.level.static_blocks[chunk_y * StaticChunks.CHUNK_BLOCKS:(chunk_y + 1) * StaticChunks.CHUNK_BLOCKS]:
+            for block in row[chunk_x * StaticChunks.CHUNK_BLOCKS:(chunk_x + 1) * StaticChunks.CHUNK_BLOCKS]:
+                if block is not None and block.is_blocking != above:
+                    if surface is None:
+                        surface = pygame.Surface((self.chunk_size, self.chunk_size), pygame.SRCALPHA)
+                    # blocks never overlap, so a max blend onto the empty chunk copies each one exactly instead of darkening its soft edges
+                    surface.blit(block.sprite, (block.rect.x - (chunk_x * self.chunk_size), block.rect.y - (chunk_y * self.chunk_size)), special_flags=pygame.BLEND_RGBA_MAX)
+        return surface
+
+    def __chunk__(self, chunk_x: int, chunk_y: int, above: bool) -> pygame.Surface | None:
+        key = (chunk_x, chunk_y, above)
+        if key in self.chunks:
+            self.chunks.move_to_end(key)
+        else:
+            self.chunks[key] = self.__bake__(chunk_x, chunk_y, above)
+            while len(self.chunks) > self.max_chunks:
+                self.chunks.popitem(last=False)
+        return self.chunks[key]
+
+    def __visible__(self, offset_x: float, offset_y: float, width: int, height: int) -> list[tuple[int, int]]:
+        return [(chunk_x, chunk_y) for chunk_y in range(max(int(offset_y // self.chunk_size), 0), int((offset_y + height) // self.chunk_size) + 1) for chunk_x in range(max(int(offset_x // self.chunk_size), 0), int((offset_x + width) // self.chunk_size) + 1)]
+
+    def prebake(self, point: tuple[int, int], view_size: tuple[int, int]):
+        # the chunks around where the level starts are baked while it loads, so the first frames don't have to do it (this yields how far along it is after each one)
+        visible = self.__visible__(point[0] - (view_size[0] // 2), point[1] - (view_size[1] // 2), view_size[0], view_size[1])
+        for i, (chunk_x, chunk_y) in enumerate(visible):
+            self.__chunk__(chunk_x, chunk_y, False)
+            self.__chunk__(chunk_x, chunk_y, True)
+            yield (i + 1) / len(visible)
+
+    def invalidate(self, block) -> None:
+        x = block.rect.x // self.level.block_size
+        y = block.rect.y // self.level.block_size
+        if 0 <= y < len(self.level.static_blocks) and 0 <= x < len(self.level.static_blocks[y]) and (self.level.static_blocks[y][x] is None or self.level.static_blocks[y][x] is block):
+            chunk_x = x // StaticChunks.CHUNK_BLOCKS
+            chunk_y = y // StaticChunks.CHUNK_BLOCKS
+            self.chunks.pop((chunk_x, chunk_y, False), None)
+            self.chunks.pop((chunk_x, chunk_y, True), None)
+
+    def clear(self) -> None:
+        self.chunks.clear()
+
+    def draw(self, win: pygame.Surface, offset_x: float, offset_y: float, above: bool=False) -> None:
+        for chunk_x, chunk_y in self.__visible__(offset_x, offset_y, win.get_width(), win.get_height()):
+            chunk = self.__chunk__(chunk_x, chunk_y, above)
+            if chunk is not None:
+                win.blit(chunk, ((chunk_x * self.chunk_size) - offset_x, (chunk_y * self.chunk_size) - offset_y))
+                profiler.count("blits")
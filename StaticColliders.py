@@ -0,0 +1,102 @@
+import pygame
+from Block import Block
+from Helpers import CollisionShape
+
+
+class StaticCollider:
+    # several solid static blocks standing in for each other in collision checks, the blocks themselves are still what gets drawn
+    def __init__(self, level, cells: list[tuple[int, int]], rect: pygame.Rect, is_stacked: bool) -> None:
+        self.level = level
+        self.cells = cells
+        self.rect = rect
+        self.mask = pygame.Mask(rect.size, fill=True)
+        self.collision_shape = CollisionShape.RECT
+        self.collision_rect = pygame.Rect(0, 0, rect.width, rect.height)
+        self.is_stacked = is_stacked
+        self.is_blocking = True
+        self.hp = 100
+        self.direction = None
+        self.name = f'StaticCollider ({rect.x}, {rect.y})'
+
+    def tile_center(self, point) -> tuple[int, int]:
+        # the center of the block nearest the point, for the checks that care which single block something is leaning on
+        size = self.level.block_size
+        x = min(max(point[0] - self.rect.left, 0), self.rect.width - 1) // size
+        y = min(max(point[1] - self.rect.top, 0), self.rect.height - 1) // size
+        return self.rect.left + (x * size) + (size // 2), self.rect.top + (y * size) + (size // 2)
+
+    def collide(self, ent) -> bool:
+        return self.is_blocking
+
+    def get_hit(self, ent) -> None:
+        return
+
+
+class StaticColliders:
+    def __init__(self, level) -> None:
+        self.level = level
+        # same shape as the level's static blocks, but every block that was merged points to its collider instead
+        self.cells: list[list] = [list(row) for row in level.static_blocks]
+        self.colliders: int = 0
+        self.__merge__()
+
+    def __is_mergeable__(self, block) -> bool:
+        # breakable, see-through or oddly shaped blocks keep their own collision, since they act differently from plain walls
+        return block is not None and type(block) is Block and block.is_blocking and block.grid_cell is not None and block.collision_shape == CollisionShape.RECT
+
+    def __merge__(self) -> None:
+        size = self.level.block_size
+        # first every row is split into runs of mergeable blocks that agree on whether something is stacked on them
+        runs = []
+        for i, row in enumerate(self.level.static_blocks):
+            j = 0
+            while j < len(row):
+                if not self.__is_mergeable__(row[j]):
+                    j += 1
+                    continue
+                start = j
+                while j < len(row) and self.__is_mergeable__(row[j]) and row[j].is_stacked == row[start].is_stacked:
+                    j += 1
+                runs.append((i, start, j, row[start].is_stacked))
+
+        # then stacked runs grow downwards into identical runs right below them, while the uncovered top rows stay one block high so landing works like it did
+        open_runs = {}
+        merged = []
+        for i, start, end, is_stacked in runs:
+            key = (start, end)
+            if is_stacked and open_runs.get(key) is not None and open_runs[key][1] == i - 1:
+                open_runs[key][1] = i
+            else:
+                entry = [i, i, start, end, is_stacked]
+                merged.append(entry)
+                if is_stacked:
+                    open_runs[key] = entry
+                else:
+                    open_runs.pop(key, None)
+
+        for top, bottom, start, end, is_stacked in merged:
+            cells = [(i, j) for i in range(top, bottom + 1) for j in range(start, end)]
+            if len(cells) < 2:
+                continue
+            collider = StaticCollider(self.level, cells, pygame.Rect(start * size, top * size, (end - start) * size, (bottom - top + 1) * size), is_stacked)
+            for i, j in cells:
+                self.cells[i][j] = collider
+            self.colliders += 1
+
+    def invalidate(self, block) -> None:
+        # anything that changes a merged block splits its collider back into the single blocks, which then act on their own from here on
+        if block.grid_cell is None:
+            return
+        i, j = block.grid_cell
+        if 0 <= i < len(self.cells) and 0 <= j < len(self.cells[i]):
+            entry = self.cells[i][j]
+            for cell_i, cell_j in (entry.cells if isinstance(entry, StaticCollider) else [(i, j)]):
+                self.cells[cell_i][cell_j] = self.level.static_blocks[cell_i][cell_j]
+
+    def query(self, x: int, y: int, dist_x=(1, 1), dist_y=(1, 1)) -> list:
+        in_range = {}
+        for row in self.cells[max(y - (dist_y[0] - 1), 0):min(y + dist_y[1] + 1, len(self.cells))]:
+            for entry in row[max(x - (dist_x[0] - 1), 0):min(x + dist_x[1] + 1, len(row))]:
+                if entry is not None:
+                    in_range[entry] = None
+        return list(in_range)
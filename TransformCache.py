@@ -0,0 +1,58 @@
+import pygame
+from collections import OrderedDict
+from Helpers import SpriteFrame
+
+
+class TransformCache:
+    MAX_BYTES: int = 64 * 1024 * 1024
+    ANGLE_STEP: float = 1.0
+    FACTOR_STEP: float = 0.01
+
+    def __init__(self, max_bytes: int=MAX_BYTES) -> None:
+        self.max_bytes: int = max_bytes
+        self.bytes: int = 0
+        self.cache: OrderedDict = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def __lookup__(self, source: pygame.Surface, operation: str, params: tuple, source_key, transform) -> SpriteFrame:
+        # the source surface itself is kept alongside the result, so its id can't be handed to a new surface while it's cached
+        key = ((id(source) if source_key is None else source_key), operation, params)
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return entry[1]
+
+        self.misses += 1
+        result = SpriteFrame.from_surface(transform())
+        size = result.get_width() * result.get_height() * 4
+        self.cache[key] = (source, result, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes and len(self.cache) > 1:
+            _, (_, _, old_size) = self.cache.popitem(last=False)
+            self.bytes -= old_size
+        return result
+
+    def clear(self) -> None:
+        self.cache.clear()
+        self.bytes = 0
+
+    def rotate(self, source: pygame.Surface, angle: float, source_key=None) -> SpriteFrame:
+        angle = (round(angle / TransformCache.ANGLE_STEP) * TransformCache.ANGLE_STEP) % 360
+        return self.__lookup__(source, "rotate", (angle,), source_key, lambda: pygame.transform.rotate(source, angle))
+
+    def scale(self, source: pygame.Surface, size: tuple[float, float], source_key=None) -> SpriteFrame:
+        size = (max(int(size[0]), 0), max(int(size[1]), 0))
+        return self.__lookup__(source, "scale", size, source_key, lambda: pygame.transform.scale(source, size))
+
+    def scale_by(self, source: pygame.Surface, factor: tuple[float, float], source_key=None) -> SpriteFrame:
+        factor = (round(factor[0] / TransformCache.FACTOR_STEP) * TransformCache.FACTOR_STEP, round(factor[1] / TransformCache.FACTOR_STEP) * TransformCache.FACTOR_STEP)
+        return self.__lookup__(source, "scale_by", factor, source_key, lambda: pygame.transform.scale_by(source, factor))
+
+    def smoothscale_by(self, source: pygame.Surface, factor: float, source_key=None) -> SpriteFrame:
+        factor = round(factor / TransformCache.FACTOR_STEP) * TransformCache.FACTOR_STEP
+        return self.__lookup__(source, "smoothscale_by", (factor,), source_key, lambda: pygame.transform.smoothscale_by(source, factor))
+
+
+transform_cache: TransformCache = TransformCache()
@@ -1,7 +1,8 @@
+import math
 import time
 import pygame
 from os.path import join, isfile
-from Helpers import display_text, load_text_from_file, load_path, set_property, ASSETS_FOLDER, handle_exception
+from Helpers import display_text, load_text_from_file, load_path, set_property, parse_property_changes, ASSETS_FOLDER, handle_exception
 from Entity import Entity
 from Block import Block, BreakableBlock, MovableBlock, Hazard, MovingBlock, MovingHazard, Door, FallingHazard
 from Objectives import Objective
@@ -148,6 +149,9 @@ class ObjectiveTrigger(Trigger):
 class PropertyTrigger(Trigger):
     def __init__(self, level, controller, x, y, width, height, value, fire_once=True, name="PropertyTrigger"):
         super().__init__(level, controller, x, y, width, height, value, fire_once=fire_once, name=name)
+        self.changes = parse_property_changes(self.value)
+        self.targets = None
+        self.targets_version = None
 
     def collide(self, ent: Entity | None) -> float:
         if self.fire_once and self.has_fired:
@@ -155,7 +159,12 @@ class PropertyTrigger(Trigger):
         else:
             start = time.perf_counter()
             self.has_fired = True
-            set_property(self, self.value)
+            # the targets only change when something is spawned or purged, so they're looked up again only then
+            if self.targets is None or self.targets_version != self.level.registry.version:
+                self.targets = [self.level.registry.find_prefix(targ) for targ, _, _ in self.changes]
+                self.targets_version = self.level.registry.version
+            for (_, prop, val), targets in zip(self.changes, self.targets):
+                set_property(targets, prop, val)
             return time.perf_counter() - start
 
 class RevertTrigger(Trigger):
@@ -323,19 +332,27 @@ class SpawnTrigger(Trigger):
             self.has_fired = True
             if self.value is not None:
                 if isinstance(self.value, Trigger):
-                    self.level.triggers.append(self.value)
+                    self.level.add_entity(self.value, "triggers")
                 elif isinstance(self.value, NonPlayer):
-                    self.level.enemies.append(self.value)
+                    self.level.add_entity(self.value, "enemies")
                 elif isinstance(self.value, Hazard):
-                    self.level.hazards.append(self.value)
+                    self.level.add_entity(self.value, "hazards")
                 elif isinstance(self.value, Block):
-                    self.level.blocks.append(self.value)
+                    self.level.add_entity(self.value, "blocks")
             return time.perf_counter() - start
 
 class SwapLevelTrigger(Trigger):
+    PREPARE_DISTANCE = 20
+
     def __init__(self, level, controller, x, y, width, height, value, fire_once=True, name="SwapLevelTrigger"):
         super().__init__(level, controller, x, y, width, height, value, fire_once=fire_once, name=name)
 
+    def loop(self, dtime: float) -> float:
+        # start compiling the layout this swaps to once the player is within a few screens, so only the main-thread build is left by the time they get here
+        if not self.has_fired and math.dist(self.rect.center, self.level.player.rect.center) < SwapLevelTrigger.PREPARE_DISTANCE * self.level.block_size:
+            self.level.prepare_hot_swap()
+        return super().loop(dtime)
+
     def collide(self, ent: Entity | None) -> float:
         if self.fire_once and self.has_fired:
             return 0.0
@@ -0,0 +1,159 @@
+# Builds synthetic levels of increasing size and runs them headless, to see how loading and frame times scale.
+# Run it from anywhere, e.g.: python Utilities/level_benchmark.py --width 100 --height 30 --scales 1 2 5 --frames 600
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+import argparse
+import csv
+import json
+import multiprocessing
+import random
+import statistics
+import time
+import tracemalloc
+from os.path import join
+
+try:
+    import resource
+except ImportError:
+    # resource only exists on unix, so peak RSS just isn't reported on windows
+    resource = None
+
+
+def generate(width: int, height: int, density: float, melee: int, shooters: int, hazards: int, falling: int, doors: int, triggers: int, seed: int=0) -> tuple[list[list[str]], dict]:
+    rng = random.Random(seed)
+    layout = [["" for _ in range(width)] for _ in range(height)]
+    objects = {
+        "w": {"type": "Block", "data": {"coord_x": 0, "coord_y": 0}},
+        "p": {"type": "Player", "data": {}},
+        "e": {"type": "Enemy", "data": {"path": [[0, 0], [3, 0]], "hp": 100, "can_shoot": False, "sprite": None}},
+        "s": {"type": "Enemy", "data": {"path": [[0, 0], [3, 0]], "hp": 100, "can_shoot": True, "sprite": None}},
+        "h": {"type": "Hazard", "data": {"hit_sides": "U", "sprite": None, "coord_x": 0, "coord_y": 0}},
+        "f": {"type": "FallingHazard", "data": {"drop_x": 0, "drop_y": height, "fire_once": False, "hit_sides": "D", "sprite": None, "coord_x": 0, "coord_y": 0}},
+        "d": {"type": "Door", "data": {"speed": 500, "direction": -1, "is_locked": True, "coord_x": 0, "coord_y": 0}},
+        "t": {"type": "PropertyTrigger", "data": {"width": 1, "height": 1, "fire_once": False, "input": {"target": "d", "property": "is_locked", "value": "false"}}},
+    }
+
+    # walls all the way around, a solid floor, and random blocks in between
+    for i in range(height):
+        for j in range(width):
+            if i in (0, height - 1) or j in (0, width - 1) or (2 < i < height - 3 and 4 < j and rng.random() < density):
+                layout[i][j] = "w"
+    layout[height - 2][1] = "p"
+
+    free = [(i, j) for i in range(1, height - 1) for j in range(5, width - 1) if layout[i][j] == ""]
+    rng.shuffle(free)
+    floor = [(height - 2, j) for j in range(5, width - 1) if layout[height - 2][j] == ""]
+    rng.shuffle(floor)
+    ceiling = [(1, j) for j in range(5, width - 1) if layout[1][j] == ""]
+    rng.shuffle(ceiling)
+
+    for code, count, cells in (("h", hazards, floor), ("d", doors, floor), ("f", falling, ceiling), ("e", melee, free), ("s", shooters, free), ("t", triggers, free)):
+        placed = 0
+        while placed < count and len(cells) > 0:
+            i, j = cells.pop()
+            if layout[i][j] == "":
+                layout[i][j] = code
+                placed += 1
+    return layout, objects
+
+
+def write(folder: str, name: str, layout: list[list[str]], objects: dict) -> tuple[str, str]:
+    os.makedirs(folder, exist_ok=True)
+    level_file = join(folder, f'{name}.agl')
+    objects_file = join(folder, f'{name}.agd')
+    with open(level_file, "w", newline="") as file:
+        csv.writer(file).writerows(layout)
+    with open(objects_file, "w") as file:
+        json.dump(objects, file, indent=2)
+    return level_file, objects_file
+
+
+def percentile(values: list[float], pct: int) -> float:
+    if len(values) < 2:
+        return 0.0 if len(values) == 0 else values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+def measure(name: str, level_file: str, objects: dict, frames: int) -> dict:
+    # this runs in a fresh process for every level, so the peak memory it reports belongs to that level alone
+    import Headless
+    from InputSource import NullInput
+    from Simulation import simulate
+
+    win = Headless.pygame.Surface((Headless.WIDTH, Headless.HEIGHT), Headless.pygame.SRCALPHA)
+    controller = Headless.build_controller(win)
+    controller.input_source = NullInput()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    level = Headless.build_level(name, controller, {name: level_file}, {name: {"name": name}}, {name: objects})
+    load_time = time.perf_counter() - start
+    _, load_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    dtime = 1 / Headless.SIMULATION_RATE
+    simulate_times = []
+    draw_times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        simulate(level, dtime, level.player.rect.center, win.get_width() * 1.5)
+        simulate_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        level.draw(win, level.player.rect.centerx - (win.get_width() // 2), level.player.rect.centery - (win.get_height() // 2), controller.master_volume)
+        draw_times.append(time.perf_counter() - start)
+
+    frame_times = [a + b for a, b in zip(simulate_times, draw_times)]
+    results = {"name": name, "entities": len(level.entities), "load_s": load_time, "load_peak_mb": load_peak / (1024 * 1024)}
+    if resource is not None:
+        # linux reports this in kilobytes and macos in bytes
+        results["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    for label, times in (("frame", frame_times), ("simulate", simulate_times), ("draw", draw_times)):
+        for pct in (50, 95, 99):
+            results[f'{label}_p{pct}_ms'] = 1000 * percentile(times, pct)
+        results[f'{label}_max_ms'] = 1000 * max(times, default=0.0)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic levels of increasing size and measure how the engine copes with them.")
+    parser.add_argument("--width", type=int, default=100, help="map width in blocks at scale 1")
+    parser.add_argument("--height", type=int, default=30, help="map height in blocks (not scaled)")
+    parser.add_argument("--density", type=float, default=0.15, help="chance of a block in each open cell")
+    parser.add_argument("--melee", type=int, default=10, help="melee enemies at scale 1")
+    parser.add_argument("--shooters", type=int, default=5, help="shooting enemies at scale 1")
+    parser.add_argument("--hazards", type=int, default=10, help="floor hazards at scale 1")
+    parser.add_argument("--falling", type=int, default=5, help="falling hazards at scale 1")
+    parser.add_argument("--doors", type=int, default=5, help="locked doors at scale 1")
+    parser.add_argument("--triggers", type=int, default=10, help="property triggers at scale 1")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 2, 5], help="multipliers for the width and every entity count")
+    parser.add_argument("--frames", type=int, default=600, help="simulation steps (each followed by a draw) to time for every level")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=join("GameData", "Benchmarks"), help="folder for the generated .agl/.agd files")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    all_results = []
+    for scale in args.scales:
+        width = max(int(args.width * scale), 10)
+        name = f'BENCH_{width}X{args.height}'
+        layout, objects = generate(width, args.height, args.density, int(args.melee * scale), int(args.shooters * scale), int(args.hazards * scale), int(args.falling * scale), int(args.doors * scale), int(args.triggers * scale), seed=args.seed)
+        level_file, _ = write(args.out, name, layout, objects)
+        with context.Pool(1) as pool:
+            results = pool.apply(measure, (name, level_file, objects, args.frames))
+        results["scale"] = scale
+        all_results.append(results)
+        print(f'{name}: {results["entities"]} entities, loaded in {results["load_s"]:.3f}s (peak {results["load_peak_mb"]:.1f}MB python heap{"" if results.get("peak_rss_mb") is None else f", {results["peak_rss_mb"]:.1f}MB rss"}), frame p50 {results["frame_p50_ms"]:.2f}ms p95 {results["frame_p95_ms"]:.2f}ms p99 {results["frame_p99_ms"]:.2f}ms max {results["frame_max_ms"]:.2f}ms (simulate p95 {results["simulate_p95_ms"]:.2f}ms, draw p95 {results["draw_p95_ms"]:.2f}ms)')
+
+    if args.json is not None:
+        with open(args.json, "w") as file:
+            json.dump(all_results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# Times the engine's hot functions on a small synthetic level, and compares them against a saved JSON baseline.
+# e.g.: python Utilities/microbenchmarks.py --save-baseline    (once, before a change)
+#       python Utilities/microbenchmarks.py                    (after it, fails if anything got slower than the tolerance)
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# the offscreen driver still has no window, but unlike the dummy one the game doesn't treat it as headless, so text actually gets rendered
+os.environ["SDL_VIDEODRIVER"] = "offscreen"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+import argparse
+import json
+import platform
+import statistics
+import tempfile
+import timeit
+from os.path import join, isfile
+from level_benchmark import generate, write
+
+import Headless
+import pygame
+from Helpers import display_text, MovementDirection
+from HUD import HUD
+from InputSource import NullInput
+from NonPlayer import NonPlayer
+from Projectile import Projectile
+from RandomStreams import rng
+from SaveLoadFunctions import save, load_part1, load_part2
+
+BASELINE_FILE = join("GameData", "Benchmarks", "microbenchmarks.json")
+FIXTURE_NAME = "MICROBENCH"
+
+
+class Fixture:
+    def __init__(self, seed: int=0) -> None:
+        rng.reseed(seed)
+        self.win = pygame.display.set_mode((Headless.WIDTH, Headless.HEIGHT))
+        layout, objects = generate(60, 20, 0.15, 6, 3, 6, 3, 3, 6, seed=seed)
+        level_file, _ = write(join(tempfile.gettempdir(), "AgentGlitchBench"), FIXTURE_NAME, layout, objects)
+        self.controller = Headless.build_controller(self.win)
+        self.controller.input_source = NullInput()
+        self.level = Headless.build_level(FIXTURE_NAME, self.controller, {FIXTURE_NAME: level_file}, {FIXTURE_NAME: {"name": FIXTURE_NAME}}, {FIXTURE_NAME: objects})
+        self.controller.hud = self.hud = HUD(self.level.player, self.win, image_master={})
+        self.player = self.level.player
+        self.save_file = join(tempfile.gettempdir(), "AgentGlitchBench", "save.p")
+
+        # a melee enemy a few blocks in front of the player, looking at them, so spotting has to trace the whole line of sight
+        self.enemy = [ent for ent in self.level.enemies if isinstance(ent, NonPlayer) and not ent.abilities["can_shoot"]][0]
+        self.enemy.rect.topleft = (self.player.rect.x + (4 * self.level.block_size), self.player.rect.y)
+        self.enemy.facing = self.enemy.direction = MovementDirection.LEFT
+        self.level.spatial_hash.update(self.enemy)
+
+        self.projectile_start = (self.player.rect.centerx + self.level.block_size, self.player.rect.centery - self.level.block_size)
+        self.projectile = Projectile(self.level, self.controller, self.projectile_start[0], self.projectile_start[1], (self.projectile_start[0] + 5000, self.projectile_start[1]), 5000, 10, self.controller.difficulty, sprite=self.player.proj_sprite, name="Benchmark projectile")
+
+        save(self.level, None, self.controller, file=self.save_file)
+        self.save_data = load_part1(self.save_file)
+
+    @property
+    def offset(self) -> tuple[int, int]:
+        return self.player.rect.centerx - (self.win.get_width() // 2), self.player.rect.centery - (self.win.get_height() // 2)
+
+    def move_projectile(self) -> None:
+        self.projectile.rect.center = self.projectile_start
+        self.projectile.move(10)
+
+    def cases(self) -> dict:
+        return {
+            "Level.get_entities_in_range (blocks only)": lambda: self.level.get_entities_in_range(self.player.rect.center, blocks_only=True),
+            "Level.get_entities_in_range (full)": lambda: self.level.get_entities_in_range(self.player.rect.center, include_hazards=True),
+            "Actor.get_collisions": lambda: self.player.get_collisions(),
+            "NonPlayer.__spot_player__": lambda: self.enemy.__spot_player__(),
+            "Actor.update_state": lambda: self.player.update_state(),
+            "Actor.update_sprite": lambda: self.player.update_sprite(),
+            "Projectile.move": self.move_projectile,
+            "Level.draw": lambda: self.level.draw(self.win, self.offset[0], self.offset[1], self.controller.master_volume),
+            "HUD.draw": lambda: self.hud.draw(self.level.formatted_time),
+            "display_text": lambda: display_text("The quick brown fox jumps over the lazy dog.", self.controller, min_pause_time=0, should_sleep=False),
+            "save": lambda: save(self.level, None, self.controller, file=self.save_file),
+            "load_part2": lambda: load_part2(self.save_data, self.level, self.controller),
+        }
+
+
+def run(fixture: Fixture, repeat: int, min_time: float, selected: list[str] | None=None) -> dict:
+    results = {}
+    for name, case in fixture.cases().items():
+        if selected is not None and not any(part.casefold() in name.casefold() for part in selected):
+            continue
+        rng.reseed(0)
+        timer = timeit.Timer(case)
+        # enough calls per sample that each one takes at least min_time, so the clock's resolution doesn't matter
+        number, _ = timer.autorange()
+        number = max(int(number * min_time / 0.2), 1)
+        samples = [sample / number for sample in timer.repeat(repeat=repeat, number=number)]
+        results[name] = {"best_us": 1e6 * min(samples), "median_us": 1e6 * statistics.median(samples), "calls": number * repeat}
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        if baseline.get(name) is None:
+            print(f'{name:45} {result["best_us"]:10.2f}us   (new)')
+            continue
+        ratio = result["best_us"] / max(baseline[name]["best_us"], 1e-9)
+        flag = ""
+        if ratio > tolerance:
+            regressions.append(name)
+            flag = "  <-- REGRESSION"
+        print(f'{name:45} {result["best_us"]:10.2f}us   baseline {baseline[name]["best_us"]:10.2f}us   x{ratio:.2f}{flag}')
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time the engine's hot functions against a saved baseline.")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="JSON file the results are compared against (and saved to)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=1.2, help="how many times slower than the baseline counts as a regression")
+    parser.add_argument("--repeat", type=int, default=7, help="samples per case (the best one is compared)")
+    parser.add_argument("--min-time", type=float, default=0.05, help="minimum seconds per sample")
+    parser.add_argument("--only", nargs="+", default=None, help="only run cases whose names contain one of these")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fixture = Fixture(seed=args.seed)
+    results = run(fixture, args.repeat, args.min_time, selected=args.only)
+
+    baseline = {}
+    if isfile(args.baseline):
+        with open(args.baseline, "r") as file:
+            baseline = json.loads(file.read()).get("results", {})
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as file:
+            json.dump({"python": platform.python_version(), "pygame": pygame.version.ver, "machine": platform.platform(), "results": {**baseline, **results}}, file, indent=2)
+        print(f'Baseline saved to {args.baseline}')
+    pygame.quit()
+    if len(regressions) > 0 and not args.save_baseline:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()